@@ -0,0 +1,176 @@
+/*
+ * Modo cliente del dashboard: construye las vistas KPI/HISTÓRICO/ÁRBOL a partir
+ * del dcc.Store 'client-data' (ver dashboard_client.compact_view_data), sin
+ * ninguna llamada al servidor al cambiar de vista.
+ */
+(function () {
+    var HEADER_BACKGROUND = 'linear-gradient(135deg, #4a6fa5 0%, #2c3e50 100%)';
+    var GRAPH_CONFIG = {displayModeBar: false};
+
+    function html(type, props, children) {
+        var p = Object.assign({}, props || {});
+        if (children !== undefined) {
+            p.children = children;
+        }
+        return {type: type, namespace: 'dash_html_components', props: p};
+    }
+
+    function graph(figure, style) {
+        var props = {figure: figure, config: GRAPH_CONFIG};
+        if (style) {
+            props.style = style;
+        }
+        return {type: 'Graph', namespace: 'dash_core_components', props: props};
+    }
+
+    function message(text) {
+        return html('Div', {style: {padding: '20px', textAlign: 'center'}}, text);
+    }
+
+    // Mismo formato que dashboard_kpi_view.format_val
+    function formatVal(val) {
+        if (Math.abs(val) >= 1000) {
+            return Math.trunc(val / 1000) + 'k€';
+        }
+        return val.toFixed(0) + '€';
+    }
+
+    // Mismo redondeo que dashboard_figures.donut_ratio
+    function donutRatio(value) {
+        if (value >= 0.99 && value <= 1.01) {
+            value = 1.0;
+        }
+        var rounded = Math.round(Math.abs(value) * 10) / 10;
+        return [value, rounded, Math.round(rounded * 100)];
+    }
+
+    // Réplica de dashboard_kpi_view.create_kpi_lite_card
+    function kpiCard(row) {
+        var title = row[0], hprev = row[1] || 0, pdte = row[2] || 0, realprev = row[3] || 0, pptoprev = row[4] || 0;
+        var low = Math.min(0, hprev, pdte);
+        var span = (Math.max(0, hprev, pdte) - low) || 1;
+
+        function bar(value, label, kind) {
+            var left = (Math.min(0, value) - low) / span * 100;
+            var width = Math.abs(value) / span * 100;
+            return html('Div', {className: 'kpi-lite-row'}, [
+                html('Span', {className: 'kpi-lite-label'}, label),
+                html('Div', {className: 'kpi-lite-track'},
+                    html('Div', {className: 'kpi-lite-bar ' + kind, style: {left: left.toFixed(1) + '%', width: width.toFixed(1) + '%'}})),
+                html('Span', {className: 'kpi-lite-value ' + kind}, formatVal(value))
+            ]);
+        }
+
+        function donut(value, colorMain, label) {
+            var ratio = donutRatio(value);
+            var background;
+            if (ratio[0] <= 0) {
+                background = '#dc3545';
+            } else if (ratio[0] < 1) {
+                var start = ((1 - ratio[1]) * 100).toFixed(0);
+                background = 'conic-gradient(#f8f9fa 0 ' + start + '%,' + colorMain + ' 0)';
+            } else {
+                background = colorMain;
+            }
+            return html('Div', {className: 'kpi-lite-half'}, [
+                html('Div', {className: 'kpi-lite-donut-label'}, label),
+                html('Div', {className: 'kpi-lite-donut', style: {background: background}}, html('Span', {}, ratio[2] + '%'))
+            ]);
+        }
+
+        return html('Div', {className: 'kpi-lite-card'}, [
+            html('H5', {className: 'kpi-lite-title'}, title),
+            html('Div', {className: 'kpi-lite-bars'}, [bar(pdte, 'PDTE', 'pdte'), bar(hprev, 'HPREV', 'hprev')]),
+            html('Div', {className: 'kpi-lite-donuts'}, [
+                donut(realprev, realprev >= 0 ? '#28a745' : '#dc3545', 'REALPREV'),
+                donut(pptoprev, pptoprev >= 0 ? '#4a6fa5' : '#dc3545', 'PPTOPREV')
+            ])
+        ]);
+    }
+
+    // Réplica de dashboard_figures.historic_spec
+    function historicFigure(row, template) {
+        var serials = row[1], labels = row[2];
+        var series = [['HPREV', '#4a6fa5', row[3]], ['PPTO', '#28a745', row[4]], ['REAL', '#dc3545', row[5]]];
+        var traces = series.map(function (s) {
+            return {
+                type: 'scatter', x: serials, y: s[2], mode: 'lines+markers',
+                line: {color: s[1], width: 3}, marker: {size: 8, color: s[1]},
+                name: s[0], text: labels, hovertemplate: '%{text}<br>' + s[0] + ': %{y}'
+            };
+        });
+        var grid = 'rgba(211, 211, 211, 0.3)';
+        return {
+            data: traces,
+            layout: {
+                margin: {l: 20, r: 20, t: 20, b: 80}, height: 420, width: 1260, showlegend: false,
+                xaxis: {
+                    showgrid: true, gridcolor: grid, tickangle: 45, tickmode: 'array',
+                    tickvals: serials, ticktext: labels, showticklabels: true, title: {}, automargin: true,
+                    tickfont: {size: 9, family: 'Consolas, Menlo, monospace'}
+                },
+                yaxis: {showgrid: true, gridcolor: grid, title: {}, automargin: true, tickfont: {size: 14}},
+                plot_bgcolor: 'rgba(255, 255, 255, 0.9)', paper_bgcolor: 'rgba(255, 255, 255, 0.9)',
+                hovermode: 'closest', template: template
+            }
+        };
+    }
+
+    function historicCard(row, template) {
+        return html('Div', {style: {
+            margin: '12px', border: '1px solid #dee2e6', borderRadius: '6px', backgroundColor: '#ffffff',
+            boxShadow: '0 4px 8px rgba(0,0,0,0.1)', width: '1260px', display: 'block', verticalAlign: 'top'
+        }}, [
+            html('Div', {style: {borderBottom: '1px solid #dee2e6', padding: '12px 15px', borderRadius: '5px 5px 0 0', background: HEADER_BACKGROUND}},
+                html('H5', {style: {margin: '0', color: '#fff', fontWeight: '600', textShadow: '1px 1px 2px rgba(0,0,0,0.2)'}}, row[0])),
+            html('Div', {}, graph(historicFigure(row, template), {width: '1260px', height: '420px', margin: '0 auto'}))
+        ]);
+    }
+
+    // Treemap a partir de las listas aplanadas de dashboard_tree_view.flatten_tree
+    function treeCard(row, template) {
+        var labels = row[1], parents = row[2], values = row[3];
+        var ids = labels.map(function (_, i) { return String(i); });
+        var parentIds = parents.map(function (p) { return p < 0 ? '' : String(p); });
+        var figure = {
+            data: [{type: 'treemap', ids: ids, labels: labels, parents: parentIds, values: values, branchvalues: 'total'}],
+            layout: {margin: {t: 40, l: 0, r: 0, b: 0}, template: template}
+        };
+        return html('Div', {style: {
+            margin: '12px', border: '1px solid #dee2e6', borderRadius: '6px', backgroundColor: '#ffffff',
+            boxShadow: '0 4px 8px rgba(0,0,0,0.1)', width: '800px', display: 'inline-block', verticalAlign: 'top'
+        }}, [
+            html('H5', {style: {margin: '0', color: '#fff', fontWeight: '600', padding: '12px 15px', borderRadius: '5px 5px 0 0', background: HEADER_BACKGROUND}}, row[0]),
+            html('Div', {style: {padding: '15px'}}, graph(figure))
+        ]);
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        cdm: {
+            render_view: function (view, store) {
+                if (!store) {
+                    return null;
+                }
+                if (view === 'kpi') {
+                    if (!store.K.length) {
+                        return message('No se encontraron datos KPI para mostrar');
+                    }
+                    return html('Div', {style: {display: 'flex', flexWrap: 'wrap', justifyContent: 'center', padding: '10px'}},
+                        store.K.map(kpiCard));
+                }
+                if (view === 'historic') {
+                    if (!store.H.length) {
+                        return message('No se encontraron datos históricos para mostrar');
+                    }
+                    return html('Div', {style: {display: 'block', padding: '10px'}},
+                        store.H.map(function (row) { return historicCard(row, store.template); }));
+                }
+                if (!store.T.length) {
+                    return message('No hay datos de árbol de costes disponibles');
+                }
+                return html('Div', {style: {display: 'flex', flexWrap: 'wrap', justifyContent: 'center', gap: '20px', padding: '20px'}},
+                    store.T.map(function (row) { return treeCard(row, store.template); }));
+            }
+        }
+    });
+})();
@@ -0,0 +1,46 @@
+/*
+ * Plantilla de plotly compartida: las figuras del servidor no llevan
+ * layout.template (ver dashboard_figures.template_script). La página define
+ * la plantilla una vez en window.CDM_PLOTLY_TEMPLATE y aquí se añade al
+ * layout de cada figura que no tiene plantilla propia, antes de dibujarla.
+ * plotly.js se carga de forma diferida con el primer dcc.Graph, así que
+ * Plotly.newPlot y Plotly.react se envuelven al asignarse window.Plotly.
+ */
+(function () {
+    function withTemplate(layout) {
+        var template = window.CDM_PLOTLY_TEMPLATE;
+        if (!template || (layout && layout.template !== undefined)) {
+            return layout;
+        }
+        return Object.assign({template: template}, layout || {});
+    }
+
+    function wrap(plotly) {
+        if (!plotly || plotly.cdmTemplate) {
+            return;
+        }
+        ['newPlot', 'react'].forEach(function (name) {
+            var original = plotly[name];
+            plotly[name] = function (gd, data, layout, config) {
+                if (data && typeof data === 'object' && !Array.isArray(data)) {
+                    // Figura completa: Plotly.react(gd, {data, layout, frames, config}) desde dcc.Graph
+                    return original.call(plotly, gd, Object.assign({}, data, {layout: withTemplate(data.layout)}));
+                }
+                return original.call(plotly, gd, data, withTemplate(layout), config);
+            };
+        });
+        plotly.cdmTemplate = true;
+    }
+
+    if (window.Plotly) {
+        wrap(window.Plotly);
+    } else {
+        var current;
+        Object.defineProperty(window, 'Plotly', {
+            configurable: true,
+            enumerable: true,
+            get: function () { return current; },
+            set: function (value) { current = value; wrap(value); }
+        });
+    }
+})();
@@ -0,0 +1,336 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmarks del pipeline de datos y de las vistas, con control de regresiones.
+
+Mide tiempo (mínimo de varias repeticiones) y pico de memoria (tracemalloc)
+de wks_to_date, structure_data, procesar_datos_arbol, to_treemap,
+build_tree_index, create_treemap_figure, create_kpi_card y create_historic_view sobre datos
+sintéticos fijos (synthetic_data, semilla 0). Compara con la línea base
+guardada y termina con código 1 si alguna función empeora más de la
+tolerancia.
+
+Uso:
+    python benchmark.py --save-baseline              # guardar la línea base de esta máquina
+    python benchmark.py                              # comparar con la línea base
+    python benchmark.py --dataset large --tolerance 0.15
+    python benchmark.py --override procesar_datos_arbol=Obsoleto/variante.py:procesar
+
+--override sustituye la implementación medida por otra función (p. ej. una
+variante de Obsoleto/) para compararla con la línea base de la actual.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import importlib.util
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Tamaños fijos de los datos sintéticos (ver synthetic_data.DEFAULT_SIZES)
+DATASETS = {
+    'small': {'cias': 1, 'prjids': 2, 'rows': 4, 'columns': 4, 'weeks': 26, 'tree_depth': 3, 'tree_fanout': 3},
+    'medium': {'cias': 2, 'prjids': 6, 'rows': 8, 'columns': 6, 'weeks': 52, 'tree_depth': 3, 'tree_fanout': 4},
+    'large': {'cias': 3, 'prjids': 10, 'rows': 10, 'columns': 8, 'weeks': 104, 'tree_depth': 4, 'tree_fanout': 4},
+}
+# Tarjetas por vista: las de una página del dashboard (dashboard_index.PAGE_SIZES)
+KPI_CARDS = 60
+HISTORIC_CARDS = 10
+TREE_CARDS = 12
+
+DEFAULT_TIME_TOLERANCE = 0.25
+DEFAULT_MEMORY_TOLERANCE = 0.10
+# Mediciones extra antes de dar por buena una regresión de tiempo
+CONFIRM_RETRIES = 2
+
+
+def _tree_groups(tree_records):
+    groups = {}
+    for record in tree_records:
+        groups.setdefault((record['CIA'], record['PRJID'], record['ROW']), []).append(record)
+    return list(groups.values())
+
+
+def _node_trees(groups):
+    """
+    Árboles de nodos (LEVEL, NODE, ITMIN, VALUE, children) como los que recibe to_treemap.
+    """
+    roots = []
+    for items in groups:
+        nodes = {}
+        for item in items:
+            node = {'NODE': item['NODE'], 'ITMIN': item['ITMIN'], 'VALUE': item['VALUE'],
+                    'LEVEL': item['LEVEL'], 'COLUMN': item['COLUMN'], 'children': []}
+            nodes[(item['NODE'], item['LEVEL'])] = node
+            if item['NODEP'] == 0:
+                roots.append(node)
+            elif (item['NODEP'], item['LEVEL'] - 1) in nodes:
+                nodes[(item['NODEP'], item['LEVEL'] - 1)]['children'].append(node)
+    return roots
+
+
+def build_benchmarks(dataset, overrides=None):
+    """
+    Devuelve {nombre: función sin argumentos} con los datos del dataset ya preparados.
+    """
+    import excel_main
+    import excel_utils
+    import dashboard_kpi_view
+    import dashboard_tree_view
+    import dashboard_historic_view
+    from synthetic_data import generate_sheets
+
+    targets = {
+        'wks_to_date': excel_main.wks_to_date,
+        'structure_data': excel_main.structure_data,
+        'procesar_datos_arbol': excel_utils.procesar_datos_arbol,
+        'to_treemap': excel_utils.to_treemap,
+        'build_tree_index': dashboard_tree_view.build_tree_index,
+        'create_treemap_figure': dashboard_tree_view.create_treemap_figure,
+        'create_kpi_card': dashboard_kpi_view.create_kpi_card,
+        'create_historic_view': dashboard_historic_view.create_historic_view,
+    }
+    targets.update(overrides or {})
+
+    sheets = generate_sheets(seed=0, **DATASETS[dataset])
+    historic, kpi, tree = sheets['FrmBB_2'], sheets['FrmBB_3'], sheets['F_Asg3']
+    result, _ = excel_main.build_result(historic, kpi, tree, sheets['F_Asg5'])
+    wks_values = [record['WKS'] for record in historic]
+    groups = _tree_groups(tree)
+    node_trees = _node_trees(groups)
+    kpi_cells = [cell for cell in result if cell['DATATYPE'] == 'K'][:KPI_CARDS]
+    historic_cells = [cell for cell in result if cell['DATATYPE'] == 'H'][:HISTORIC_CARDS]
+    tree_contents = [cell['DATACONTENTS'] for cell in result if cell['DATATYPE'] == 'T'][:TREE_CARDS]
+
+    def wks_to_date():
+        for wks in wks_values:
+            targets['wks_to_date'](wks)
+
+    def structure_data():
+        targets['structure_data'](historic, kpi, tree)
+
+    def procesar_datos_arbol():
+        for items in groups:
+            targets['procesar_datos_arbol'](items)
+
+    def to_treemap():
+        for root in node_trees:
+            targets['to_treemap'](root)
+
+    def build_tree_index():
+        for tree_structure in tree_contents:
+            targets['build_tree_index'](tree_structure)
+
+    def create_treemap_figure():
+        # Sin la caché de índices de get_tree_index: se mide el primer renderizado
+        dashboard_tree_view.clear_tree_index_cache()
+        for tree_structure in tree_contents:
+            targets['create_treemap_figure'](tree_structure)
+
+    def create_kpi_card():
+        for cell in kpi_cells:
+            targets['create_kpi_card'](cell)
+
+    def create_historic_view():
+        targets['create_historic_view'](historic_cells)
+
+    return {
+        'wks_to_date': wks_to_date,
+        'structure_data': structure_data,
+        'procesar_datos_arbol': procesar_datos_arbol,
+        'to_treemap': to_treemap,
+        'build_tree_index': build_tree_index,
+        'create_treemap_figure': create_treemap_figure,
+        'create_kpi_card': create_kpi_card,
+        'create_historic_view': create_historic_view,
+    }
+
+
+def measure(func, repeat):
+    """
+    (mejor tiempo en s, mediana en s, pico de memoria en bytes) de func().
+    El pico se mide en una ejecución aparte para no sumar el coste de tracemalloc al tiempo.
+    """
+    import gc
+    import tracemalloc
+    func()  # calentamiento: importaciones perezosas y cachés
+    times = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    times.sort()
+    return times[0], times[len(times) // 2], peak
+
+
+def run_benchmarks(dataset, repeat, only=None, overrides=None, is_slow=None, retries=CONFIRM_RETRIES):
+    """
+    Mide cada función. Si is_slow(nombre, segundos) indica una posible
+    regresión, se vuelve a medir hasta `retries` veces y se conserva el mejor
+    tiempo: el ruido de la máquina solo puede hacer que algo parezca más lento.
+    """
+    results = {}
+    for name, func in build_benchmarks(dataset, overrides).items():
+        if only and name not in only:
+            continue
+        try:
+            best, median, peak = measure(func, repeat)
+            for _ in range(retries):
+                if is_slow is None or not is_slow(name, best):
+                    break
+                best = min(best, measure(func, repeat)[0])
+            results[name] = {'time_s': best, 'median_s': median, 'peak_bytes': peak, 'error': None}
+        except Exception as e:
+            results[name] = {'time_s': None, 'median_s': None, 'peak_bytes': None, 'error': f"{type(e).__name__}: {e}"}
+    return results
+
+
+def compare(results, baseline, time_tolerance, memory_tolerance):
+    """
+    Añade a cada resultado su estado frente a la línea base. Devuelve True si hay regresiones.
+    Una función que ya fallaba en la línea base no cuenta como regresión mientras siga fallando.
+    """
+    regressed = False
+    for name, current in results.items():
+        base = (baseline or {}).get(name)
+        if current['error']:
+            status = 'ERROR (conocido)' if base and base.get('error') else 'ERROR'
+        elif base is None or base.get('error'):
+            status = 'NUEVO'
+        else:
+            time_ratio = current['time_s'] / base['time_s'] - 1 if base['time_s'] else 0.0
+            memory_ratio = current['peak_bytes'] / base['peak_bytes'] - 1 if base['peak_bytes'] else 0.0
+            current['time_delta'] = time_ratio
+            current['memory_delta'] = memory_ratio
+            if time_ratio > time_tolerance or memory_ratio > memory_tolerance:
+                status = 'REGRESIÓN'
+            elif time_ratio < -time_tolerance:
+                status = 'MEJORA'
+            else:
+                status = 'OK'
+        current['status'] = status
+        if status in ('REGRESIÓN', 'ERROR'):
+            regressed = True
+    return regressed
+
+
+def _ms(value):
+    return f"{value * 1000:.2f}" if value is not None else '-'
+
+
+def _kb(value):
+    return f"{value / 1024:.0f}" if value is not None else '-'
+
+
+def _pct(value):
+    return f"{value * 100:+.1f}%" if value is not None else '-'
+
+
+def print_table(results, baseline, out=None):
+    out = out or sys.stdout
+    print(f"{'función':<24}{'base ms':>10}{'actual ms':>11}{'Δ tiempo':>10}{'base KB':>10}{'actual KB':>11}{'Δ mem':>9}  estado", file=out)
+    for name, current in results.items():
+        base = (baseline or {}).get(name) or {}
+        print(f"{name:<24}{_ms(base.get('time_s')):>10}{_ms(current['time_s']):>11}{_pct(current.get('time_delta')):>10}"
+              f"{_kb(base.get('peak_bytes')):>10}{_kb(current['peak_bytes']):>11}{_pct(current.get('memory_delta')):>9}  {current['status']}", file=out)
+        if current['error']:
+            print(f"{'':<24}{current['error']}", file=out)
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, dataset, results):
+    baselines = load_baseline(path)
+    baselines[dataset] = {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.platform(),
+        'results': {name: {key: value for key, value in result.items() if key in ('time_s', 'median_s', 'peak_bytes', 'error')}
+                    for name, result in results.items()},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baselines, f, indent=2)
+
+
+def load_override(spec):
+    """
+    'nombre=ruta/fichero.py:función' -> (nombre, función).
+    """
+    name, _, location = spec.partition('=')
+    path, _, func_name = location.rpartition(':')
+    if not name or not path or not func_name:
+        raise argparse.ArgumentTypeError(f"Formato esperado nombre=fichero.py:función, recibido {spec}")
+    module_spec = importlib.util.spec_from_file_location(f"benchmark_override_{name}", path)
+    module = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(module)
+    return name, getattr(module, func_name)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline y de las vistas con control de regresiones")
+    parser.add_argument('--dataset', choices=sorted(DATASETS), default='medium', help="Tamaño de los datos sintéticos")
+    parser.add_argument('--repeat', type=int, default=7, help="Repeticiones por función (se toma la mejor)")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TIME_TOLERANCE, help="Empeoramiento de tiempo admitido (0.25 = 25%%)")
+    parser.add_argument('--memory-tolerance', type=float, default=DEFAULT_MEMORY_TOLERANCE, help="Empeoramiento de memoria admitido")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Fichero de líneas base")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar los resultados como línea base del dataset")
+    parser.add_argument('--only', nargs='+', help="Medir solo estas funciones")
+    parser.add_argument('--override', action='append', type=load_override, default=[],
+                        help="Medir otra implementación: nombre=fichero.py:función")
+    args = parser.parse_args(argv)
+
+    # Los spans del pipeline no escriben el log JSON durante las mediciones
+    os.environ.setdefault('CDM_TRACE_LOG', '')
+
+    baseline = None if args.save_baseline else load_baseline(args.baseline).get(args.dataset)
+
+    def is_slow(name, seconds):
+        base = baseline['results'].get(name) if baseline else None
+        return bool(base and base.get('time_s')) and seconds > base['time_s'] * (1 + args.tolerance)
+
+    results = run_benchmarks(args.dataset, args.repeat, args.only, dict(args.override), is_slow=is_slow)
+    if args.save_baseline:
+        if args.override:
+            parser.error("--save-baseline no se combina con --override")
+        compare(results, None, args.tolerance, args.memory_tolerance)
+        save_baseline(args.baseline, args.dataset, results)
+        print_table(results, None)
+        print(f"Línea base '{args.dataset}' guardada en {args.baseline}")
+        return 0
+
+    if baseline is None:
+        compare(results, None, args.tolerance, args.memory_tolerance)
+        print_table(results, None)
+        print(f"No hay línea base para '{args.dataset}' en {args.baseline}; ejecute con --save-baseline")
+        return 0
+    regressed = compare(results, baseline['results'], args.tolerance, args.memory_tolerance)
+    print_table(results, baseline['results'])
+    if regressed:
+        print(f"Regresión por encima de la tolerancia (tiempo {args.tolerance:.0%}, memoria {args.memory_tolerance:.0%})")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Métricas del dashboard en formato de texto de Prometheus.
+
+Histogramas de las etapas del pipeline y de los callbacks Dash, tamaño de
+las respuestas, aciertos de caché y antigüedad del snapshot. Cada proceso
+lleva su propio registro en memoria.
+
+Con varios workers (dashboard_serve) el directorio CDM_METRICS_DIR activa
+el modo multiproceso: cada worker vuelca su registro a un fichero propio al
+terminar cada petición y /metrics suma los de todos los workers, de modo
+que cualquier worker que atienda el scrape devuelve los totales. Los
+ficheros de workers ya terminados se conservan para que los contadores no
+retrocedan; el directorio se vacía al arrancar el servidor
+(prepare_multiprocess_dir). Los gauges son del worker que atiende el scrape.
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+import functools
+
+# Directorio compartido por los workers para el modo multiproceso
+METRICS_DIR_ENV = 'CDM_METRICS_DIR'
+
+# Buckets por defecto (segundos), como en los clientes de Prometheus
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Buckets de tamaño de respuesta (bytes)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7)
+
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+# {nombre: {'type', 'help', 'buckets', 'series': {labels: valores}}}
+_metrics = {}
+# {nombre: (help, función sin argumentos que devuelve el valor)}
+_gauges = {}
+# Modo multiproceso: directorio, fichero de este proceso (pid, ruta) y si hay cambios sin volcar
+_directory = None
+_process_file = None
+_dirty = False
+
+
+def _labels_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value):
+    # Escapado de los valores de etiqueta del formato de texto de Prometheus
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _escape_help(text):
+    return str(text).replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _format_labels(key, extra=()):
+    items = list(key) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def _metric(name, kind, help_text, buckets=None):
+    metric = _metrics.get(name)
+    if metric is None:
+        metric = _metrics[name] = {'type': kind, 'help': help_text, 'buckets': buckets, 'series': {}}
+    return metric
+
+
+def observe(name, value, help_text='', buckets=TIME_BUCKETS, **labels):
+    """
+    Registra una observación en un histograma.
+    """
+    with _lock:
+        metric = _metric(name, 'histogram', help_text, buckets)
+        series = metric['series'].setdefault(_labels_key(labels), {'buckets': [0] * len(metric['buckets']), 'sum': 0.0, 'count': 0})
+        for i, bound in enumerate(metric['buckets']):
+            if value <= bound:
+                series['buckets'][i] += 1
+        series['sum'] += value
+        series['count'] += 1
+        _mark_dirty()
+
+
+def inc(name, amount=1, help_text='', **labels):
+    """
+    Incrementa un contador.
+    """
+    with _lock:
+        metric = _metric(name, 'counter', help_text)
+        key = _labels_key(labels)
+        metric['series'][key] = metric['series'].get(key, 0) + amount
+        _mark_dirty()
+
+
+def _mark_dirty():
+    global _dirty
+    _dirty = True
+
+
+def prepare_multiprocess_dir(directory=None):
+    """
+    Prepara el directorio del modo multiproceso antes de arrancar los workers:
+    lo crea (por defecto, uno temporal), borra los ficheros de ejecuciones
+    anteriores y lo publica en CDM_METRICS_DIR para los procesos hijos.
+    Devuelve la ruta.
+    """
+    directory = directory or os.environ.get(METRICS_DIR_ENV) or tempfile.mkdtemp(prefix='cdm-metrics-')
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if name.endswith(('.json', '.json.tmp')):
+            os.remove(os.path.join(directory, name))
+    os.environ[METRICS_DIR_ENV] = directory
+    return directory
+
+
+def enable_multiprocess(directory):
+    """
+    Activa el modo multiproceso en este proceso con el directorio indicado.
+    """
+    global _directory
+    _directory = directory
+    _mark_dirty()
+
+
+def flush():
+    """
+    Vuelca el registro de este proceso a su fichero del directorio multiproceso
+    (sin efecto fuera de ese modo o si no hay cambios).
+    """
+    global _dirty, _process_file
+    if _directory is None or not _dirty:
+        return
+    # Un volcado a la vez: uno anterior no puede sobrescribir a uno más reciente
+    with _flush_lock:
+        with _lock:
+            if not _dirty:
+                return
+            pid = os.getpid()
+            if _process_file is None or _process_file[0] != pid:
+                # pid y hora de arranque: un pid reutilizado no pisa el fichero de un worker terminado
+                _process_file = (pid, os.path.join(_directory, f"{pid}-{time.time_ns()}.json"))
+            text = json.dumps({name: {'type': metric['type'], 'help': metric['help'], 'buckets': metric['buckets'],
+                                      'series': [[list(map(list, key)), series] for key, series in metric['series'].items()]}
+                               for name, metric in _metrics.items()})
+            _dirty = False
+        path = _process_file[1]
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(f"{path}.tmp", path)
+
+
+def _merged_metrics():
+    """
+    Registro a exponer: el de este proceso o, en modo multiproceso, la suma
+    de los ficheros de todos los workers.
+    """
+    if _directory is None:
+        return _metrics
+    flush()
+    merged = {}
+    for name in sorted(os.listdir(_directory)):
+        if not name.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(_directory, name), encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric_name, metric in data.items():
+            target = merged.setdefault(metric_name, {'type': metric['type'], 'help': metric['help'],
+                                                     'buckets': metric['buckets'], 'series': {}})
+            for key, series in metric['series']:
+                key = tuple(map(tuple, key))
+                if metric['type'] == 'counter':
+                    target['series'][key] = target['series'].get(key, 0) + series
+                    continue
+                total = target['series'].setdefault(key, {'buckets': [0] * len(series['buckets']), 'sum': 0.0, 'count': 0})
+                total['buckets'] = [a + b for a, b in zip(total['buckets'], series['buckets'])]
+                total['sum'] += series['sum']
+                total['count'] += series['count']
+    return merged
+
+
+def register_gauge(name, help_text, func):
+    """
+    Registra un gauge cuyo valor se calcula en el momento del scrape.
+    """
+    _gauges[name] = (help_text, func)
+
+
+def timed_callback(func):
+    """
+    Decorador para callbacks Dash: histograma de duración por callback y
+    anotación del nombre y la duración en la petición (tamaño de la
+    respuesta y panel de desarrollo, ver dash_profiler).
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            from flask import g
+            g.cdm_callback = func.__name__
+        except (ImportError, RuntimeError):
+            g = None
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            if g is not None:
+                g.cdm_callback_seconds = elapsed
+            observe('cdm_callback_seconds', elapsed,
+                    'Duración de los callbacks Dash en el servidor', callback=func.__name__)
+    return wrapper
+
+
+def record_cache(cache, hit):
+    """
+    Cuenta un acierto o fallo de una caché.
+    """
+    inc('cdm_cache_requests_total', help_text='Consultas a cachés por resultado',
+        cache=cache, result='hit' if hit else 'miss')
+
+
+def render():
+    """
+    Devuelve todas las métricas en formato de exposición de texto de Prometheus.
+    """
+    lines = []
+    metrics = _merged_metrics()
+    with _lock:
+        for name, metric in sorted(metrics.items()):
+            lines.append(f"# HELP {name} {_escape_help(metric['help'])}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for key, series in sorted(metric['series'].items()):
+                if metric['type'] == 'counter':
+                    lines.append(f"{name}{_format_labels(key)} {series}")
+                    continue
+                for bound, count in zip(metric['buckets'], series['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', repr(float(bound)))])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{name}_count{_format_labels(key)} {series['count']}")
+    for name, (help_text, func) in sorted(_gauges.items()):
+        try:
+            value = func()
+        except Exception:
+            continue
+        if value is None:
+            continue
+        lines.append(f"# HELP {name} {_escape_help(help_text)}")
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return '\n'.join(lines) + '\n'
+
+
+def init_metrics_endpoint(server):
+    """
+    Registra /metrics y la medición del tamaño de las respuestas de callbacks en el servidor Flask.
+    Con CDM_METRICS_DIR activa el modo multiproceso y vuelca el registro tras cada petición.
+    """
+    from flask import Response, g, request
+    if os.environ.get(METRICS_DIR_ENV):
+        enable_multiprocess(os.environ[METRICS_DIR_ENV])
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    @server.after_request
+    def record_payload_size(response):
+        if request.path.endswith('_dash-update-component') and not response.direct_passthrough:
+            observe('cdm_callback_response_bytes', len(response.get_data()),
+                    'Tamaño de las respuestas de callbacks Dash', buckets=SIZE_BUCKETS,
+                    callback=getattr(g, 'cdm_callback', 'desconocido'))
+        flush()
+        return response
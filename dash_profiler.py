@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Perfilador de callbacks para el panel de desarrollo del dashboard.
+
+Guarda en memoria los últimos N callbacks atendidos por el proceso con:
+tiempo de servidor repartido en filtro / construcción de la vista /
+serialización, bytes de la respuesta, número de componentes y de figuras.
+
+Solo está activo si se llama a init_profiler(server); mientras tanto
+phase() y annotate() no hacen nada.
+"""
+import json
+import time
+import datetime
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+DEFAULT_HISTORY = 20
+# Callbacks propios del panel: no se registran para no taparse a sí mismos
+IGNORED_CALLBACKS = {'update_debug_panel'}
+# A partir de este tamaño la respuesta se resalta en el panel
+LARGE_RESPONSE_BYTES = 1_000_000
+
+_history = deque(maxlen=DEFAULT_HISTORY)
+_lock = threading.Lock()
+_enabled = False
+
+
+def _current():
+    if not _enabled:
+        return None
+    try:
+        from flask import g
+        return g.get('cdm_profile')
+    except RuntimeError:
+        return None
+
+
+@contextmanager
+def phase(name):
+    """
+    Acumula el tiempo del bloque en la fase indicada del callback en curso.
+    """
+    profile = _current()
+    if profile is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile['phases'][name] = profile['phases'].get(name, 0.0) + time.perf_counter() - start
+
+
+def annotate(**fields):
+    """
+    Añade contexto (CIA, PRJID, vista...) al registro del callback en curso.
+    """
+    profile = _current()
+    if profile is not None:
+        profile['context'].update(fields)
+
+
+def count_components(payload):
+    """
+    Cuenta los componentes Dash y las figuras (dcc.Graph con figura) de un JSON de respuesta.
+    """
+    components = figures = 0
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if 'type' in node and 'namespace' in node and isinstance(node.get('props'), dict):
+                components += 1
+                if node['type'] == 'Graph' and node['props'].get('figure'):
+                    figures += 1
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return components, figures
+
+
+def history():
+    """
+    Registros de los últimos callbacks, del más reciente al más antiguo.
+    """
+    with _lock:
+        return list(reversed(_history))
+
+
+def init_profiler(server, size=DEFAULT_HISTORY):
+    """
+    Activa el perfilador en el servidor Flask de la aplicación.
+    """
+    global _history, _enabled
+    from flask import g, request
+    with _lock:
+        _history = deque(maxlen=size)
+    _enabled = True
+
+    @server.before_request
+    def start_profile():
+        if request.path.endswith('_dash-update-component'):
+            g.cdm_profile = {'start': time.perf_counter(), 'phases': {}, 'context': {}}
+
+    @server.after_request
+    def finish_profile(response):
+        profile = g.get('cdm_profile')
+        callback = g.get('cdm_callback', 'desconocido')
+        if profile is None or callback in IGNORED_CALLBACKS or response.direct_passthrough:
+            return response
+        total = time.perf_counter() - profile['start']
+        body = response.get_data()
+        try:
+            components, figures = count_components(json.loads(body))
+        except ValueError:
+            components = figures = 0
+        callback_seconds = g.get('cdm_callback_seconds', total)
+        phases = profile['phases']
+        filter_s = phases.get('filtro', 0.0)
+        view_s = phases.get('vista', 0.0)
+        record = {
+            'time': datetime.datetime.now().strftime('%H:%M:%S'),
+            'callback': callback,
+            'context': profile['context'],
+            'filter_ms': filter_s * 1000,
+            'view_ms': view_s * 1000,
+            # Resto del callback sin fase explícita
+            'other_ms': max(callback_seconds - filter_s - view_s, 0.0) * 1000,
+            # Lo que Dash tarda tras el callback: serializar a JSON y despachar
+            'serialize_ms': max(total - callback_seconds, 0.0) * 1000,
+            'total_ms': total * 1000,
+            'bytes': len(body),
+            'components': components,
+            'figures': figures,
+        }
+        with _lock:
+            _history.append(record)
+        return response
+
+
+def _format_bytes(size):
+    if size >= 1_000_000:
+        return f"{size / 1_000_000:.1f} MB"
+    if size >= 1_000:
+        return f"{size / 1_000:.0f} kB"
+    return f"{size} B"
+
+
+def render_panel(records):
+    """
+    Tabla del panel de desarrollo con los últimos callbacks.
+    """
+    from dash import html
+    if not records:
+        return html.P("Todavía no se ha ejecutado ningún callback.", style={'color': '#6c757d'})
+    columns = ['Hora', 'Callback', 'Contexto', 'Filtro', 'Vista', 'Otros', 'Serialización', 'Total', 'Respuesta', 'Componentes', 'Figuras']
+    cell_style = {'padding': '4px 8px', 'borderBottom': '1px solid #dee2e6', 'textAlign': 'right'}
+    rows = []
+    for record in records:
+        large = record['bytes'] >= LARGE_RESPONSE_BYTES
+        context = ' '.join(f"{key}={value}" for key, value in record['context'].items() if value not in (None, ''))
+        values = [
+            record['time'], record['callback'], context,
+            f"{record['filter_ms']:.1f} ms", f"{record['view_ms']:.1f} ms", f"{record['other_ms']:.1f} ms",
+            f"{record['serialize_ms']:.1f} ms", f"{record['total_ms']:.1f} ms",
+            _format_bytes(record['bytes']), record['components'], record['figures'],
+        ]
+        rows.append(html.Tr([html.Td(value, style=cell_style) for value in values],
+                            style={'backgroundColor': '#f8d7da', 'fontWeight': 'bold'} if large else {}))
+    return html.Table([
+        html.Thead(html.Tr([html.Th(column, style=cell_style) for column in columns])),
+        html.Tbody(rows)
+    ], style={'borderCollapse': 'collapse', 'fontFamily': 'Consolas, Menlo, monospace', 'fontSize': '12px', 'margin': '0 auto'})
@@ -1,11 +1,32 @@
-import socket
-import subprocess
 import os
-import signal
+import socket
+import threading
+
+def _pids_listening_on(port):
+    """
+    Devuelve los PID de los procesos que escuchan en el puerto (vía psutil).
+    """
+    import psutil
+    def listening(conn):
+        return conn.laddr and conn.laddr.port == port and conn.status == psutil.CONN_LISTEN
+    try:
+        return sorted({conn.pid for conn in psutil.net_connections(kind='inet') if conn.pid and listening(conn)})
+    except psutil.AccessDenied:
+        # En macOS net_connections requiere privilegios: se recorre proceso a proceso
+        pids = set()
+        for proc in psutil.process_iter():
+            try:
+                connections = (getattr(proc, 'net_connections', None) or proc.connections)(kind='inet')
+                if any(listening(conn) for conn in connections):
+                    pids.add(proc.pid)
+            except (psutil.AccessDenied, psutil.NoSuchProcess):
+                continue
+        return sorted(pids)
 
-def check_and_kill_process_on_port(port, verbose=False):
+def check_and_kill_process_on_port(port, verbose=False, timeout=5):
     """
     Verifica si hay un proceso usando el puerto especificado y lo mata si es necesario.
+    Espera a que los procesos terminen (sin pausas fijas) y los fuerza si no lo hacen en timeout.
     """
     try:
         sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
@@ -17,28 +38,30 @@ def check_and_kill_process_on_port(port, verbose=False):
             return True
         if verbose:
             print(f"El puerto {port} está en uso. Intentando liberar...")
-        try:
-            cmd = f"lsof -i :{port} -t"
-            pids_output = subprocess.check_output(cmd, shell=True).decode().strip()
-            pids = [int(pid) for pid in pids_output.split('\n') if pid.strip()]
-            for pid in pids:
-                if verbose:
-                    print(f"Matando proceso con PID {pid} en el puerto {port}...")
-                os.kill(pid, signal.SIGTERM)
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            result = sock.connect_ex(('127.0.0.1', port))
-            sock.close()
-            if result == 0:
-                if verbose:
-                    print(f"No se pudo liberar el puerto {port}.")
-                return False
+        import psutil
+        procs = []
+        for pid in _pids_listening_on(port):
+            if pid == os.getpid():
+                continue
             if verbose:
-                print(f"El puerto {port} fue liberado exitosamente.")
-            return True
-        except subprocess.CalledProcessError as e:
+                print(f"Matando proceso con PID {pid} en el puerto {port}...")
+            try:
+                proc = psutil.Process(pid)
+                proc.terminate()
+                procs.append(proc)
+            except psutil.NoSuchProcess:
+                continue
+        if not procs:
             if verbose:
-                print(f"No se encontró ningún proceso usando el puerto {port}. Detalle: {e}")
+                print(f"No se encontró ningún proceso usando el puerto {port}.")
             return False
+        _, alive = psutil.wait_procs(procs, timeout=timeout)
+        for proc in alive:
+            proc.kill()
+        psutil.wait_procs(alive, timeout=timeout)
+        if verbose:
+            print(f"El puerto {port} fue liberado exitosamente.")
+        return True
     except Exception as e:
         if verbose:
             print(f"Error al verificar o liberar el puerto {port}: {e}")
@@ -59,3 +82,75 @@ def reserve_port(port, debug=False):
         if debug:
             print(f"Error al reservar el puerto {port}: {e}")
         return None
+
+
+class DashServerLifecycle:
+    """
+    Ciclo de vida del servidor Dash local.
+
+    El socket de escucha se reserva al crear el objeto (reserve_port), el
+    servidor WSGI se monta sobre ese socket ya abierto, `ready` se activa
+    cuando el bucle de aceptación arranca y request_stop() provoca una parada
+    ordenada sin esperas fijas.
+    """
+
+    def __init__(self, port, host='127.0.0.1', backlog=128):
+        self.host = host
+        self.port = port
+        self.sock = reserve_port(port)
+        if self.sock is None:
+            raise OSError(f"No se pudo reservar el puerto {port}")
+        self.sock.listen(backlog)
+        self.ready = threading.Event()
+        self.stop_requested = threading.Event()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, app, debug=False):
+        """
+        Arranca el servidor de la app Dash en un hilo sobre el socket reservado.
+        """
+        from werkzeug.serving import make_server
+        app.enable_dev_tools(debug=debug, dev_tools_hot_reload=False)
+        self.server = make_server(self.host, self.port, app.server, threaded=True, fd=self.sock.fileno())
+        self.thread = threading.Thread(target=self._serve, name="dash-server", daemon=True)
+        self.thread.start()
+        return self
+
+    def _serve(self):
+        try:
+            # El socket ya escucha: las conexiones que lleguen desde aquí se atienden
+            self.ready.set()
+            self.server.serve_forever(poll_interval=0.1)
+        finally:
+            self.stop_requested.set()
+
+    def wait_ready(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def request_stop(self):
+        """
+        Solicita la parada; la realiza el hilo que espera en wait_stopped().
+        """
+        self.stop_requested.set()
+
+    def wait_stopped(self):
+        """
+        Bloquea hasta que se solicite la parada y cierra el servidor de forma ordenada.
+        """
+        try:
+            while not self.stop_requested.wait(3600):
+                pass
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        self.sock.close()
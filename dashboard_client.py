@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Modo de renderizado en cliente.
+
+Empaqueta las celdas del filtro actual (CIA, PRJID) en un formato compacto
+que se envía una sola vez a un dcc.Store; el cambio entre las vistas
+KPI/HISTÓRICO/ÁRBOL lo resuelve assets/dashboard_clientside.js sin volver
+al servidor.
+"""
+from dashboard_index import query_cells
+from dashboard_figures import historic_points, plotly_template
+from dashboard_kpi_view import clean_label
+from dashboard_tree_view import flatten_tree, prune_tree
+
+
+def cell_title(cell):
+    return f"{clean_label(cell.get('ROW', ''))} - {clean_label(cell.get('COLUMN', ''))}"
+
+
+def compact_view_data(index, cia, prjid):
+    """
+    Construye el contenido del dcc.Store del modo cliente:
+    K: [título, KPREV, PDTE, REALPREV, PPTOPREV]
+    H: [título, serials, fechas, HPREV, PPTO, REAL]
+    T: [título, labels, índices de padre, valores] (podado con prune_tree)
+    """
+    kpis = []
+    for cell in query_cells(index, cia, prjid, 'K'):
+        k = cell['DATACONTENTS']
+        kpis.append([cell_title(cell), k.get('KPREV', 0), k.get('PDTE', 0), k.get('REALPREV', 0), k.get('PPTOPREV', 0)])
+    historic = []
+    for cell in query_cells(index, cia, prjid, 'H'):
+        points = historic_points(cell['DATACONTENTS'])
+        if points:
+            serials, date_labels, series = points
+            historic.append([cell_title(cell), serials, date_labels, series['HPREV'], series['PPTO'], series['REAL']])
+    trees = []
+    for cell in query_cells(index, cia, prjid, 'T'):
+        # Misma poda top-N que la vista de árbol del servidor
+        pruned = prune_tree(*flatten_tree(cell['DATACONTENTS']))
+        trees.append([cell_title(cell), pruned['labels'], pruned['parents'], pruned['values']])
+    return {
+        'K': kpis,
+        'H': historic,
+        'T': trees,
+        # La plantilla de plotly viaja una sola vez para que las figuras se vean igual
+        'template': plotly_template()
+    }
@@ -0,0 +1,221 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Especificaciones de figuras del dashboard como diccionarios planos.
+
+Construye directamente los dicts que entiende Plotly.js (data + layout),
+sin pasar por la validación de plotly.graph_objects. Las plantillas de
+layout son compartidas entre figuras: no deben modificarse in situ.
+
+Las figuras no llevan layout.template: la plantilla de plotly (unos 7 kB)
+se define una vez por página en la variable JS TEMPLATE_VARIABLE
+(template_script) y se aplica en el navegador a las figuras que no tienen
+plantilla propia (assets/plotly_template.js en el dashboard; la exportación
+estática la aplica en su propio script).
+"""
+import json
+
+# Variable global del navegador con la plantilla de plotly de la página
+TEMPLATE_VARIABLE = 'CDM_PLOTLY_TEMPLATE'
+
+
+# Plantilla por defecto de plotly.py; se resuelve una sola vez para que las
+# figuras se vean igual que las construidas con go.Figure
+_default_template = None
+
+
+def plotly_template():
+    """
+    Devuelve la plantilla de layout por defecto de plotly como dict (cacheada).
+    """
+    global _default_template
+    if _default_template is None:
+        import plotly.io as pio
+        _default_template = pio.templates[pio.templates.default].to_plotly_json()
+    return _default_template
+
+
+def template_script():
+    """
+    Script JS que define la plantilla de plotly de la página (window.TEMPLATE_VARIABLE).
+    """
+    template = json.dumps(plotly_template(), separators=(',', ':')).replace('</', '<\\/')
+    return f"window.{TEMPLATE_VARIABLE} = {template};"
+
+
+# Plantillas de layout compartidas
+KPI_BAR_LAYOUT = {
+    'height': 80,
+    'margin': {'l': 0, 'r': 0, 't': 0, 'b': 0},
+    'showlegend': False,
+    'barmode': 'group',
+    'plot_bgcolor': 'white',
+    'paper_bgcolor': 'white',
+    'xaxis': {'showgrid': False, 'showticklabels': False, 'visible': False},
+    'yaxis': {'showgrid': False, 'tickfont': {'size': 14, 'color': '#2c3e50'}, 'tickangle': 0, 'automargin': True},
+}
+
+DONUT_LAYOUT = {
+    'showlegend': False,
+    'margin': {'l': 0, 'r': 0, 't': 0, 'b': 0},
+    'height': 90,
+    'plot_bgcolor': 'white',
+    'paper_bgcolor': 'white',
+}
+
+HISTORIC_LAYOUT = {
+    'margin': {'l': 20, 'r': 20, 't': 20, 'b': 80},
+    'height': 420,
+    'width': 1260,
+    'showlegend': False,
+    'yaxis': {
+        'showgrid': True,
+        'gridcolor': 'rgba(211, 211, 211, 0.3)',
+        'title': {},
+        'automargin': True,
+        'tickfont': {'size': 14}
+    },
+    'plot_bgcolor': 'rgba(255, 255, 255, 0.9)',
+    'paper_bgcolor': 'rgba(255, 255, 255, 0.9)',
+    'hovermode': 'closest',
+}
+
+HISTORIC_SERIES = [
+    ('HPREV', '#4a6fa5'),
+    ('PPTO', '#28a745'),
+    ('REAL', '#dc3545'),
+]
+
+
+def figure_spec(data, layout_template, **layout_overrides):
+    """
+    Ensambla una figura a partir de las trazas y una plantilla de layout
+    (sin la plantilla de plotly, ver template_script).
+    """
+    layout = dict(layout_template)
+    layout.update(layout_overrides)
+    return {'data': data, 'layout': layout}
+
+
+def kpi_bar_spec(hprev, pdte):
+    """
+    Figura de barras horizontales HPREV/PDTE de una tarjeta KPI.
+    """
+    def bar(value, label, color):
+        return {
+            'type': 'bar',
+            'x': [value],
+            'y': [label],
+            'orientation': 'h',
+            'marker': {'color': color},
+            'name': label,
+            'hoverinfo': 'skip',
+            'showlegend': False,
+            'width': 0.3
+        }
+    return figure_spec([bar(hprev, 'HPREV', '#28a745'), bar(pdte, 'PDTE', '#dc3545')], KPI_BAR_LAYOUT)
+
+
+def donut_ratio(value):
+    """
+    Normaliza un ratio KPI para los anillos: devuelve (valor, redondeado, porcentaje).
+    """
+    # Redondear a 1 decimal y forzar a 1.0 si está cerca de 1
+    if 0.99 <= value <= 1.01:
+        value = 1.0
+    val_rounded = round(abs(value), 1)
+    return value, val_rounded, int(round(val_rounded * 100))
+
+
+def donut_spec(value, color_main):
+    """
+    Figura de anillo para un ratio (REALPREV/PPTOPREV) de una tarjeta KPI.
+    """
+    value, val_rounded, val_int = donut_ratio(value)
+    if value <= 0:
+        pie = {'values': [1], 'marker': {'colors': ['#dc3545']}}
+    elif 0 < value < 1:
+        pie = {'values': [val_rounded, 1-val_rounded], 'labels': ['', ''], 'marker': {'colors': [color_main, '#f8f9fa']}}
+    else:
+        pie = {'values': [1], 'labels': [''], 'marker': {'colors': [color_main]}}
+    # Sin ordenar por tamaño: el sector coloreado siempre es el primero, como en la vista lite
+    pie.update({'type': 'pie', 'textinfo': 'none', 'hole': 0.5, 'sort': False})
+    annotation = {'text': f"{val_int}%", 'x': 0.5, 'y': 0.5, 'font': {'size': 16, 'color': '#222'}, 'showarrow': False}
+    return figure_spec([pie], DONUT_LAYOUT, annotations=[annotation])
+
+
+def historic_points(historic_data):
+    """
+    Convierte los puntos H de una celda en series ordenadas por WKS_SERIAL.
+    Devuelve (serials, date_labels, {serie: valores}) o None si no hay puntos.
+    """
+    points = []
+    for entry in historic_data:
+        wks_serial = entry.get('WKS_SERIAL', None)
+        if wks_serial is None:
+            continue
+        values = tuple(entry.get(name, 0) for name, _ in HISTORIC_SERIES)
+        values = tuple(float(v) if v is not None else 0 for v in values)
+        points.append((float(wks_serial), str(entry.get('WKS_DATE', ''))) + values)
+    if not points:
+        return None
+    points.sort(key=lambda x: x[0])
+    columns = list(zip(*points))
+    serials, date_labels = list(columns[0]), list(columns[1])
+    series = {name: list(columns[i + 2]) for i, (name, _) in enumerate(HISTORIC_SERIES)}
+    return serials, date_labels, series
+
+
+def historic_spec(serials, date_labels, series):
+    """
+    Figura de líneas HPREV/PPTO/REAL de una celda histórica.
+    """
+    traces = []
+    for name, color in HISTORIC_SERIES:
+        traces.append({
+            'type': 'scatter',
+            'x': serials,
+            'y': series[name],
+            'mode': 'lines+markers',
+            'line': {'color': color, 'width': 3},
+            'marker': {'size': 8, 'color': color},
+            'name': name,
+            'text': date_labels,
+            'hovertemplate': '%{text}<br>' + name + ': %{y}'
+        })
+    xaxis = {
+        'showgrid': True,
+        'gridcolor': 'rgba(211, 211, 211, 0.3)',
+        'tickangle': 45,
+        'tickmode': 'array',
+        'tickvals': serials,
+        'ticktext': date_labels,
+        'showticklabels': True,
+        'title': {},
+        'automargin': True,
+        'tickfont': {'size': 9, 'family': "Consolas, Menlo, monospace"}
+    }
+    return figure_spec(traces, HISTORIC_LAYOUT, xaxis=xaxis)
+
+
+TREEMAP_LAYOUT = {
+    'margin': {'t': 40, 'l': 0, 'r': 0, 'b': 0},
+}
+
+
+def treemap_spec(ids, labels, parents, values, title="", **trace_overrides):
+    """
+    Figura treemap a partir de listas planas (ids únicos, padre por id, '' en las raíces).
+    Los valores son propios de cada nodo (branchvalues='remainder'): con valor 0
+    en los nodos internos Plotly.js calcula los totales sumando las hojas.
+    """
+    trace = {
+        'type': 'treemap',
+        'ids': ids,
+        'labels': labels,
+        'parents': parents,
+        'values': values,
+        'branchvalues': 'remainder',
+    }
+    trace.update(trace_overrides)
+    return figure_spec([trace], TREEMAP_LAYOUT, title={'text': title})
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Índice de filtrado y paginación de celdas del dashboard.
+
+Agrupa una sola vez las filas de datos por (CIA, PRJID, DATATYPE) para que
+cada callback obtenga directamente las celdas del filtro actual y envíe
+solo la página visible.
+
+query_cells, query_page y find_cell aceptan también un dashboard_store.CellStore en
+lugar del índice en memoria: la consulta se resuelve entonces con SQL.
+
+El índice de hojas (build_leaf_index) resuelve el clic en un nodo de un
+treemap sin recorrer el árbol: la clave es la celda y el id del nodo. El de
+items (build_item_index) da las filas de F_Asg5 de la hoja pulsada.
+"""
+
+# Tamaño de página por vista (número de tarjetas por respuesta)
+PAGE_SIZES = {
+    'K': 60,
+    'H': 10,
+    'T': 12,
+}
+
+VIEW_DATATYPES = {
+    'kpi': 'K',
+    'historic': 'H',
+    'tree': 'T',
+}
+
+# Filas de F_Asg5 por página en la tabla del modal de detalle
+ITEM_PAGE_SIZE = 20
+
+# Operadores de filter_query de dash_table (con o sin prefijo i/s de mayúsculas)
+FILTER_OPERATORS = {
+    '>=': 'ge', '<=': 'le', '<': 'lt', '>': 'gt', '!=': 'ne', '=': 'eq',
+    'ge': 'ge', 'le': 'le', 'lt': 'lt', 'gt': 'gt', 'ne': 'ne', 'eq': 'eq',
+    'contains': 'contains', 'datestartswith': 'datestartswith',
+}
+
+
+def build_filter_index(data):
+    """
+    Construye el índice {(CIA, PRJID): {DATATYPE: [celdas]}} con las celdas con contenido.
+    Las celdas H se ordenan por (ROW, COLUMN), igual que en la vista histórica.
+    """
+    index = {}
+    for row in data:
+        if not row.get('DATACONTENTS'):
+            continue
+        key = (str(row.get('CIA', '')), str(row.get('PRJID', '')))
+        index.setdefault(key, {}).setdefault(row.get('DATATYPE'), []).append(row)
+    for by_type in index.values():
+        if 'H' in by_type:
+            by_type['H'].sort(key=lambda x: (x.get('ROW', ''), x.get('COLUMN', '')))
+    return index
+
+
+def query_cells(index, cia, prjid, datatype):
+    """
+    Devuelve las celdas de un DATATYPE que cumplen el filtro (CIA y PRJID opcionales).
+    """
+    if not isinstance(index, dict):
+        return index.query_cells(cia, prjid, datatype)
+    if cia and prjid:
+        return list(index.get((str(cia), str(prjid)), {}).get(datatype, []))
+    cells = []
+    for (key_cia, key_prjid), by_type in sorted(index.items()):
+        if cia and key_cia != str(cia):
+            continue
+        if prjid and key_prjid != str(prjid):
+            continue
+        cells.extend(by_type.get(datatype, []))
+    if datatype == 'H' and not (cia and prjid):
+        cells.sort(key=lambda x: (x.get('ROW', ''), x.get('COLUMN', '')))
+    return cells
+
+
+def find_cell(index, cia, prjid, row, column, datatype):
+    """
+    Celda (CIA, PRJID, ROW, COLUMN) de un DATATYPE, o None si no está.
+    Con un CellStore solo se lee esa celda con SQL.
+    """
+    if not isinstance(index, dict):
+        return index.find_cell(cia, prjid, row, column, datatype)
+    for cell in index.get((str(cia), str(prjid)), {}).get(datatype, []):
+        if str(cell.get('ROW', '')) == str(row) and str(cell.get('COLUMN', '')) == str(column):
+            return cell
+    return None
+
+
+def paginate(cells, page, page_size):
+    """
+    Recorta una página de celdas.
+    Devuelve (celdas_de_la_página, página_normalizada, total_páginas, siguiente_página o None).
+    """
+    total_pages = max(1, -(-len(cells) // page_size))
+    page = min(max(0, page or 0), total_pages - 1)
+    start = page * page_size
+    next_page = page + 1 if page + 1 < total_pages else None
+    return cells[start:start + page_size], page, total_pages, next_page
+
+
+def query_page(index, cia, prjid, datatype, page, page_size):
+    """
+    Página de celdas del filtro.
+    Devuelve (celdas_de_la_página, página_normalizada, total_páginas, siguiente_página o None, total_celdas).
+    Con un CellStore solo se leen de la base de datos las celdas de la página.
+    """
+    if not isinstance(index, dict):
+        return index.query_page(cia, prjid, datatype, page, page_size)
+    cells = query_cells(index, cia, prjid, datatype)
+    return (*paginate(cells, page, page_size), len(cells))
+
+
+def build_leaf_index(data):
+    """
+    Índice de las hojas de los árboles: {(CIA, PRJID, ROW, COLUMN): {id del nodo: valor}}.
+    """
+    from dashboard_tree_view import flatten_tree
+    leaves = {}
+    for row in data:
+        if row.get('DATATYPE') != 'T' or not row.get('DATACONTENTS'):
+            continue
+        labels, parents, values = flatten_tree(row['DATACONTENTS'])
+        has_children = set(parents)
+        key = (str(row.get('CIA', '')), str(row.get('PRJID', '')), str(row.get('ROW', '')), str(row.get('COLUMN', '')))
+        leaves[key] = {label: value for position, (label, value) in enumerate(zip(labels, values))
+                       if position not in has_children}
+    return leaves
+
+
+def find_leaf(leaves, cia, prjid, row, column, node_id):
+    """
+    Valor de la hoja node_id del árbol de una celda, o None si el nodo no es una hoja.
+    Con un CellStore la búsqueda se hace con SQL.
+    """
+    if not isinstance(leaves, dict):
+        return leaves.find_leaf(cia, prjid, row, column, node_id)
+    return leaves.get((str(cia), str(prjid), str(row), str(column)), {}).get(node_id)
+
+
+def build_item_index(fasg5_filtrados):
+    """
+    Índice de las filas de F_Asg5 filtrado: {(CIA, PRJID, ITMID): [filas]}.
+    El ITMID de una hoja es excel_utils.node_itmid de su id (ITMIN sin el tipo entre paréntesis).
+    """
+    items = {}
+    for (cia, prjid), rows in (fasg5_filtrados or {}).items():
+        for row in rows:
+            items.setdefault((str(cia), str(prjid), str(row.get('ITMID', ''))), []).append(row)
+    return items
+
+
+def find_items(items, cia, prjid, itmid):
+    """
+    Filas de F_Asg5 de un item de una combinación CIA+PRJID ([] si no hay).
+    Con un CellStore la búsqueda se hace con SQL.
+    """
+    if not isinstance(items, dict):
+        return items.fasg5_rows(cia, prjid, itmid)
+    return items.get((str(cia), str(prjid), str(itmid)), [])
+
+
+def parse_filter_query(filter_query):
+    """
+    Convierte el filter_query de un DataTable ("{col} op valor && ...") en
+    una lista [(columna, operador, valor)]. Las partes no reconocidas se ignoran.
+    """
+    import re
+    conditions = []
+    for part in (filter_query or '').split(' && '):
+        match = re.match(r'^\s*\{(?P<column>[^}]+)\}\s+(?P<operator>\S+)\s*(?P<value>.*?)\s*$', part)
+        if not match:
+            continue
+        operator = match.group('operator')
+        if operator not in FILTER_OPERATORS and operator[:1] in ('i', 's'):
+            operator = operator[1:]
+        if operator not in FILTER_OPERATORS:
+            continue
+        operator = FILTER_OPERATORS[operator]
+        value = match.group('value')
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+            value = value[1:-1].replace('\\' + value[0], value[0])
+        elif operator not in ('contains', 'datestartswith'):
+            try:
+                value = float(value)
+            except ValueError:
+                pass
+        conditions.append((match.group('column'), operator, value))
+    return conditions
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def _matches(cell, operator, value):
+    if _is_missing(cell):
+        return operator == 'ne'
+    if operator == 'contains':
+        return str(value).lower() in str(cell).lower()
+    if operator == 'datestartswith':
+        return str(cell).startswith(str(value))
+    # Números con números; el resto se compara como texto sin distinguir mayúsculas
+    if not (_is_number(cell) and _is_number(value)):
+        cell, value = str(cell).lower(), str(value).lower()
+    return {
+        'eq': cell == value, 'ne': cell != value,
+        'lt': cell < value, 'le': cell <= value, 'gt': cell > value, 'ge': cell >= value,
+    }[operator]
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _sort_key(value):
+    # Números antes que textos
+    if _is_number(value):
+        return (0, value, '')
+    return (1, 0, str(value).lower())
+
+
+def query_item_rows(rows, page, page_size=ITEM_PAGE_SIZE, sort_by=None, filter_query=''):
+    """
+    Filtra, ordena y pagina las filas de F_Asg5 de un item como espera un
+    DataTable con page_action/sort_action/filter_action='custom'.
+    Devuelve (filas de la página, página_normalizada, total de páginas, total de filas filtradas).
+    """
+    conditions = parse_filter_query(filter_query)
+    if conditions:
+        rows = [row for row in rows if all(_matches(row.get(column), operator, value)
+                                           for column, operator, value in conditions)]
+    else:
+        rows = list(rows)
+    # Ordenación múltiple: de la última columna a la primera (sort es estable); vacíos siempre al final
+    for sort in reversed(sort_by or []):
+        column = sort['column_id']
+        present = [row for row in rows if not _is_missing(row.get(column))]
+        present.sort(key=lambda row: _sort_key(row[column]), reverse=sort.get('direction') == 'desc')
+        rows = present + [row for row in rows if _is_missing(row.get(column))]
+    page_rows, page, total_pages, _ = paginate(rows, page, page_size)
+    return page_rows, page, total_pages, len(rows)
@@ -4,17 +4,23 @@
 Módulo para la vista de KPIs del dashboard
 """
 from dash import html, dcc
-import plotly.graph_objects as go
+from dashboard_figures import kpi_bar_spec, donut_spec, donut_ratio
+
+def clean_label(label):
+    if label and ":" in label:
+        return label.split(":", 1)[1].strip()
+    return label or ""
+
+def format_val(val):
+    if abs(val) >= 1000:
+        return f"{int(val/1000)}k€"
+    else:
+        return f"{val:.0f}€"
 
 def create_kpi_card(cell_data):
     """
     Crea una tarjeta individual para visualizar datos KPI
     """
-    def clean_label(label):
-        if label and ":" in label:
-            return label.split(":", 1)[1].strip()
-        return label or ""
-    
     # Obtener datos KPI
     kpis = cell_data.get('DATACONTENTS', {})
     hprev = kpis.get('KPREV', 0)
@@ -26,43 +32,7 @@ def create_kpi_card(cell_data):
     title = f"{clean_label(cell_data.get('ROW', ''))} - {clean_label(cell_data.get('COLUMN', ''))}"
     
     # Crear gráfico de barras más estrechas, etiquetas eje Y giradas 90º
-    def format_val(val):
-        if abs(val) >= 1000:
-            return f"{int(val/1000)}k€"
-        else:
-            return f"{val:.0f}€"
-    
-    bar_fig = go.Figure()
-    bar_fig.add_trace(go.Bar(
-        x=[hprev],
-        y=['HPREV'],
-        orientation='h',
-        marker_color='#28a745',
-        name='HPREV',
-        hoverinfo='skip',
-        showlegend=False,
-        width=0.3
-    ))
-    bar_fig.add_trace(go.Bar(
-        x=[pdte],
-        y=['PDTE'],
-        orientation='h',
-        marker_color='#dc3545',
-        name='PDTE',
-        hoverinfo='skip',
-        showlegend=False,
-        width=0.3
-    ))
-    bar_fig.update_layout(
-        height=80,
-        margin=dict(l=0, r=0, t=0, b=0),
-        showlegend=False,
-        barmode='group',
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        xaxis=dict(showgrid=False, showticklabels=False, visible=False),
-        yaxis=dict(showgrid=False, tickfont=dict(size=14, color='#2c3e50'), tickangle=0, automargin=True),
-    )
+    bar_fig = kpi_bar_spec(hprev, pdte)
     # Valores alineados a la derecha, fuera del gráfico
     bar_values = html.Div([
         html.Div(format_val(pdte), style={'color': '#dc3545', 'fontWeight': 'bold', 'fontSize': '14px', 'textAlign': 'right', 'marginBottom': '8px', 'textShadow': '0 1px 2px #fff'}),
@@ -71,12 +41,6 @@ def create_kpi_card(cell_data):
     
     # Crear gráficos circulares separados para REALPREV y PPTOPREV
     def donut_figure(value, color_main, label):
-        # Redondear a 1 decimal y forzar a 1.0 si está cerca de 1
-        if 0.99 <= value <= 1.01:
-            value = 1.0
-        val_rounded = round(abs(value), 1)
-        val_int = int(round(val_rounded * 100))
-        text_color = '#222'
         label_div = html.Div(label, style={
             'textAlign': 'center',
             'fontWeight': 'bold',
@@ -87,39 +51,7 @@ def create_kpi_card(cell_data):
             'borderRadius': '8px 8px 0 0',
             'boxShadow': '0 1px 4px rgba(44,62,80,0.07)'
         })
-        if value <= 0:
-            fig = go.Figure(go.Pie(
-                values=[1],
-                marker_colors=['#dc3545'],
-                textinfo='none',
-                hole=0.5
-            ))
-        elif 0 < value < 1:
-            fig = go.Figure(go.Pie(
-                values=[val_rounded, 1-val_rounded],
-                labels=['', ''],
-                marker_colors=[color_main, '#f8f9fa'],
-                textinfo='none',
-                hole=0.5
-            ))
-        else:
-            fig = go.Figure(go.Pie(
-                values=[1],
-                labels=[''],
-                marker_colors=[color_main],
-                textinfo='none',
-                hole=0.5
-            ))
-        fig.update_layout(
-            showlegend=False,
-            annotations=[
-                dict(text=f"{val_int}%", x=0.5, y=0.5, font_size=16, showarrow=False, font_color=text_color)
-            ],
-            margin=dict(l=0, r=0, t=0, b=0),
-            height=90,
-            plot_bgcolor='white',
-            paper_bgcolor='white'
-        )
+        fig = donut_spec(value, color_main)
         return html.Div([
             label_div,
             dcc.Graph(figure=fig, config={'displayModeBar': False})
@@ -169,9 +101,59 @@ def create_kpi_card(cell_data):
         'overflow': 'hidden'
     })
 
-def create_kpi_view(data):
+def create_kpi_lite_card(cell_data):
+    """
+    Variante ligera de create_kpi_card: barras y anillos dibujados con CSS
+    (clases de assets/kpi_lite.css), sin ningún dcc.Graph
+    """
+    kpis = cell_data.get('DATACONTENTS', {})
+    hprev = kpis.get('KPREV', 0)
+    pdte = kpis.get('PDTE', 0)
+    realprev = kpis.get('REALPREV', 0)
+    pptoprev = kpis.get('PPTOPREV', 0)
+    title = f"{clean_label(cell_data.get('ROW', ''))} - {clean_label(cell_data.get('COLUMN', ''))}"
+
+    # Misma escala que el eje X de Plotly: de min(0, valores) a max(0, valores)
+    low = min(0, hprev, pdte)
+    span = (max(0, hprev, pdte) - low) or 1
+    def bar(value, label, kind):
+        left = (min(0, value) - low) / span * 100
+        width = abs(value) / span * 100
+        return html.Div([
+            html.Span(label, className='kpi-lite-label'),
+            html.Div(html.Div(className=f'kpi-lite-bar {kind}', style={'left': f'{left:.1f}%', 'width': f'{width:.1f}%'}), className='kpi-lite-track'),
+            html.Span(format_val(value), className=f'kpi-lite-value {kind}')
+        ], className='kpi-lite-row')
+
+    def donut(value, color_main, label):
+        value, val_rounded, val_int = donut_ratio(value)
+        if value <= 0:
+            background = '#dc3545'
+        elif 0 < value < 1:
+            # Plotly (sort=False) dibuja el primer sector en sentido antihorario desde las 12
+            start = (1 - val_rounded) * 100
+            background = f'conic-gradient(#f8f9fa 0 {start:.0f}%,{color_main} 0)'
+        else:
+            background = color_main
+        return html.Div([
+            html.Div(label, className='kpi-lite-donut-label'),
+            html.Div(html.Span(f"{val_int}%"), className='kpi-lite-donut', style={'background': background})
+        ], className='kpi-lite-half')
+
+    # Mismo orden que el eje de categorías de Plotly: PDTE arriba, HPREV abajo
+    return html.Div([
+        html.H5(title, className='kpi-lite-title'),
+        html.Div([bar(pdte, 'PDTE', 'pdte'), bar(hprev, 'HPREV', 'hprev')], className='kpi-lite-bars'),
+        html.Div([
+            donut(realprev, '#28a745' if realprev >= 0 else '#dc3545', 'REALPREV'),
+            donut(pptoprev, '#4a6fa5' if pptoprev >= 0 else '#dc3545', 'PPTOPREV')
+        ], className='kpi-lite-donuts')
+    ], className='kpi-lite-card')
+
+def create_kpi_view(data, lite=False):
     """
-    Crea la vista de KPIs con tarjetas individuales para cada celda
+    Crea la vista de KPIs con tarjetas individuales para cada celda.
+    Con lite=True usa create_kpi_lite_card y evita montar tres dcc.Graph por tarjeta.
     """
     if not data:
         return html.Div("No hay datos KPI disponibles", style={'padding': '20px', 'textAlign': 'center'})
@@ -181,7 +163,7 @@ def create_kpi_view(data):
     
     for cell_data in data:
         if cell_data.get('DATATYPE') == 'K' and cell_data.get('DATACONTENTS'):
-            card = create_kpi_card(cell_data)
+            card = create_kpi_lite_card(cell_data) if lite else create_kpi_card(cell_data)
             kpi_cards.append(card)
     
     if not kpi_cards:
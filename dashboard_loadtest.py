@@ -0,0 +1,475 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Prueba de carga de los callbacks del dashboard.
+
+Lanza peticiones concurrentes a /_dash-update-component con una mezcla de
+escenarios (vistas KPI/HISTÓRICO/ÁRBOL con filtros CIA/PRJID realistas,
+clic en nodos del árbol (detalle y drill-down), cierre del modal y botón de cierre) y mide
+latencias p50/p95/p99 y throughput. No necesita navegador.
+
+Por defecto genera un snapshot sintético (synthetic_data) y arranca
+dashboard_serve con gunicorn contra él; sin gunicorn usa un servidor
+werkzeug en el propio proceso (las cifras son entonces orientativas,
+porque cliente y servidor comparten el GIL).
+
+Uso:
+    python dashboard_loadtest.py --concurrency 16 --requests 2000 --workers 4
+    python dashboard_loadtest.py --url http://127.0.0.1:8050 --snapshot datos.cdmsnap --duration 60
+    python dashboard_loadtest.py --mix kpi=5,tree=1 --concurrency 8
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+# Peso relativo de cada escenario en la mezcla por defecto
+DEFAULT_MIX = {
+    'kpi': 30,
+    'kpi_page': 10,
+    'historic': 15,
+    'tree': 10,
+    'node_click': 15,
+    'tree_drill': 5,
+    'close_modal': 10,
+    'close_dashboard': 2,
+}
+# Proporción de peticiones con solo CIA (todos los proyectos de la compañía)
+CIA_ONLY_RATIO = 0.1
+
+# Salidas de los callbacks (identifican la dependencia en /_dash-dependencies)
+OUTPUT_CONTENT = '..dashboard-content.children...user-message.children...page-state.data...page-info.children..'
+OUTPUT_CLOSE = 'close-trigger.children'
+OUTPUT_MODAL_STYLE = 'node-info-modal.style'
+OUTPUT_MODAL_CHILDREN = 'node-info-modal.children'
+OUTPUT_CLOSE_MODAL = 'node-info-modal.style@'
+OUTPUT_DRILL = '..{"index":["MATCH"],"type":"treemap-graph"}.figure...{"index":["MATCH"],"type":"treemap-cell"}.data..'
+
+
+def percentile(sorted_values, pct):
+    """
+    Percentil por rango más cercano sobre una lista ya ordenada.
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Escenario desconocido: {name} (disponibles: {', '.join(DEFAULT_MIX)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def pattern_id(component_type, index):
+    # Id de un componente con id de patrón, en el formato de changedPropIds
+    return json.dumps({'index': index, 'type': component_type}, separators=(',', ':'), sort_keys=True)
+
+
+def _split_id(component_id, card=0):
+    # Los ids de patrón (MATCH) se resuelven a la tarjeta `card`
+    if component_id.startswith('{'):
+        pattern = json.loads(component_id)
+        return {**pattern, 'index': card} if pattern.get('index') == ['MATCH'] else pattern
+    return component_id
+
+
+def _split_outputs(output):
+    """
+    Convierte el identificador de salida de una dependencia en la lista 'outputs' de la petición.
+    """
+    if output.startswith('..'):
+        parts = output[2:-2].split('...')
+        return [dict(zip(('id', 'property'), part.rsplit('.', 1))) for part in parts]
+    component_id, prop = output.rsplit('.', 1)
+    return {'id': component_id, 'property': prop}
+
+
+class CallbackCatalog:
+    """
+    Construye los cuerpos de petición a partir de /_dash-dependencies.
+    """
+
+    def __init__(self, dependencies):
+        self.dependencies = dependencies
+
+    def find(self, output):
+        for dependency in self.dependencies:
+            if dependency['output'] == output or (output.endswith('@') and dependency['output'].startswith(output)):
+                return dependency
+        raise KeyError(f"No se encontró el callback con salida {output}")
+
+    def body(self, output, values, changed, card=0):
+        """
+        values: {'id.property': valor} para entradas y estados; changed: entradas disparadas.
+        Los ids de patrón se buscan por su tipo ('treemap-graph.clickData'): con MATCH
+        se refieren a la tarjeta `card`; con ALL el valor es la lista de entradas ya formada.
+        """
+        dependency = self.find(output)
+
+        def resolve(items):
+            resolved = []
+            for item in items:
+                component_id = _split_id(item['id'], card)
+                name = component_id['type'] if isinstance(component_id, dict) else component_id
+                value = values.get(f"{name}.{item['property']}")
+                if isinstance(component_id, dict) and component_id.get('index') == ['ALL']:
+                    resolved.append(value or [])
+                else:
+                    resolved.append({'id': component_id, 'property': item['property'], 'value': value})
+            return resolved
+        outputs = _split_outputs(dependency['output'])
+        for item in outputs if isinstance(outputs, list) else [outputs]:
+            item['id'] = _split_id(item['id'], card)
+        return {
+            'output': dependency['output'],
+            'outputs': outputs,
+            'inputs': resolve(dependency['inputs']),
+            'state': resolve(dependency['state']),
+            'changedPropIds': changed,
+        }
+
+
+def load_targets(snapshot_path):
+    """
+    Combinaciones CIA/PRJID, hojas de los árboles de cada combinación y nodos
+    internos, cada uno con su tarjeta (dcc.Store de la vista de árbol), leídos del snapshot.
+    """
+    from dashboard_snapshot import load_snapshot
+    from dashboard_tree_view import flatten_tree
+    snapshot = load_snapshot(snapshot_path)
+    pairs = [tuple(pair) for pair in snapshot['header']['pairs']]
+    leaves, branches = {}, []
+    for cell in snapshot['result']:
+        if cell['DATATYPE'] != 'T' or not cell['DATACONTENTS']:
+            continue
+        labels, parents, values = flatten_tree(cell['DATACONTENTS'])
+        has_children = set(parents)
+        key = (str(cell['CIA']), str(cell['PRJID']))
+        card = {'cia': key[0], 'prjid': key[1], 'row': str(cell['ROW']), 'column': str(cell['COLUMN']),
+                'version': None, 'root': None}
+        leaves.setdefault(key, []).extend(
+            (card, label, value) for i, (label, value) in enumerate(zip(labels, values)) if i not in has_children)
+        branches.extend((card, labels[i]) for i in has_children if i >= 0)
+    return pairs, leaves, branches
+
+
+class ScenarioFactory:
+    """
+    Genera las peticiones de cada escenario con filtros CIA/PRJID sesgados:
+    unos pocos proyectos concentran la mayor parte del tráfico, como en el cierre mensual.
+    """
+
+    def __init__(self, catalog, pairs, leaves, branches=(), seed=0):
+        self.catalog = catalog
+        self.pairs = pairs
+        self.leaves = leaves
+        self.branches = list(branches)
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.pair_weights = [1.0 / (rank + 1) for rank in range(len(pairs))]
+
+    def _pick_pair(self):
+        with self.lock:
+            cia, prjid = self.rng.choices(self.pairs, self.pair_weights)[0]
+            if self.rng.random() < CIA_ONLY_RATIO:
+                prjid = None
+            return cia, prjid
+
+    def _content(self, view, changed='apply-filters', page=0, lite=False):
+        cia, prjid = self._pick_pair()
+        values = {
+            'apply-filters.n_clicks': 1, 'page-prev.n_clicks': 0, 'page-next.n_clicks': 1 if changed == 'page-next' else 0,
+            'cia-filter.value': cia, 'prjid-filter.value': prjid, 'view-selector.value': view,
+            'kpi-mode.value': ['lite'] if lite else [], 'client-mode.value': [], 'page-state.data': {'page': page},
+        }
+        return [self.catalog.body(OUTPUT_CONTENT, values, [f"{changed}.n_clicks"])]
+
+    def _click_data(self):
+        with self.lock:
+            pair = self.rng.choice(list(self.leaves)) if self.leaves else self.rng.choice(self.pairs)
+            card, label, value = self.rng.choice(self.leaves[pair]) if self.leaves.get(pair) else (None, '', 0)
+        point = {'id': label, 'label': label, 'value': value}
+        return card, {'points': [point]}
+
+    def build(self, scenario):
+        """
+        Lista de cuerpos de petición de un escenario (un clic en el árbol dispara dos callbacks).
+        """
+        if scenario == 'kpi':
+            with self.lock:
+                lite = self.rng.random() < 0.3
+            return self._content('kpi', lite=lite)
+        if scenario == 'kpi_page':
+            return self._content('kpi', changed='page-next')
+        if scenario == 'historic':
+            return self._content('historic')
+        if scenario == 'tree':
+            return self._content('tree')
+        if scenario == 'node_click':
+            card, click_data = self._click_data()
+            # Las entradas ALL llevan el clickData y el dcc.Store de cada tarjeta; se pulsa la primera
+            clicks = [{'id': {'index': 0, 'type': 'treemap-graph'}, 'property': 'clickData', 'value': click_data}]
+            cells = [{'id': {'index': 0, 'type': 'treemap-cell'}, 'property': 'data', 'value': card}]
+            values = {'treemap-graph.clickData': clicks, 'treemap-cell.data': cells,
+                      'node-info-modal.style': {'display': 'none'}}
+            changed = [f"{pattern_id('treemap-graph', 0)}.clickData"]
+            return [self.catalog.body(OUTPUT_MODAL_STYLE, values, changed),
+                    self.catalog.body(OUTPUT_MODAL_CHILDREN, values, changed)]
+        if scenario == 'tree_drill':
+            with self.lock:
+                if not self.branches:
+                    return self._content('tree')
+                card, label = self.rng.choice(self.branches)
+            values = {'treemap-graph.clickData': {'points': [{'id': label, 'label': label}]}, 'treemap-cell.data': card}
+            return [self.catalog.body(OUTPUT_DRILL, values, [f"{pattern_id('treemap-graph', 0)}.clickData"])]
+        if scenario == 'close_modal':
+            values = {'close-modal.n_clicks': 1, 'node-info-modal.style': {'display': 'flex'}}
+            return [self.catalog.body(OUTPUT_CLOSE_MODAL, values, ['close-modal.n_clicks'])]
+        if scenario == 'close_dashboard':
+            return [self.catalog.body(OUTPUT_CLOSE, {'btn-close.n_clicks': 1}, ['btn-close.n_clicks'])]
+        raise ValueError(scenario)
+
+
+class Client:
+    """
+    Conexión HTTP keep-alive de un hilo de carga.
+    """
+
+    def __init__(self, base_url, timeout=120):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body=None):
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if payload is not None else {}
+        for attempt in range(2):
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self.conn.request(method, self.prefix + path, body=payload, headers=headers)
+                response = self.conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # El servidor cerró la conexión keep-alive: reintentar una vez con una nueva
+                self.conn.close()
+                self.conn = None
+                if attempt:
+                    raise
+
+
+def run_load(base_url, factory, mix, concurrency, total_requests=None, duration=None, warmup=0):
+    """
+    Ejecuta la carga y devuelve (muestras, segundos de reloj).
+    Cada muestra es (escenario, latencia en s, bytes, correcta).
+    """
+    scenarios, weights = zip(*mix.items())
+    rng = random.Random(1)
+    rng_lock = threading.Lock()
+    counter = {'issued': 0}
+    samples = []
+    samples_lock = threading.Lock()
+    deadline = None
+
+    def next_scenario():
+        with rng_lock:
+            if total_requests is not None and counter['issued'] >= total_requests + warmup:
+                return None, False
+            if deadline is not None and time.perf_counter() >= deadline:
+                return None, False
+            counter['issued'] += 1
+            return rng.choices(scenarios, weights)[0], counter['issued'] <= warmup
+
+    def worker():
+        client = Client(base_url)
+        local = []
+        while True:
+            scenario, is_warmup = next_scenario()
+            if scenario is None:
+                break
+            start = time.perf_counter()
+            size, ok = 0, True
+            try:
+                for body in factory.build(scenario):
+                    status, data = client.request('POST', '/_dash-update-component', body)
+                    size += len(data)
+                    ok = ok and status in (200, 204)
+            except Exception:
+                ok = False
+            if not is_warmup:
+                local.append((scenario, time.perf_counter() - start, size, ok))
+        with samples_lock:
+            samples.extend(local)
+
+    start = time.perf_counter()
+    if duration is not None:
+        deadline = start + duration
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, elapsed):
+    """
+    Resumen por escenario y global: peticiones, errores, p50/p95/p99, máximo, bytes medios y throughput.
+    """
+    groups = {}
+    for scenario, latency, size, ok in samples:
+        groups.setdefault(scenario, []).append((latency, size, ok))
+    groups['TOTAL'] = [(latency, size, ok) for _, latency, size, ok in samples]
+    summary = {}
+    for name, items in groups.items():
+        latencies = sorted(latency for latency, _, _ in items)
+        summary[name] = {
+            'requests': len(items),
+            'errors': sum(1 for _, _, ok in items if not ok),
+            'p50_ms': percentile(latencies, 50) * 1000,
+            'p95_ms': percentile(latencies, 95) * 1000,
+            'p99_ms': percentile(latencies, 99) * 1000,
+            'max_ms': (latencies[-1] if latencies else 0.0) * 1000,
+            'mean_kb': (sum(size for _, size, _ in items) / len(items) / 1024) if items else 0.0,
+            'throughput_rps': len(items) / elapsed if elapsed else 0.0,
+        }
+    return summary
+
+
+def print_summary(summary, elapsed, concurrency, out=None):
+    out = out or sys.stdout
+    print(f"Duración {elapsed:.1f} s, concurrencia {concurrency}", file=out)
+    print(f"{'escenario':<16}{'peticiones':>11}{'errores':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'máx ms':>10}{'KB medios':>11}{'req/s':>9}", file=out)
+    for name, row in sorted(summary.items(), key=lambda item: (item[0] == 'TOTAL', item[0])):
+        print(f"{name:<16}{row['requests']:>11}{row['errors']:>9}{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}"
+              f"{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}{row['mean_kb']:>11.1f}{row['throughput_rps']:>9.1f}", file=out)
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_http(url, timeout=60):
+    client = Client(url, timeout=5)
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            if client.request('GET', '/health')[0] == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_local_server(snapshot_path, workers, threads):
+    """
+    Arranca el servidor a probar. Devuelve (url, función de parada).
+    """
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    try:
+        import gunicorn  # noqa: F401
+    except ImportError:
+        print("gunicorn no disponible: servidor werkzeug en el mismo proceso (cifras orientativas)")
+        import logging
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)
+        from dash_utils import DashServerLifecycle
+        from dashboard_main import create_app
+        lifecycle = DashServerLifecycle(port)
+        lifecycle.start(create_app(snapshot_path, allow_close=False))
+        lifecycle.wait_ready(timeout=30)
+        return url, lifecycle.shutdown
+
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dashboard_serve.py'),
+               '--snapshot', snapshot_path, '--bind', f"127.0.0.1:{port}",
+               '--workers', str(workers), '--threads', str(threads)]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def stop():
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    if not _wait_http(url):
+        stop()
+        raise RuntimeError(f"El servidor de prueba no respondió en {url}")
+    return url, stop
+
+
+def main(argv=None):
+    from synthetic_data import add_size_arguments, sizes_from_args, write_synthetic_snapshot
+    parser = argparse.ArgumentParser(description="Prueba de carga de los callbacks del dashboard")
+    parser.add_argument('--url', help="Servidor ya arrancado (debe servir el mismo --snapshot y no permitir el cierre)")
+    parser.add_argument('--snapshot', help="Snapshot del que salen los filtros (por defecto, uno sintético)")
+    parser.add_argument('--concurrency', type=int, default=8, help="Clientes concurrentes")
+    parser.add_argument('--requests', type=int, default=500, help="Número de escenarios a ejecutar")
+    parser.add_argument('--duration', type=float, help="Duración en segundos (sustituye a --requests)")
+    parser.add_argument('--warmup', type=int, default=20, help="Escenarios iniciales que no se miden")
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help="Pesos de los escenarios, p. ej. kpi=3,tree=1 (disponibles: " + ', '.join(DEFAULT_MIX) + ")")
+    parser.add_argument('--workers', type=int, default=2, help="Workers del servidor local")
+    parser.add_argument('--threads', type=int, default=4, help="Hilos por worker del servidor local")
+    parser.add_argument('--json', help="Guardar el resumen en este fichero JSON")
+    add_size_arguments(parser)
+    args = parser.parse_args(argv)
+
+    snapshot_path = args.snapshot
+    tmpdir = None
+    if snapshot_path is None:
+        if args.url:
+            parser.error("--url requiere --snapshot con los datos que sirve ese servidor")
+        tmpdir = tempfile.TemporaryDirectory()
+        snapshot_path = os.path.join(tmpdir.name, 'loadtest.cdmsnap')
+        write_synthetic_snapshot(snapshot_path, seed=args.seed, **sizes_from_args(args))
+    snapshot_path = os.path.abspath(snapshot_path)
+
+    stop = None
+    try:
+        url = args.url
+        if url is None:
+            url, stop = start_local_server(snapshot_path, args.workers, args.threads)
+        status, data = Client(url).request('GET', '/_dash-dependencies')
+        if status != 200:
+            raise RuntimeError(f"{url}/_dash-dependencies devolvió {status}")
+        pairs, leaves, branches = load_targets(snapshot_path)
+        factory = ScenarioFactory(CallbackCatalog(json.loads(data)), pairs, leaves, branches, seed=args.seed)
+        print(f"Carga contra {url}: {len(pairs)} combinaciones CIA/PRJID, mezcla {args.mix}")
+        samples, elapsed = run_load(url, factory, args.mix, args.concurrency,
+                                    total_requests=None if args.duration else args.requests,
+                                    duration=args.duration, warmup=args.warmup)
+    finally:
+        if stop is not None:
+            stop()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    summary = summarize(samples, elapsed)
+    print_summary(summary, elapsed, args.concurrency)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'concurrency': args.concurrency, 'elapsed_s': elapsed, 'scenarios': summary}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,27 +6,24 @@ Aplicación principal del dashboard
 import os
 import sys
 import argparse
-import json
-import threading
-import time
 import webbrowser
 import socket
-import psutil
 import subprocess
-import signal
-from dash import Dash, html, dcc, callback, Output, Input, State, dash_table
-import dash
-import dash_bootstrap_components as dbc
-import random
-import pandas as pd
-from dash_utils import check_and_kill_process_on_port, reserve_port
-from dashboard_kpi_view import create_kpi_view as kpi_view_external
-from dashboard_historic_view import create_historic_view as historic_view_external
-from dashboard_tree_view import create_treemap_figure, render_tree_view
-
-# Variable global para controlar el estado de la aplicación
-app_running = True
-server_ready = threading.Event()
+import startup_profile
+import dash_metrics
+import dash_profiler
+from dash_metrics import timed_callback
+from dash_profiler import phase, annotate
+from dash_utils import check_and_kill_process_on_port, DashServerLifecycle
+from dashboard_index import (build_filter_index, build_leaf_index, build_item_index, find_cell, find_leaf, find_items,
+                             query_cells, query_page, query_item_rows, PAGE_SIZES, VIEW_DATATYPES, ITEM_PAGE_SIZE)
+from excel_utils import node_itmid
+
+# dash, dash_bootstrap_components, plotly y pandas se importan de forma
+# diferida en las funciones que los usan: importar este módulo no los carga
+
+# Ciclo de vida del servidor local (dash_utils.DashServerLifecycle) mientras main() está activo
+server_lifecycle = None
 
 def find_free_port(start_port=8050, max_attempts=100):
     """
@@ -42,68 +39,223 @@ def find_free_port(start_port=8050, max_attempts=100):
             continue
     return None
 
-def run_dash_app(app, port, debug):
-    """
-    Función que ejecuta la aplicación Dash en un hilo separado
-    """
-    try:
-        # Señalizar que el servidor está por iniciar
-        print(f"Iniciando servidor Dash en puerto {port}...")
-        
-        # Configurar una ruta especial para verificar que el servidor está listo
-        @app.server.route('/health')
-        def health_check():
-            return 'OK'
-        
-        # Configurar logging
-        import logging
-        logging.getLogger('werkzeug').setLevel(logging.INFO)
-        
-        # Iniciar el servidor con debug mode activado y hot reload desactivado
-        app.run(debug=debug, port=port, use_reloader=False, dev_tools_hot_reload=False)
-    except Exception as e:
-        print(f"Error al iniciar el servidor Dash: {e}")
-        global app_running
-        app_running = False
-        server_ready.set()  # Liberar el evento en caso de error
-        sys.exit(1)
+# Estado de datos del proceso; lo rellena load_data_stage() una sola vez al arrancar
+dashboard_state = {
+    'data': [],
+    'fasg5': {},
+    'index': None,
+    'header': None,
+    'snapshot_path': None,
+    # Almacén SQLite (dashboard_store.CellStore); si está activo sustituye al índice en memoria
+    'store': None,
+    # Directorio de vistas precalculadas (dashboard_precompute); None para calcular siempre en línea
+    'views_dir': None,
+    # Historial de versiones (snapshot_history) para el selector "ver a fecha"; None lo oculta
+    'history_dir': None,
+    # Índice de hojas de los árboles (dashboard_index.build_leaf_index); se construye en el primer clic
+    'leaves': None,
+    # Filas de F_Asg5 por (CIA, PRJID, ITMID) (dashboard_index.build_item_index)
+    'items': None,
+    # Número de cargas en memoria: versión de los datos en la caché de índices de árbol
+    'loads': 0,
+}
 
-def wait_for_server(port, timeout=30):
+def load_data_stage(snapshot_path=None, store_path=None):
     """
-    Espera hasta que el servidor esté listo para recibir conexiones
+    Etapa única de carga de datos: abre el almacén SQLite indicado (o CDM_STORE),
+    lee el snapshot indicado (o CDM_SNAPSHOT) o, si no hay ninguno, ejecuta
+    el pipeline de excel_main.
+    Construye también el índice de filtros y la cabecera usada por el layout.
+    Con almacén SQLite no se carga ninguna celda en memoria: el índice es el
+    propio almacén y las consultas se hacen con SQL.
+    Si falla, muestra el error y no intenta cargar datos simulados.
     """
-    start_time = time.time()
-    while time.time() - start_time < timeout:
+    store_path = store_path or os.environ.get('CDM_STORE')
+    if store_path:
+        from dashboard_store import CellStore
+        store = CellStore(store_path)
+        dashboard_state.update({
+            'data': [],
+            'fasg5': {},
+            'index': store,
+            'header': store.header(),
+            'snapshot_path': None,
+            'store': store,
+            'leaves': store,
+            'items': store,
+        })
+        return dashboard_state['data']
+    snapshot_path = snapshot_path or os.environ.get('CDM_SNAPSHOT')
+    if snapshot_path:
+        from dashboard_snapshot import load_snapshot
+        snapshot = load_snapshot(snapshot_path)
+        data, fasg5_filtrados, header = snapshot['result'], snapshot['fasg5'], snapshot['header']
+    else:
         try:
-            sock = socket.socket(socket.AF_INET, socket.AF_INET, socket.SOCK_STREAM)
-            sock.connect(('127.0.0.1', port))
-            sock.close()
-            # Esperar un poco más para asegurar que el servidor Dash está completamente iniciado
-            time.sleep(2)
-            return True
-        except socket.error:
-            time.sleep(0.1)
-    return False
+            from excel_main import main as extract_excel_data, EXCEL_PATH
+            from dashboard_snapshot import build_header
+            data, fasg5_filtrados = extract_excel_data()
+            header = build_header(data, source=EXCEL_PATH)
+        except Exception as e:
+            print(f"Error al importar o ejecutar excel_main: {e}")
+            raise RuntimeError("Error crítico al cargar los datos reales. Revise excel_main.") from e
+    dashboard_state.update({
+        'data': data,
+        'fasg5': fasg5_filtrados,
+        'index': build_filter_index(data),
+        'header': header,
+        'snapshot_path': snapshot_path,
+        'store': None,
+        'leaves': None,
+        'items': build_item_index(fasg5_filtrados),
+        'loads': dashboard_state['loads'] + 1,
+    })
+    return data
 
 def load_dashboard_data():
     """
-    Carga los datos reales desde Excel para el dashboard.
-    Si falla, muestra el error y no intenta cargar datos simulados.
+    Devuelve los datos cargados en la etapa de arranque.
+    Con snapshot, si el fichero ha cambiado en disco se vuelve a cargar.
+    Con almacén SQLite solo se refresca la cabecera (las celdas no están en memoria).
     """
-    try:
-        from excel_main import main as extract_excel_data
-        datos_dashboard, fasg5_filtrados = extract_excel_data()
-        global fasg5_data_filtrados
-        fasg5_data_filtrados = fasg5_filtrados
-        return datos_dashboard
-    except Exception as e:
-        print(f"Error al importar o ejecutar excel_main: {e}")
-        raise RuntimeError("Error crítico al cargar los datos reales. Revise excel_main.") from e
+    snapshot_path = dashboard_state['snapshot_path']
+    if dashboard_state['store'] is not None:
+        header = dashboard_state['store'].header()
+        stale = header is not dashboard_state['header']
+        dashboard_state['header'] = header
+    elif snapshot_path:
+        from dashboard_snapshot import load_snapshot
+        stale = load_snapshot(snapshot_path)['result'] is not dashboard_state['data']
+        if stale:
+            load_data_stage(snapshot_path)
+    else:
+        stale = dashboard_state['index'] is None
+        if stale:
+            load_data_stage()
+    dash_metrics.record_cache('dashboard_data', not stale)
+    return dashboard_state['data']
+
+def snapshot_age_seconds():
+    """
+    Segundos transcurridos desde que se generaron los datos cargados.
+    """
+    header = dashboard_state['header']
+    if not header or not header.get('created'):
+        return None
+    import datetime
+    return (datetime.datetime.now() - datetime.datetime.fromisoformat(header['created'])).total_seconds()
+
+def get_filter_index():
+    """
+    Índice de filtros de los datos actuales (ver dashboard_index).
+    """
+    load_dashboard_data()
+    return dashboard_state['index']
+
+def get_version_index(version):
+    """
+    Índice de filtros de una versión del historial ("ver a fecha").
+    Sin versión (o sin historial) es el de los datos actuales.
+    """
+    if not version or not dashboard_state['history_dir']:
+        return get_filter_index()
+    from snapshot_history import load_version
+    state = load_version(dashboard_state['history_dir'], int(version))
+    # El índice se guarda con la versión reconstruida (cacheada en snapshot_history)
+    if 'index' not in state:
+        state['index'] = build_filter_index(state['result'])
+    return state['index']
+
+def get_leaf_index(version=None):
+    """
+    Índice de hojas de los datos actuales o de una versión del historial.
+    Se construye una vez, en el primer clic; con almacén SQLite es el propio almacén.
+    """
+    if version and dashboard_state['history_dir']:
+        from snapshot_history import load_version
+        state = load_version(dashboard_state['history_dir'], int(version))
+        if 'leaves' not in state:
+            state['leaves'] = build_leaf_index(state['result'])
+        return state['leaves']
+    load_dashboard_data()
+    if dashboard_state['leaves'] is None:
+        dashboard_state['leaves'] = build_leaf_index(dashboard_state['data'])
+    return dashboard_state['leaves']
+
+def get_item_index(version=None):
+    """
+    Índice de filas de F_Asg5 de los datos actuales (construido con el snapshot)
+    o de una versión del historial.
+    """
+    if version and dashboard_state['history_dir']:
+        from snapshot_history import load_version
+        state = load_version(dashboard_state['history_dir'], int(version))
+        if 'items' not in state:
+            state['items'] = build_item_index(state['fasg5'])
+        return state['items']
+    load_dashboard_data()
+    return dashboard_state['items']
+
+# Columnas de F_Asg5 que no se muestran en la tabla del modal (ya las da el nodo)
+ITEM_HIDDEN_COLUMNS = ('CIA', 'PRJID', 'ITMID')
+
+def table_records(rows):
+    """
+    Filas de F_Asg5 para un DataTable: solo las columnas visibles, con los
+    valores vacíos (NaN) como None y fechas u otros tipos como texto.
+    """
+    records = []
+    for row in rows:
+        record = {}
+        for key, value in row.items():
+            if key in ITEM_HIDDEN_COLUMNS:
+                continue
+            if isinstance(value, float) and value != value:
+                value = None
+            elif value is not None and not isinstance(value, (str, int, float)):
+                value = str(value)
+            record[key] = value
+        records.append(record)
+    return records
+
+def data_version():
+    """
+    Versión de los datos actuales para las cachés por celda: la del fichero
+    del almacén SQLite o el número de cargas en memoria.
+    """
+    load_dashboard_data()
+    if dashboard_state['store'] is not None:
+        return dashboard_state['store'].data_version()
+    return dashboard_state['loads']
+
+def get_tree_cell(cell):
+    """
+    Árbol de una tarjeta de la vista de árbol ({'cia', 'prjid', 'row', 'column', 'version'}
+    del dcc.Store de la tarjeta), o None si ya no existe. Solo se lee esa celda.
+    """
+    row = find_cell(get_version_index(cell.get('version')), cell['cia'], cell['prjid'], cell['row'], cell['column'], 'T')
+    return row['DATACONTENTS'] if row else None
+
+def version_options():
+    """
+    Opciones del selector "ver a fecha": versiones del historial, de la más reciente a la más antigua.
+    """
+    if not dashboard_state['history_dir']:
+        return []
+    from snapshot_history import list_versions, version_label
+    return [{'label': version_label(entry), 'value': entry['version']}
+            for entry in reversed(list_versions(dashboard_state['history_dir']))]
 
-def create_layout():
-    data = load_dashboard_data()
-    cia_values = sorted(list(set(row["CIA"] for row in data)))
-    prjid_values = sorted(list(set(row["PRJID"] for row in data)))
+def create_layout(debug_panel=False):
+    """
+    Layout del dashboard. Es barato: las opciones de los filtros salen de la
+    cabecera del snapshot (índice CIA/PRJID), sin recorrer los datos.
+    Con debug_panel=True añade el panel de desarrollo de callbacks (dash_profiler).
+    """
+    from dash import html, dcc
+    header = dashboard_state['header'] or {}
+    cia_values = header.get('cias', [])
+    prjid_values = header.get('prjids', [])
     return html.Div([
         html.Div([
             html.H1("Dashboard de Seguimiento", style={
@@ -112,6 +264,12 @@ def create_layout():
         html.Div([
             dcc.Dropdown(id='cia-filter', options=[{'label': cia, 'value': cia} for cia in cia_values], placeholder='Selecciona una CIA', style={'width': '220px'}),
             dcc.Dropdown(id='prjid-filter', options=[{'label': prjid, 'value': prjid} for prjid in prjid_values], placeholder='Selecciona un PRJID', style={'width': '220px'}),
+            # Ver a fecha: versión del historial; vacío es la versión actual
+            dcc.Dropdown(id='version-selector', options=version_options(), placeholder='Ver a fecha: actual',
+                         style={'width': '260px'} if dashboard_state['history_dir'] else {'display': 'none'}),
+            # Vista de árbol coloreada por los cambios respecto a una versión base
+            dcc.Dropdown(id='diff-selector', options=version_options(), placeholder='Cambios respecto a...',
+                         style={'width': '260px'} if dashboard_state['history_dir'] else {'display': 'none'}),
             html.Button("Actualizar datos", id="apply-filters", n_clicks=0, style={"marginLeft": "20px", "marginRight": "20px", "height": "40px"}),
             html.Button("Cerrar Dashboard", id="btn-close", n_clicks=0, style={"backgroundColor": "#dc3545", "color": "white", "height": "40px"}),
             # Reemplazar el botón de alternancia por un grupo de botones de opción
@@ -126,121 +284,319 @@ def create_layout():
                     value='kpi',  # Valor predeterminado
                     labelStyle={'display': 'inline-block', 'marginRight': '10px', 'fontWeight': 'bold'},
                     style={'display': 'flex', 'justifyContent': 'center'}
+                ),
+                # Modo ligero de la vista KPI: barras y anillos en CSS, sin dcc.Graph
+                dcc.Checklist(
+                    id='kpi-mode',
+                    options=[{'label': 'KPI ligero', 'value': 'lite'}],
+                    value=[],
+                    labelStyle={'display': 'inline-block', 'fontWeight': 'bold'},
+                    style={'display': 'flex', 'justifyContent': 'center'}
+                ),
+                # Modo cliente: los datos del filtro se envían una vez y el cambio de vista no pasa por el servidor
+                dcc.Checklist(
+                    id='client-mode',
+                    options=[{'label': 'Modo cliente', 'value': 'client'}],
+                    value=[],
+                    labelStyle={'display': 'inline-block', 'fontWeight': 'bold'},
+                    style={'display': 'flex', 'justifyContent': 'center'}
                 )
             ], style={"marginLeft": "20px"})
         ], style={'display': 'flex', 'justifyContent': 'center', 'alignItems': 'center', 'marginBottom': '20px', 'gap': '10px'}),
+        # Paginación de tarjetas: solo se envía la página visible
+        html.Div([
+            html.Button("◀ Anterior", id="page-prev", n_clicks=0, style={"height": "32px"}),
+            html.Span(id='page-info', style={'fontWeight': 'bold', 'color': '#2c3e50'}),
+            html.Button("Siguiente ▶", id="page-next", n_clicks=0, style={"height": "32px"})
+        ], style={'display': 'flex', 'justifyContent': 'center', 'alignItems': 'center', 'gap': '15px', 'marginBottom': '10px'}),
+        dcc.Store(id='page-state', data={'page': 0}),
         html.Div(id='dashboard-content'),
+        dcc.Store(id='client-data'),
+        html.Div(id='client-content'),
         html.Div(id='user-message', style={'color': 'red', 'textAlign': 'center', 'marginTop': '10px'}),
-        html.Div(id='close-trigger', style={'display': 'none'})
+        html.Div(id='close-trigger', style={'display': 'none'}),
+        create_debug_panel() if debug_panel else None
     ])
 
-# Initialize the Dash app
-app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+def create_debug_panel():
+    """
+    Panel de desarrollo: tiempos, tamaño y número de componentes de los últimos callbacks.
+    """
+    from dash import html, dcc
+    return html.Details([
+        html.Summary("Panel de desarrollo: últimos callbacks", style={'fontWeight': 'bold', 'cursor': 'pointer'}),
+        dcc.Interval(id='debug-interval', interval=2000),
+        html.Div(id='debug-panel-content', style={'overflowX': 'auto', 'marginTop': '10px'})
+    ], open=True, style={'margin': '20px', 'padding': '10px', 'border': '1px dashed #6c757d', 'borderRadius': '6px', 'backgroundColor': '#f8f9fa'})
+
+def create_app(snapshot_path=None, allow_close=True, load_data=True, debug_panel=None, views_dir=None, store_path=None,
+               history_dir=None):
+    """
+    Factoría de la aplicación Dash.
+    Con load_data=True ejecuta la etapa de carga de datos antes de montar el layout.
+    debug_panel activa el panel de desarrollo (por defecto, según CDM_DEBUG_PANEL).
+    views_dir es el directorio de vistas precalculadas (por defecto, CDM_VIEWS_DIR).
+    store_path es el almacén SQLite a consultar en lugar de cargar las celdas (por defecto, CDM_STORE).
+    history_dir activa el selector "ver a fecha" con ese historial (por defecto, CDM_HISTORY).
+    """
+    if debug_panel is None:
+        debug_panel = os.environ.get('CDM_DEBUG_PANEL', '') not in ('', '0')
+    dashboard_state['views_dir'] = views_dir or os.environ.get('CDM_VIEWS_DIR') or None
+    dashboard_state['history_dir'] = history_dir or os.environ.get('CDM_HISTORY') or None
+    if load_data:
+        with startup_profile.stage("carga de datos"):
+            load_data_stage(snapshot_path, store_path)
+    with startup_profile.stage("import dash"):
+        from dash import Dash
+        import dash_bootstrap_components as dbc
+    app = Dash(__name__,
+               external_stylesheets=[dbc.themes.BOOTSTRAP],
+               suppress_callback_exceptions=True)
+    # Plantilla de plotly una vez por página: las figuras no la llevan (assets/plotly_template.js la aplica)
+    with startup_profile.stage("plantilla plotly"):
+        from dashboard_figures import template_script
+        app.index_string = app.index_string.replace('{%css%}', '{%css%}\n        <script>' + template_script() + '</script>', 1)
+    # El layout se evalúa en cada carga de página para reflejar el snapshot vigente
+    with startup_profile.stage("layout"):
+        if debug_panel:
+            app.layout = lambda: create_layout(debug_panel=True)
+        else:
+            app.layout = create_layout
+    with startup_profile.stage("callbacks"):
+        init_callbacks(app, allow_close=allow_close, debug_panel=debug_panel)
+    with startup_profile.stage("serializador JSON"):
+        warm_up_serializer()
+
+    # Ruta de comprobación de estado para balanceadores y scripts
+    @app.server.route('/health')
+    def health_check():
+        return 'OK'
+
+    # Métricas Prometheus: etapas del pipeline, callbacks, tamaño de respuestas, cachés
+    dash_metrics.init_metrics_endpoint(app.server)
+    dash_metrics.register_gauge('cdm_snapshot_age_seconds', 'Antigüedad de los datos cargados', snapshot_age_seconds)
+    if debug_panel:
+        dash_profiler.init_profiler(app.server)
+        # Informe de memoria de los datos cargados (dashboard_memory), caro: solo en depuración
+        from dashboard_memory import init_memory_endpoint
+        init_memory_endpoint(app.server, lambda: (load_dashboard_data(), dashboard_state['fasg5']))
 
-# Set the layout of the app
-app.layout = create_layout()
+    return app
 
-def render_tree_view(data):
+def warm_up_serializer():
     """
-    Renderiza la vista de árbol utilizando los datos de tipo T
+    Serializa un componente de prueba antes de atender peticiones.
+    orjson (el motor JSON de plotly) inicializa de forma perezosa su tabla de
+    tipos numpy y esa inicialización no es segura entre hilos: con varios
+    callbacks serializándose a la vez el proceso muere con SIGILL.
     """
-    def clean_label(label):
-        if label and ":" in label:
-            return label.split(":", 1)[1].strip()
-        return label or ""
-    
-    tree_data = [row for row in data if row.get("DATATYPE") == "T"]
-    if not tree_data:
-        return html.Div("No hay datos de árbol de costes disponibles", style={'text-align': 'center', 'margin-top': '20px'})
-    
-    # Procesamos los datos para convertirlos en estructura de árbol
-    tree_cards = []
-    for row in tree_data:
-        if not row.get("DATACONTENTS"):
-            continue
-        
-        tree_structure = row.get("DATACONTENTS", [])
-        title = f"{clean_label(row.get('ROW', ''))} - {clean_label(row.get('COLUMN', ''))}"
-        
-        fig = create_treemap_figure(tree_structure, title="")
-        card = html.Div([
-            html.H5(title, style={'margin': '0', 'color': '#fff', 'fontWeight': '600', 'padding': '12px 15px', 'borderRadius': '5px 5px 0 0', 'background': 'linear-gradient(135deg, #4a6fa5 0%, #2c3e50 100%)'}),
-            html.Div([
-                dcc.Graph(figure=fig, id='treemap-graph', config={'displayModeBar': False})
-            ], style={'padding': '15px'})
-        ], style={
-            'margin': '12px',
-            'border': '1px solid #dee2e6',
-            'borderRadius': '6px',
-            'backgroundColor': '#ffffff',
-            'boxShadow': '0 4px 8px rgba(0,0,0,0.1)',
-            'width': '800px',
-            'display': 'inline-block',
-            'verticalAlign': 'top'
-        })
-        tree_cards.append(card)
-    
-    return html.Div([
-        html.Div(tree_cards, style={'display': 'flex', 'flexWrap': 'wrap', 'justifyContent': 'center', 'gap': '20px', 'padding': '20px'}),
-        html.Div(id='node-info-modal', style={'display': 'none'})  # Contenedor para el modal
-    ])
+    from dash import html, dcc
+    from plotly.io.json import to_json_plotly
+    to_json_plotly(html.Div([dcc.Graph(figure={'data': [{'x': [1.5]}]})]))
 
-def init_callbacks(app):
+def init_callbacks(app, allow_close=True, debug_panel=False):
     """
-    Inicializa los callbacks principales del dashboard
+    Inicializa los callbacks principales del dashboard.
+    Con allow_close=False el botón "Cerrar Dashboard" no detiene el proceso
+    (modo servidor con varios workers). Con debug_panel=True registra
+    también el refresco del panel de desarrollo.
     """
+    import dash
+    from dash import html, dcc, dash_table, Output, Input, State, ClientsideFunction, MATCH, ALL
+    from dashboard_client import compact_view_data
+    from dashboard_precompute import view_name, render_view, load_precomputed_page
     print("Initializing callbacks...")
 
+    def clicked_leaf(clicks, cells):
+        """
+        Hoja pulsada en el treemap que ha disparado el callback: (tarjeta, id, valor)
+        o None si el clic no es en una hoja. Las entradas ALL llegan en el orden
+        de las tarjetas; la búsqueda en el índice de hojas es directa.
+        """
+        triggered = dash.callback_context.triggered_id
+        if not isinstance(triggered, dict):
+            return None
+        for item, click_data, cell in zip(dash.callback_context.inputs_list[0], clicks, cells):
+            if item['id'] != triggered:
+                continue
+            if not click_data or not cell:
+                return None
+            node_id = click_data['points'][0].get('id', '')
+            value = find_leaf(get_leaf_index(cell.get('version')), cell['cia'], cell['prjid'], cell['row'], cell['column'], node_id)
+            return (cell, node_id, value) if value is not None else None
+        return None
+
     @app.callback(
         [Output('dashboard-content', 'children'),
-         Output('user-message', 'children')],
+         Output('user-message', 'children'),
+         Output('page-state', 'data'),
+         Output('page-info', 'children')],
+        [Input('apply-filters', 'n_clicks'),
+         Input('page-prev', 'n_clicks'),
+         Input('page-next', 'n_clicks')],
+        [State('cia-filter', 'value'),
+         State('prjid-filter', 'value'),
+         State('view-selector', 'value'),
+         State('kpi-mode', 'value'),
+         State('client-mode', 'value'),
+         State('page-state', 'data'),
+         State('version-selector', 'value'),
+         State('diff-selector', 'value')]
+    )
+    @timed_callback
+    def update_dashboard_content(apply_n_clicks, prev_n_clicks, next_n_clicks, cia, prjid, view_type, kpi_mode, client_mode, page_state, version, diff_version):
+        # En modo cliente el contenido lo pinta render_view a partir de 'client-data'
+        if 'client' in (client_mode or []):
+            return None, "", {'page': 0}, ""
+        triggered = dash.callback_context.triggered_id
+        # "Actualizar datos" vuelve a la primera página; la navegación avanza o retrocede
+        if triggered not in ('page-prev', 'page-next'):
+            page = 0
+        else:
+            page = (page_state or {}).get('page', 0) + (1 if triggered == 'page-next' else -1)
+        datatype = VIEW_DATATYPES.get(view_type, 'T')
+        view = view_name(view_type if view_type in VIEW_DATATYPES else 'tree', lite='lite' in (kpi_mode or []))
+        # La comparación con una versión base solo aplica a la vista de árbol
+        diff_version = diff_version if datatype == 'T' else None
+        annotate(cia=cia, prjid=prjid, vista=view_type, version=version, base=diff_version)
+        # Con CIA y PRJID la página suele estar precalculada: se sirve sin construir la vista
+        # (solo para la versión actual; las versiones pasadas se reconstruyen del historial)
+        precomputed = None
+        if cia and prjid and dashboard_state['views_dir'] and not version and not diff_version:
+            with phase('filtro'):
+                load_dashboard_data()
+                precomputed = load_precomputed_page(dashboard_state['views_dir'], dashboard_state['header'], cia, prjid, view, page)
+        if precomputed is not None:
+            content, page, total_pages, next_page, total_cells = precomputed
+            annotate(precalculada=True)
+        else:
+            with phase('filtro'):
+                page_cells, page, total_pages, next_page, total_cells = query_page(
+                    get_version_index(version), cia, prjid, datatype, page, PAGE_SIZES[datatype])
+            # Si no hay datos para la combinación, informar al usuario
+            if not total_cells:
+                return None, "No hay datos para la combinación seleccionada. Cambie su selección.", {'page': 0}, ""
+            # Determinar vista según el valor del selector
+            if datatype == 'T':
+                from dashboard_tree_view import render_tree_view
+                changes = None
+                if diff_version:
+                    from tree_diff import cell_key, diff_cells
+                    with phase('diff'):
+                        keys = {cell_key(cell) for cell in page_cells}
+                        base_cells = [cell for cell in query_cells(get_version_index(diff_version), cia, prjid, 'T')
+                                      if cell_key(cell) in keys]
+                        changes = diff_cells(base_cells, page_cells)
+                with phase('vista'):
+                    content = render_tree_view(page_cells, changes=changes, version=version, data_version=data_version())
+            else:
+                with phase('vista'):
+                    content = render_view(view, page_cells)
+        annotate(pagina=page + 1)
+        page_info = f"Página {page + 1} de {total_pages} ({total_cells} tarjetas)"
+        if version:
+            page_info = f"Versión {version} - {page_info}"
+        if diff_version:
+            page_info = f"{page_info} - cambios respecto a la versión {diff_version}"
+        new_state = {'page': page, 'next': next_page, 'total': total_cells}
+        return content, "", new_state, page_info
+
+    @app.callback(
+        Output('client-data', 'data'),
         [Input('apply-filters', 'n_clicks')],
         [State('cia-filter', 'value'),
          State('prjid-filter', 'value'),
-         State('view-selector', 'value')]
+         State('client-mode', 'value'),
+         State('version-selector', 'value')]
     )
-    def update_dashboard_content(apply_n_clicks, cia, prjid, view_type):
-        data = load_dashboard_data()
-        # Filtrar por CIA y PRJID si están seleccionados
-        if cia:
-            data = [row for row in data if str(row.get('CIA', '')) == str(cia)]
-        if prjid:
-            data = [row for row in data if str(row.get('PRJID', '')) == str(prjid)]
-        # Si no hay datos para la combinación, informar al usuario
-        if not data:
-            return None, "No hay datos para la combinación seleccionada. Cambie su selección."
-        # Determinar vista según el valor del selector
-        if view_type == 'kpi':
-            return kpi_view_external(data), ""
-        elif view_type == 'historic':
-            return historic_view_external(data), ""
-        else:  # view_type == 'tree'
-            return render_tree_view(data), ""
+    @timed_callback
+    def update_client_data(apply_n_clicks, cia, prjid, client_mode, version):
+        if 'client' not in (client_mode or []):
+            return None
+        annotate(cia=cia, prjid=prjid, version=version)
+        with phase('filtro'):
+            index = get_version_index(version)
+        with phase('vista'):
+            return compact_view_data(index, cia, prjid)
+
+    # El cambio de vista en modo cliente se resuelve en el navegador (assets/dashboard_clientside.js)
+    app.clientside_callback(
+        ClientsideFunction(namespace='cdm', function_name='render_view'),
+        Output('client-content', 'children'),
+        [Input('view-selector', 'value'),
+         Input('client-data', 'data')]
+    )
+
+    if debug_panel:
+        @app.callback(
+            Output('debug-panel-content', 'children'),
+            [Input('debug-interval', 'n_intervals')]
+        )
+        @timed_callback
+        def update_debug_panel(n_intervals):
+            return dash_profiler.render_panel(dash_profiler.history())
 
     @app.callback(
         Output('close-trigger', 'children'),
         Input('btn-close', 'n_clicks'),
         prevent_initial_call=True
     )
+    @timed_callback
     def close_dashboard(n_clicks):
-        if n_clicks:
+        if n_clicks and allow_close:
             stop_server()
         return ''
 
+    @app.callback(
+        [Output({'type': 'treemap-graph', 'index': MATCH}, 'figure'),
+         Output({'type': 'treemap-cell', 'index': MATCH}, 'data')],
+        [Input({'type': 'treemap-graph', 'index': MATCH}, 'clickData')],
+        [State({'type': 'treemap-cell', 'index': MATCH}, 'data')],
+        prevent_initial_call=True
+    )
+    @timed_callback
+    def drill_treemap(click_data, cell):
+        # Drill-down: al pulsar un nodo se envía solo su subárbol; al pulsar la raíz mostrada, el de su padre
+        if not click_data or not cell:
+            return dash.no_update, dash.no_update
+        from dashboard_tree_view import tree_cache_key, cached_tree_index, get_tree_index, index_treemap_figure
+        node_id = click_data['points'][0].get('id', '')
+        annotate(cia=cell['cia'], prjid=cell['prjid'], nodo=node_id)
+        with phase('filtro'):
+            # El índice del árbol se cachea por celda: solo se lee la celda si no está
+            key = tree_cache_key(cell, data_version())
+            index = cached_tree_index(key)
+            if index is None:
+                tree_structure = get_tree_cell(cell)
+                if tree_structure is None:
+                    return dash.no_update, dash.no_update
+                index = get_tree_index(tree_structure, key)
+        position = index['positions'].get(node_id)
+        if position is None:
+            # "Otros" u otro nodo que no está en el árbol
+            return dash.no_update, dash.no_update
+        if position == cell.get('root'):
+            parent = index['parents'][position]
+            root = parent if parent >= 0 else None
+        elif index['ends'][position] - position > 1:
+            root = position
+        else:
+            # Hoja: no hay nada que desplegar (el detalle lo muestra el modal)
+            return dash.no_update, dash.no_update
+        with phase('vista'):
+            figure = index_treemap_figure(index, root=root)
+        return figure, {**cell, 'root': root}
+
     @app.callback(
         Output('node-info-modal', 'style'),
-        [Input('treemap-graph', 'clickData')],
-        [State('node-info-modal', 'style')]
+        [Input({'type': 'treemap-graph', 'index': ALL}, 'clickData')],
+        [State({'type': 'treemap-cell', 'index': ALL}, 'data'),
+         State('node-info-modal', 'style')]
     )
-    def show_node_info(click_data, current_style):
-        if not click_data:
-            return {'display': 'none'}
-        
-        # Obtener el ID del punto seleccionado y verificar si es un nodo hoja
-        point = click_data['points'][0]
-        customdata = point.get('customdata', '')
-        
-        if not customdata or 'Nodo hoja' not in customdata:
+    @timed_callback
+    def show_node_info(clicks, cells, current_style):
+        # Solo las hojas abren el modal; los nodos con hijos los despliega drill_treemap
+        if clicked_leaf(clicks, cells) is None:
             return {'display': 'none'}
         
         # Es un nodo hoja, mostrar el modal
@@ -259,44 +615,54 @@ def init_callbacks(app):
     
     @app.callback(
         Output('node-info-modal', 'children'),
-        [Input('treemap-graph', 'clickData')],
-        [State('cia-filter', 'value'),
-         State('prjid-filter', 'value')]
+        [Input({'type': 'treemap-graph', 'index': ALL}, 'clickData')],
+        [State({'type': 'treemap-cell', 'index': ALL}, 'data')]
     )
-    def update_node_info(click_data, cia, prjid):
-        if not click_data:
+    @timed_callback
+    def update_node_info(clicks, cells):
+        with phase('filtro'):
+            leaf = clicked_leaf(clicks, cells)
+        if leaf is None:
             return []
         
-        # Obtener el ID del punto seleccionado
-        point = click_data['points'][0]
-        node_id = point.get('id', '')
-        label = point.get('label', '')
-        value = point.get('value', 0)
-        customdata = point.get('customdata', '')
-        
-        if not customdata or 'Nodo hoja' not in customdata:
-            return []
+        # Hoja pulsada: la CIA y el PRJID son los de su tarjeta
+        cell, node_id, value = leaf
+        cia, prjid, label = cell['cia'], cell['prjid'], node_id
+        annotate(cia=cia, prjid=prjid, nodo=node_id)
         
-        # Obtener información filtrada de fasg5_data_filtrados si está disponible
-        filtered_info = []
-        if 'fasg5_data_filtrados' in globals() and fasg5_data_filtrados:
-            # Filtrar por CIA, PRJID y el ID del nodo
-            for item in fasg5_data_filtrados:
-                if (not cia or str(item.get('CIA', '')) == str(cia)) and \
-                   (not prjid or str(item.get('PRJID', '')) == str(prjid)) and \
-                   str(item.get('itm_id', '')) == str(node_id):
-                    filtered_info.append(item)
+        # Filas de F_Asg5 del item: el ITMID es el ITMIN del id "LEVEL-NODE-ITMIN" sin el tipo (node_itmid)
+        item = {'cia': cia, 'prjid': prjid, 'itmid': node_itmid(node_id), 'version': cell.get('version')}
+        with phase('filtro'):
+            filtered_info = find_items(get_item_index(item['version']), cia, prjid, item['itmid'])
         
-        # Crear tabla con la información filtrada
-        table_rows = []
+        # Tabla paginada en el servidor: solo viaja la primera página; el resto lo sirve update_item_table
         if filtered_info:
-            for item in filtered_info:
-                for key, value in item.items():
-                    if key not in ['CIA', 'PRJID', 'itm_id']:
-                        table_rows.append(html.Tr([
-                            html.Td(key, style={'fontWeight': 'bold', 'padding': '8px', 'borderBottom': '1px solid #ddd'}),
-                            html.Td(str(value), style={'padding': '8px', 'borderBottom': '1px solid #ddd'})
-                        ]))
+            page_rows, _, total_pages, _ = query_item_rows(filtered_info, 0)
+            columns = [{'name': key, 'id': key} for key in filtered_info[0] if key not in ITEM_HIDDEN_COLUMNS]
+            details = html.Div([
+                html.P(f"{len(filtered_info)} registros de F_Asg5", style={'marginBottom': '8px'}),
+                dcc.Store(id='node-items-key', data=item),
+                dash_table.DataTable(
+                    id='node-items-table',
+                    columns=columns,
+                    data=table_records(page_rows),
+                    page_current=0,
+                    page_size=ITEM_PAGE_SIZE,
+                    page_count=total_pages,
+                    page_action='custom',
+                    sort_action='custom',
+                    sort_mode='multi',
+                    sort_by=[],
+                    filter_action='custom',
+                    filter_query='',
+                    filter_options={'case': 'insensitive'},
+                    style_table={'overflowX': 'auto'},
+                    style_cell={'padding': '6px', 'textAlign': 'left', 'fontSize': '13px'},
+                    style_header={'fontWeight': 'bold', 'backgroundColor': '#f8f9fa'},
+                )
+            ])
+        else:
+            details = html.P("No hay información adicional disponible para este nodo.")
         
         # Crear el contenido del modal
         return html.Div([
@@ -306,12 +672,7 @@ def init_callbacks(app):
                 html.P(f"Valor: {value:,.2f} €", style={'fontSize': '16px', 'marginBottom': '15px'}),
                 
                 # Tabla con información filtrada
-                html.Div([
-                    html.Table(
-                        [html.Tbody(table_rows)],
-                        style={'width': '100%', 'borderCollapse': 'collapse'}
-                    ) if table_rows else html.P("No hay información adicional disponible para este nodo.")
-                ], style={'maxHeight': '300px', 'overflowY': 'auto', 'marginBottom': '15px'}),
+                html.Div([details], style={'marginBottom': '15px'}),
                 
                 html.Button("Cerrar", id="close-modal", n_clicks=0, 
                            style={'marginTop': '15px', 'backgroundColor': '#3498db', 'color': 'white', 
@@ -321,10 +682,39 @@ def init_callbacks(app):
                 'padding': '20px',
                 'borderRadius': '5px',
                 'boxShadow': '0 4px 8px rgba(0,0,0,0.2)',
-                'maxWidth': '500px',
+                'maxWidth': '900px',
+                'maxHeight': '90vh',
+                'overflowY': 'auto',
                 'margin': '0 auto'
             })
         ])
+
+    @app.callback(
+        [Output('node-items-table', 'data'),
+         Output('node-items-table', 'page_current'),
+         Output('node-items-table', 'page_count')],
+        [Input('node-items-table', 'page_current'),
+         Input('node-items-table', 'page_size'),
+         Input('node-items-table', 'sort_by'),
+         Input('node-items-table', 'filter_query')],
+        [State('node-items-key', 'data')],
+        prevent_initial_call=True
+    )
+    @timed_callback
+    def update_item_table(page_current, page_size, sort_by, filter_query, item):
+        # Paginado, orden y filtro de la tabla del modal contra el índice de items
+        if not item:
+            return [], 0, 1
+        # Un filtro u orden nuevo vuelve a la primera página; la página se devuelve
+        # normalizada para que la tabla no se quede en una página que ya no existe
+        triggered = dash.callback_context.triggered_prop_ids
+        if 'node-items-table.sort_by' in triggered or 'node-items-table.filter_query' in triggered:
+            page_current = 0
+        annotate(cia=item['cia'], prjid=item['prjid'], item=item['itmid'], pagina=(page_current or 0) + 1)
+        with phase('filtro'):
+            rows = find_items(get_item_index(item.get('version')), item['cia'], item['prjid'], item['itmid'])
+            page_rows, page_current, total_pages, _ = query_item_rows(rows, page_current, page_size or ITEM_PAGE_SIZE, sort_by, filter_query)
+        return table_records(page_rows), page_current, total_pages
     
     @app.callback(
         Output('node-info-modal', 'style', allow_duplicate=True),
@@ -332,6 +722,7 @@ def init_callbacks(app):
         [State('node-info-modal', 'style')],
         prevent_initial_call=True
     )
+    @timed_callback
     def close_modal(n_clicks, current_style):
         if n_clicks:
             return {'display': 'none'}
@@ -341,7 +732,6 @@ def stop_server():
     """
     Detiene el servidor Dash de manera controlada
     """
-    global app_running
     print("\nCerrando el dashboard...")
     # 1. Cerrar Safari si está abierto
     try:
@@ -349,70 +739,63 @@ def stop_server():
         print("Safari cerrado correctamente.")
     except Exception as e:
         print(f"Error al cerrar Safari: {e}")
-    # 2. Marcar la aplicación para terminar
-    app_running = False
-    # 3. Esperar un momento para que el hilo principal detecte que debe terminar
-    time.sleep(1)
-    # 4. Forzar el cierre de la aplicación Dash
-    print("Cerrando el proceso Dash...")
-    os._exit(0)
+    # 2. Pedir la parada: el hilo principal cierra el servidor y termina main()
+    if server_lifecycle is not None:
+        server_lifecycle.request_stop()
+    else:
+        os._exit(0)
 
 # Eliminar toda la función create_mock_data
 
-def main():
+def main(argv=None):
     """
-    Función principal que inicia la aplicación del dashboard
+    Función principal que inicia la aplicación del dashboard.
+    Con --profile-startup ejecuta solo el arranque e informa de los tiempos
+    de importación y de cada etapa, sin levantar el servidor.
     """
+    parser = argparse.ArgumentParser(description="Dashboard de Seguimiento")
+    parser.add_argument('--profile-startup', action='store_true', help="Informar de tiempos de importación y arranque y salir")
+    parser.add_argument('--debug-panel', action='store_true', help="Mostrar el panel de desarrollo con los últimos callbacks")
+    args = parser.parse_args(argv)
+    if args.profile_startup:
+        startup_profile.enable()
+        with startup_profile.stage("carga de datos"):
+            load_data_stage()
+        create_app(load_data=False)
+        startup_profile.report()
+        return 0
+
+    global server_lifecycle
     try:
-        # Configurar el puerto
+        # Liberar y reservar el puerto antes de cargar datos: el socket queda escuchando
         PORT = 8050
         check_and_kill_process_on_port(PORT)
-        reserve_port(PORT)
+        server_lifecycle = DashServerLifecycle(PORT)
 
-        print("Cargando datos simulados...")  # Debug
-        # Cargar datos simulados
-        data = load_dashboard_data()
-        if not data:
-            raise ValueError("No se pudieron cargar los datos simulados")
+        print("Cargando datos...")  # Debug
+        data = load_data_stage()
+        if not data and dashboard_state['store'] is None:
+            raise ValueError("No se pudieron cargar los datos")
         print("Datos cargados correctamente")  # Debug
-        print(f"Total celdas: {len(data)}")  # Debug
+        print(f"Total celdas: {dashboard_state['header']['cells']}")  # Debug
 
-        # Crear la aplicación Dash
-        app = Dash(__name__, 
-                  external_stylesheets=[dbc.themes.BOOTSTRAP],
-                  suppress_callback_exceptions=True)
-        
-        print("Configurando layout...")  # Debug
-        # Configurar el layout
-        app.layout = create_layout()
-        
-        print("Inicializando callbacks...")  # Debug
-        # Inicializar callbacks
-        init_callbacks(app)
-
-        # Iniciar el servidor en un hilo separado
-        print(f"Iniciando servidor en http://127.0.0.1:{PORT}")
-        dash_thread = threading.Thread(
-            target=run_dash_app,
-            args=(app, PORT, True)  # Cambiado a True para activar modo debug
-        )
-        dash_thread.daemon = True
-        dash_thread.start()
+        # Crear la aplicación Dash (layout y callbacks) sin volver a cargar los datos
+        app = create_app(load_data=False, debug_panel=args.debug_panel or None)
 
-        # Esperar a que el servidor esté listo
-        if not wait_for_server(PORT):
+        # Iniciar el servidor en un hilo separado sobre el socket reservado
+        print(f"Iniciando servidor en {server_lifecycle.url}")
+        server_lifecycle.start(app, debug=True)
+        if not server_lifecycle.wait_ready(timeout=30):
             print("Error: El servidor no respondió en el tiempo esperado")
             return 1
 
         # Abrir el navegador
-        url = f"http://127.0.0.1:{PORT}"
-        print(f"Abriendo navegador en {url}")
-        webbrowser.open(url)
+        print(f"Abriendo navegador en {server_lifecycle.url}")
+        webbrowser.open(server_lifecycle.url)
 
-        # Mantener el programa principal en ejecución
+        # Mantener el programa principal hasta que se pida la parada
         try:
-            while app_running:
-                time.sleep(1)
+            server_lifecycle.wait_stopped()
             print("Cerrando la aplicación...")
             return 0
         except KeyboardInterrupt:
@@ -421,6 +804,8 @@ def main():
 
     except Exception as e:
         print(f"Error al iniciar la aplicación: {e}")
+        if server_lifecycle is not None:
+            server_lifecycle.shutdown()
         return 1
 
 if __name__ == "__main__":
@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Contabilidad de memoria de los datos del dashboard.
+
+Recorre los datos cargados (lista `result`, DATACONTENTS de los árboles y
+F_Asg5 filtrado) y calcula el tamaño profundo por DATATYPE, por CIA y por
+hoja de origen. Opcionalmente ejecuta una carga bajo tracemalloc y lista
+las líneas que más memoria reservan.
+
+Uso:
+    python dashboard_memory.py --snapshot datos.cdmsnap
+    python dashboard_memory.py --trace-load --top 20      # carga desde el Excel con tracemalloc
+
+Con el panel de desarrollo activo el mismo informe se sirve en /debug/memory.
+"""
+import sys
+import json
+import argparse
+
+# Hoja de origen de cada DATATYPE (ver excel_main)
+DATATYPE_SHEETS = {'H': 'FrmBB_2', 'K': 'FrmBB_3', 'T': 'F_Asg3'}
+FASG5_SHEET = 'F_Asg5'
+
+
+def deep_sizeof(obj, seen=None):
+    """
+    Tamaño profundo (bytes) de obj siguiendo dicts, listas, tuplas y sets.
+    Los objetos ya presentes en `seen` no se vuelven a contar, de modo que
+    con un mismo `seen` los objetos compartidos se cuentan una sola vez.
+    """
+    if seen is None:
+        seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total
+
+
+def _add(groups, seen, key, obj):
+    groups[key] = groups.get(key, 0) + deep_sizeof(obj, seen)
+
+
+def memory_report(data, fasg5_filtrados):
+    """
+    Informe de memoria de los datos cargados.
+
+    Cada desglose usa su propio conjunto de objetos vistos: dentro de un
+    desglose lo compartido (p. ej. cadenas internadas) se cuenta una vez y
+    la suma de los grupos coincide con el total de ese desglose.
+    """
+    by_datatype, by_cia, by_sheet, tree_contents = {}, {}, {}, {}
+    seen_datatype, seen_cia, seen_sheet, seen_tree = set(), set(), set(), set()
+    for cell in data:
+        datatype = cell.get('DATATYPE')
+        _add(by_datatype, seen_datatype, datatype, cell)
+        _add(by_cia, seen_cia, str(cell.get('CIA')), cell)
+        _add(by_sheet, seen_sheet, DATATYPE_SHEETS.get(datatype, datatype), cell)
+        if datatype == 'T':
+            _add(tree_contents, seen_tree, str(cell.get('CIA')), cell.get('DATACONTENTS'))
+
+    fasg5_by_cia = {}
+    seen_fasg5 = set()
+    for (cia, prjid), rows in (fasg5_filtrados or {}).items():
+        _add(fasg5_by_cia, seen_fasg5, str(cia), rows)
+        _add(by_cia, seen_cia, str(cia), rows)
+        _add(by_sheet, seen_sheet, FASG5_SHEET, rows)
+
+    total_seen = set()
+    total = deep_sizeof(data, total_seen) + deep_sizeof(fasg5_filtrados, total_seen)
+    return {
+        'total_bytes': total,
+        'result_bytes': deep_sizeof(data),
+        'fasg5_bytes': deep_sizeof(fasg5_filtrados),
+        'cells': len(data),
+        'by_datatype': by_datatype,
+        'by_cia': by_cia,
+        'by_sheet': by_sheet,
+        'tree_contents_by_cia': tree_contents,
+        'fasg5_by_cia': fasg5_by_cia,
+    }
+
+
+def trace_load(snapshot_path=None, top=15):
+    """
+    Ejecuta la etapa de carga de datos del dashboard bajo tracemalloc.
+    Devuelve (pico en bytes, [(ubicación, bytes, bloques)] de las líneas que más reservan).
+    """
+    import tracemalloc
+    from dashboard_main import load_data_stage
+    tracemalloc.start(1)
+    try:
+        load_data_stage(snapshot_path)
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    snapshot = snapshot.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+    hotspots = [(str(stat.traceback[0]), stat.size, stat.count) for stat in snapshot.statistics('lineno')[:top]]
+    return peak, hotspots
+
+
+def _format_bytes(size):
+    if size >= 1024 ** 3:
+        return f"{size / 1024 ** 3:.2f} GB"
+    if size >= 1024 ** 2:
+        return f"{size / 1024 ** 2:.1f} MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} kB"
+    return f"{size} B"
+
+
+def print_report(report, hotspots=None, peak=None, out=None):
+    out = out or sys.stdout
+    print(f"Celdas: {report['cells']}", file=out)
+    print(f"Total: {_format_bytes(report['total_bytes'])} "
+          f"(result {_format_bytes(report['result_bytes'])}, F_Asg5 {_format_bytes(report['fasg5_bytes'])})", file=out)
+    sections = [
+        ('Por DATATYPE', 'by_datatype'),
+        ('Por hoja', 'by_sheet'),
+        ('Por CIA', 'by_cia'),
+        ('DATACONTENTS de árboles por CIA', 'tree_contents_by_cia'),
+        ('F_Asg5 filtrado por CIA', 'fasg5_by_cia'),
+    ]
+    for title, key in sections:
+        print(f"{title}:", file=out)
+        for name, size in sorted(report[key].items(), key=lambda item: item[1], reverse=True):
+            print(f"  {_format_bytes(size):>12}  {name}", file=out)
+    if hotspots is not None:
+        print(f"Reservas durante la carga (pico {_format_bytes(peak)}):", file=out)
+        for location, size, count in hotspots:
+            print(f"  {_format_bytes(size):>12}  {count:>8} bloques  {location}", file=out)
+
+
+def init_memory_endpoint(server, get_data):
+    """
+    Registra /debug/memory: informe JSON sobre los datos que devuelve get_data() -> (data, fasg5).
+    """
+    from flask import Response
+
+    @server.route('/debug/memory')
+    def memory():
+        data, fasg5_filtrados = get_data()
+        return Response(json.dumps(memory_report(data, fasg5_filtrados), indent=2), mimetype='application/json')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Contabilidad de memoria de los datos del dashboard")
+    parser.add_argument('--snapshot', help="Snapshot a analizar (por defecto, CDM_SNAPSHOT o el Excel de excel_main)")
+    parser.add_argument('--trace-load', action='store_true', help="Cargar bajo tracemalloc y listar las líneas que más reservan")
+    parser.add_argument('--top', type=int, default=15, help="Número de líneas de tracemalloc a mostrar")
+    parser.add_argument('--json', action='store_true', help="Salida en JSON")
+    args = parser.parse_args(argv)
+
+    from dashboard_main import load_data_stage, dashboard_state
+    hotspots = peak = None
+    if args.trace_load:
+        peak, hotspots = trace_load(args.snapshot, args.top)
+    else:
+        load_data_stage(args.snapshot)
+    report = memory_report(dashboard_state['data'], dashboard_state['fasg5'])
+    if args.json:
+        if hotspots is not None:
+            report['tracemalloc'] = {'peak_bytes': peak, 'hotspots': hotspots}
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, hotspots, peak)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Vistas precalculadas del dashboard.
+
+Renderiza fuera de línea el contenido de cada página de cada vista
+(KPI, KPI ligero, HISTÓRICO, ÁRBOL) para cada combinación (CIA, PRJID) del
+snapshot y lo guarda como JSON ya serializado. El callback de contenido
+sirve estas páginas tal cual y solo calcula en línea los filtros parciales
+(solo CIA o solo PRJID) o lo que no se pudo precalcular.
+
+Estructura del directorio de artefactos (ver excel_main --output-dir):
+    datos.cdmsnap                               snapshot (dashboard_snapshot)
+    vistas/manifest.json                        páginas por (CIA, PRJID, vista)
+    vistas/<CIA>/<PRJID>/<vista>/<página>.json  contenido de cada página
+"""
+import os
+import json
+import shutil
+import threading
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor
+from dashboard_index import build_filter_index, query_cells, paginate, PAGE_SIZES
+from pipeline_trace import span
+
+SNAPSHOT_NAME = 'datos.cdmsnap'
+VIEWS_DIR = 'vistas'
+MANIFEST_NAME = 'manifest.json'
+
+# Cambiar al modificar el contenido renderizado de las vistas (ids de los
+# componentes, figuras...): invalida todas las páginas precalculadas
+PRECOMPUTE_VERSION = 4
+
+# Vista precalculada -> DATATYPE de sus celdas
+PRECOMPUTED_VIEWS = {
+    'kpi': 'K',
+    'kpi_lite': 'K',
+    'historic': 'H',
+    'tree': 'T',
+}
+
+# Caché por proceso del manifiesto: {directorio: (mtime, manifiesto)}
+_manifest_cache = {}
+_cache_lock = threading.Lock()
+
+# Índice de filtros de cada proceso del pool (lo carga _init_worker)
+_worker_index = None
+
+
+def view_name(view_type, lite=False):
+    """
+    Nombre de la vista precalculada para el selector de vista y el modo KPI ligero.
+    """
+    return 'kpi_lite' if view_type == 'kpi' and lite else view_type
+
+
+def render_view(view, cells):
+    """
+    Contenido de una página de celdas para la vista indicada.
+    """
+    if view in ('kpi', 'kpi_lite'):
+        from dashboard_kpi_view import create_kpi_view
+        return create_kpi_view(cells, lite=view == 'kpi_lite')
+    if view == 'historic':
+        from dashboard_historic_view import create_historic_view
+        return create_historic_view(cells)
+    from dashboard_tree_view import render_tree_view
+    return render_tree_view(cells)
+
+
+def renderer_version():
+    """
+    Versión del renderizado de las páginas: PRECOMPUTE_VERSION y la versión de plotly.
+    """
+    import plotly
+    return f"{PRECOMPUTE_VERSION}:{plotly.__version__}"
+
+
+def page_path(views_dir, cia, prjid, view, page):
+    # CIA y PRJID se escapan para que cualquier valor sea un nombre de fichero válido
+    return os.path.join(views_dir, quote(str(cia), safe=''), quote(str(prjid), safe=''), view, f"{page}.json")
+
+
+def _init_worker(snapshot_path):
+    global _worker_index
+    from dashboard_snapshot import load_snapshot
+    _worker_index = build_filter_index(load_snapshot(snapshot_path)['result'])
+
+
+def render_pair(views_dir, cia, prjid):
+    """
+    Escribe todas las páginas de todas las vistas de una combinación (CIA, PRJID).
+    Se ejecuta en un proceso del pool. Devuelve las entradas del manifiesto.
+    Si una página falla, la vista queda marcada con el error y se calcula en línea.
+    """
+    from plotly.io.json import to_json_plotly
+    entries = []
+    for view, datatype in PRECOMPUTED_VIEWS.items():
+        cells = query_cells(_worker_index, cia, prjid, datatype)
+        if not cells:
+            continue
+        entry = {'cia': cia, 'prjid': prjid, 'view': view, 'cells': len(cells), 'pages': 0, 'bytes': 0, 'error': None}
+        total_pages = paginate(cells, 0, PAGE_SIZES[datatype])[2]
+        for page in range(total_pages):
+            page_cells = paginate(cells, page, PAGE_SIZES[datatype])[0]
+            try:
+                payload = to_json_plotly(render_view(view, page_cells)).encode('utf-8')
+            except Exception as e:
+                entry['error'] = f"{type(e).__name__}: {e}"
+                break
+            path = page_path(views_dir, cia, prjid, view, page)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(payload)
+            entry['bytes'] += len(payload)
+        if entry['error'] is None:
+            entry['pages'] = total_pages
+        entries.append(entry)
+    return entries
+
+
+def precompute_views(snapshot_path, output_dir, workers=None):
+    """
+    Precalcula las vistas de todas las combinaciones (CIA, PRJID) del snapshot
+    con un pool de procesos. Escribe en un directorio temporal y lo sustituye
+    al final, de modo que un servidor en marcha nunca ve un manifiesto a medias.
+    Devuelve el manifiesto.
+    """
+    from dashboard_snapshot import read_snapshot_header
+    header = read_snapshot_header(snapshot_path)
+    views_dir = os.path.join(output_dir, VIEWS_DIR)
+    tmp_dir = f"{views_dir}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    pairs = [tuple(pair) for pair in header['pairs']]
+    workers = workers or os.cpu_count() or 1
+    entries = []
+    with span("precompute_views", pairs=len(pairs), workers=workers) as s:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot_path,)) as pool:
+            futures = [pool.submit(render_pair, tmp_dir, cia, prjid) for cia, prjid in pairs]
+            for future in futures:
+                entries.extend(future.result())
+        s.set(pages=sum(entry['pages'] for entry in entries), bytes=sum(entry['bytes'] for entry in entries))
+    manifest = {
+        # Identifica el snapshot del que salen las páginas
+        'snapshot_created': header['created'],
+        'snapshot_cells': header['cells'],
+        # Identifica el código que las renderizó
+        'renderer': renderer_version(),
+        'page_sizes': PAGE_SIZES,
+        'views': entries,
+    }
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    old_dir = f"{views_dir}.old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(views_dir):
+        os.replace(views_dir, old_dir)
+    os.replace(tmp_dir, views_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    for entry in entries:
+        if entry['error']:
+            print(f"Aviso: vista {entry['view']} de {entry['cia']}/{entry['prjid']} no precalculada: {entry['error']}")
+    return manifest
+
+
+def load_manifest(views_dir):
+    """
+    Manifiesto de las vistas precalculadas indexado por (CIA, PRJID, vista),
+    cacheado por proceso mientras el fichero no cambie. None si no existe.
+    """
+    path = os.path.join(views_dir, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    with _cache_lock:
+        cached = _manifest_cache.get(views_dir)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, encoding='utf-8') as f:
+            manifest = json.load(f)
+        manifest['index'] = {(entry['cia'], entry['prjid'], entry['view']): entry for entry in manifest['views']}
+        _manifest_cache[views_dir] = (mtime, manifest)
+        return manifest
+
+
+def load_precomputed_page(views_dir, header, cia, prjid, view, page):
+    """
+    Página precalculada de una vista.
+    Devuelve (contenido, página_normalizada, total_páginas, siguiente_página o None, total_celdas)
+    o None si no hay página válida para el snapshot cargado (header) y el
+    renderizado actual (manifiestos de otra versión o anteriores a 'renderer').
+    """
+    manifest = load_manifest(views_dir)
+    if manifest is None or not header:
+        return None
+    if manifest['snapshot_created'] != header.get('created') or manifest['snapshot_cells'] != header.get('cells'):
+        return None
+    if manifest.get('renderer') != renderer_version():
+        return None
+    entry = manifest['index'].get((str(cia), str(prjid), view))
+    if entry is None or entry['error'] or not entry['pages']:
+        return None
+    total_pages = entry['pages']
+    page = min(max(0, page or 0), total_pages - 1)
+    try:
+        with open(page_path(views_dir, cia, prjid, view, page), 'rb') as f:
+            content = json.loads(f.read())
+    except OSError:
+        return None
+    next_page = page + 1 if page + 1 < total_pages else None
+    return content, page, total_pages, next_page, entry['cells']
+
+
+def export_artifacts(output_dir, result, fasg5_filtrados, source=None, workers=None):
+    """
+    Escribe el snapshot y las vistas precalculadas en output_dir.
+    Devuelve (ruta del snapshot, manifiesto).
+    """
+    from dashboard_snapshot import write_snapshot
+    os.makedirs(output_dir, exist_ok=True)
+    snapshot_path = write_snapshot(os.path.join(output_dir, SNAPSHOT_NAME), result, fasg5_filtrados, source=source)
+    return snapshot_path, precompute_views(snapshot_path, output_dir, workers)
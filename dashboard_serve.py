@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Servidor de producción del dashboard.
+
+Arranca N procesos worker detrás de gunicorn. Ninguno lee el Excel: cada
+uno lee con mmap el snapshot de solo lectura (dashboard_snapshot) y lo
+deserializa con pickle.loads en su propia memoria. Los workers no comparten
+los objetos; solo se ahorran el Excel y comparten la caché de disco del
+sistema para el fichero.
+
+Con --artifacts sirve el directorio generado por excel_main.py --output-dir:
+el snapshot y las vistas precalculadas, de modo que las páginas con CIA y
+PRJID no se calculan en línea.
+
+Uso:
+    python dashboard_serve.py --snapshot datos.cdmsnap --workers 4
+    python dashboard_serve.py --snapshot datos.cdmsnap --build   # regenera el snapshot antes
+    python dashboard_serve.py --snapshot datos.cdmsnap --build --excel libro.xlsm
+    python dashboard_serve.py --artifacts artefactos --workers 4
+    python dashboard_serve.py --store datos.sqlite --workers 4   # celdas consultadas con SQL (dashboard_store)
+"""
+import os
+import sys
+import argparse
+
+
+def create_server(snapshot_path, views_dir=None, store_path=None):
+    """
+    Crea la aplicación Dash de un worker a partir del snapshot (o del almacén SQLite)
+    y devuelve el servidor WSGI.
+    """
+    from dashboard_main import create_app
+
+    app = create_app(os.path.abspath(snapshot_path) if snapshot_path else None, allow_close=False,
+                     views_dir=os.path.abspath(views_dir) if views_dir else None,
+                     store_path=os.path.abspath(store_path) if store_path else None)
+    return app.server
+
+
+def serve(snapshot_path, bind, workers, threads, timeout, views_dir=None, store_path=None):
+    """
+    Lanza gunicorn con una aplicación cargada por worker (sin preload).
+    """
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError as e:
+        raise RuntimeError("El modo de producción requiere gunicorn (pip install gunicorn)") from e
+
+    class DashboardApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # Se ejecuta en cada worker tras el fork: cada uno mapea el snapshot
+            return create_server(snapshot_path, views_dir, store_path)
+
+    # Antes del fork: los workers suman sus métricas en un directorio compartido
+    from dash_metrics import prepare_multiprocess_dir
+    prepare_multiprocess_dir()
+    options = {
+        'bind': bind,
+        'workers': workers,
+        'threads': threads,
+        'worker_class': 'gthread' if threads > 1 else 'sync',
+        'timeout': timeout,
+        'preload_app': False,
+        'accesslog': '-',
+    }
+    DashboardApplication(options).run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de producción del dashboard")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--snapshot', help="Ruta del snapshot de datos")
+    source.add_argument('--artifacts', help="Directorio de excel_main.py --output-dir (snapshot y vistas precalculadas)")
+    source.add_argument('--store', help="Almacén SQLite de dashboard_store (las celdas no se cargan en memoria)")
+    parser.add_argument('--build', action='store_true', help="Regenerar el snapshot (y las vistas, con --artifacts) desde el Excel antes de arrancar")
+    parser.add_argument('--excel', default=None, help="Libro Excel de origen para --build (por defecto excel_main.EXCEL_PATH)")
+    parser.add_argument('--bind', default='0.0.0.0:8050', help="Dirección de escucha (host:puerto)")
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) * 2 + 1, help="Número de procesos worker")
+    parser.add_argument('--threads', type=int, default=4, help="Hilos por worker")
+    parser.add_argument('--timeout', type=int, default=120, help="Timeout de petición en segundos")
+    args = parser.parse_args(argv)
+
+    views_dir = None
+    if args.artifacts:
+        from dashboard_precompute import SNAPSHOT_NAME, VIEWS_DIR
+        args.snapshot = os.path.join(args.artifacts, SNAPSHOT_NAME)
+        views_dir = os.path.join(args.artifacts, VIEWS_DIR)
+        if args.build or not os.path.exists(args.snapshot):
+            import excel_main
+            print(f"Generando snapshot y vistas en {args.artifacts}...")
+            if excel_main.cli([args.excel or excel_main.EXCEL_PATH, '--output-dir', args.artifacts]) != 0:
+                return 1
+    elif args.store:
+        if args.build or not os.path.exists(args.store):
+            import excel_main
+            from dashboard_store import write_store
+            excel_path = args.excel or excel_main.EXCEL_PATH
+            print(f"Generando almacén SQLite en {args.store}...")
+            result, fasg5_filtrados = excel_main.main(excel_path)
+            if not result:
+                raise RuntimeError(f"No se extrajeron datos de {excel_path}")
+            write_store(args.store, result, fasg5_filtrados, source=excel_path)
+    elif args.build or not os.path.exists(args.snapshot):
+        from dashboard_snapshot import build_snapshot
+        print(f"Generando snapshot en {args.snapshot}...")
+        build_snapshot(args.snapshot, args.excel)
+
+    if args.store:
+        from dashboard_store import CellStore
+        header = CellStore(args.store).header()
+        print(f"Almacén {args.store}: {header['cells']} celdas, generado {header['created']}")
+    else:
+        from dashboard_snapshot import read_snapshot_header
+        header = read_snapshot_header(args.snapshot)
+        print(f"Snapshot {args.snapshot}: {header['cells']} celdas, generado {header['created']}")
+    print(f"Sirviendo en http://{args.bind} con {args.workers} workers x {args.threads} hilos")
+    serve(args.snapshot, args.bind, args.workers, args.threads, args.timeout, views_dir, args.store)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
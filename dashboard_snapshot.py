@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Snapshot de solo lectura de los datos del dashboard.
+
+Guarda el resultado de excel_main.main() (celdas K/H/T y F_Asg5 filtrado)
+en un único fichero que los procesos del servidor leen con mmap, en lugar
+de que cada uno vuelva a leer el Excel. Cada proceso deserializa el payload
+(pickle.loads) en su propia memoria: los objetos no se comparten entre
+procesos, solo las páginas del fichero en la caché del sistema.
+
+Formato: MAGIC (8 bytes) + longitud de la cabecera (uint32) + cabecera JSON
++ payload pickle. La cabecera se puede leer sin deserializar el payload.
+"""
+import os
+import json
+import mmap
+import pickle
+import struct
+import datetime
+import threading
+from dash_metrics import record_cache
+
+MAGIC = b'CDMSNAP1'
+HEADER_FORMAT = '<I'
+HEADER_OFFSET = len(MAGIC) + struct.calcsize(HEADER_FORMAT)
+
+# Caché por proceso: {ruta: (mtime, snapshot)}
+_snapshot_cache = {}
+_cache_lock = threading.Lock()
+
+
+def build_header(result, source=None):
+    """
+    Cabecera del snapshot: metadatos e índice de filtros (CIA, PRJID).
+    """
+    pairs = sorted({(str(row["CIA"]), str(row["PRJID"])) for row in result})
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'source': source,
+        'cells': len(result),
+        'cias': sorted({cia for cia, _ in pairs}),
+        'prjids': sorted({prjid for _, prjid in pairs}),
+        'pairs': [list(pair) for pair in pairs],
+    }
+
+
+def write_snapshot(path, result, fasg5_filtrados, source=None):
+    """
+    Escribe el snapshot de forma atómica (fichero temporal + os.replace).
+    """
+    header = json.dumps(build_header(result, source)).encode('utf-8')
+    payload = pickle.dumps({'result': result, 'fasg5': fasg5_filtrados}, protocol=pickle.HIGHEST_PROTOCOL)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack(HEADER_FORMAT, len(header)))
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _read_header(buffer):
+    if bytes(buffer[:len(MAGIC)]) != MAGIC:
+        raise ValueError("El fichero no es un snapshot del dashboard")
+    (header_len,) = struct.unpack_from(HEADER_FORMAT, buffer, len(MAGIC))
+    header = json.loads(bytes(buffer[HEADER_OFFSET:HEADER_OFFSET + header_len]).decode('utf-8'))
+    return header, HEADER_OFFSET + header_len
+
+
+def read_snapshot_header(path):
+    """
+    Lee solo la cabecera del snapshot (no toca el payload).
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(HEADER_OFFSET)
+        (header_len,) = struct.unpack_from(HEADER_FORMAT, prefix, len(MAGIC))
+        header, _ = _read_header(prefix + f.read(header_len))
+    return header
+
+
+def load_snapshot(path):
+    """
+    Abre el snapshot con mmap de solo lectura y deserializa el payload.
+    Devuelve {'header': ..., 'result': [...], 'fasg5': {...}}.
+    El resultado se cachea por proceso mientras el fichero no cambie.
+    """
+    mtime = os.stat(path).st_mtime
+    with _cache_lock:
+        cached = _snapshot_cache.get(path)
+        record_cache('snapshot', bool(cached and cached[0] == mtime))
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                header, offset = _read_header(mapped)
+                with memoryview(mapped) as view, view[offset:] as body:
+                    payload = pickle.loads(body)
+        snapshot = {'header': header, 'result': payload['result'], 'fasg5': payload['fasg5']}
+        _snapshot_cache[path] = (mtime, snapshot)
+        return snapshot
+
+
+def build_snapshot(path, excel_path=None):
+    """
+    Ejecuta el pipeline de excel_main sobre excel_path (por defecto
+    excel_main.EXCEL_PATH) y guarda el resultado como snapshot.
+    """
+    import excel_main
+    excel_path = excel_path or excel_main.EXCEL_PATH
+    result, fasg5_filtrados = excel_main.main(excel_path)
+    if not result:
+        raise RuntimeError(f"No se extrajeron datos de {excel_path}")
+    return write_snapshot(path, result, fasg5_filtrados, source=excel_path)
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Exportación estática del dashboard a HTML.
+
+Genera una página por combinación (CIA, PRJID) con las vistas KPI,
+HISTÓRICO y ÁRBOL construidas por los mismos módulos que el dashboard
+(dashboard_kpi_view, dashboard_historic_view, dashboard_tree_view). Los
+componentes Dash se convierten a HTML y cada dcc.Graph se dibuja con
+plotly.js, que se copia una sola vez al directorio y comparten todas las
+páginas. Sustituye a los antiguos HtmlGenerator / LocalHtmlGenerator de
+Obsoleto/.
+
+Las páginas se generan en paralelo en un pool de procesos. El manifiesto
+guarda un hash de los datos de cada combinación: en las exportaciones
+siguientes solo se regeneran las páginas cuyos datos han cambiado.
+
+Uso:
+    python dashboard_static_export.py --snapshot datos.cdmsnap --output-dir informe --workers 4
+    python dashboard_static_export.py --snapshot datos.cdmsnap --output-dir informe --force
+"""
+import os
+import re
+import sys
+import json
+import html
+import hashlib
+import argparse
+from urllib.parse import quote
+from concurrent.futures import ProcessPoolExecutor
+from dashboard_index import build_filter_index, query_cells
+from pipeline_trace import span
+
+# Cambiar al modificar el HTML generado: invalida todas las páginas exportadas
+EXPORT_VERSION = 4
+MANIFEST_NAME = 'manifest.json'
+PLOTLY_BUNDLE = 'plotly.min.js'
+
+# Secciones de cada página: (título, vista de dashboard_precompute, DATATYPE)
+SECTIONS = [
+    ('KPI', 'kpi', 'K'),
+    ('HISTÓRICO', 'historic', 'H'),
+    ('ÁRBOL', 'tree', 'T'),
+]
+
+# Propiedades CSS numéricas que no llevan unidad (como en React)
+UNITLESS_STYLES = {'font-weight', 'z-index', 'opacity', 'flex', 'flex-grow', 'flex-shrink', 'line-height', 'order'}
+# Propiedades de los componentes html.* que se copian como atributos
+ATTRIBUTE_PROPS = {'id': 'id', 'className': 'class', 'title': 'title', 'href': 'href', 'target': 'target',
+                   'colSpan': 'colspan', 'rowSpan': 'rowspan', 'src': 'src', 'alt': 'alt'}
+VOID_TAGS = {'br', 'hr', 'img', 'input'}
+
+PAGE_TEMPLATE = """<!DOCTYPE html>
+<html lang="es">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{bundle}"></script>
+<style>
+body {{ font-family: -apple-system, "Segoe UI", Roboto, Helvetica, Arial, sans-serif; margin: 0; background: #f8f9fa; }}
+.cdm-header {{ padding: 20px 0; border-bottom: 2px solid #4a6fa5; margin-bottom: 20px; text-align: center;
+              background: linear-gradient(to right, #f8f9fa, #e9ecef, #f8f9fa); }}
+.cdm-header h1 {{ color: #2c3e50; margin: 0 0 6px 0; }}
+.cdm-header p {{ color: #6c757d; margin: 0; }}
+.cdm-section > h2 {{ color: #2c3e50; text-align: center; margin: 30px 0 0 0; }}
+.cdm-error {{ color: #dc3545; text-align: center; }}
+</style>
+</head>
+<body>
+<div class="cdm-header"><h1>{title}</h1><p>{subtitle}</p></div>
+{body}
+<script>
+var template = {template};
+var figures = {figures};
+figures.forEach(function (f) {{
+    var layout = Object.assign({{template: template}}, f[1].layout || {{}});
+    Plotly.newPlot(f[0], f[1].data || [], layout, f[2] || {{}});
+}});
+</script>
+</body>
+</html>
+"""
+
+# Índice de filtros de cada proceso del pool (lo carga _init_worker)
+_worker_index = None
+
+
+def _css_name(name):
+    return re.sub(r'([A-Z])', r'-\1', name).lower()
+
+
+def style_to_css(style):
+    """
+    Convierte un style de Dash (claves camelCase) en una declaración CSS en línea.
+    """
+    declarations = []
+    for key, value in (style or {}).items():
+        name = _css_name(key)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and name not in UNITLESS_STYLES and value != 0:
+            value = f"{value}px"
+        declarations.append(f"{name}: {value}")
+    return '; '.join(declarations)
+
+
+class HtmlRenderer:
+    """
+    Convierte el JSON de un árbol de componentes Dash (type/namespace/props)
+    en HTML. Los dcc.Graph se sustituyen por un div y su figura se acumula
+    en `figures` para dibujarla con plotly.js al cargar la página.
+    """
+
+    def __init__(self):
+        self.figures = []
+
+    def render(self, node):
+        if node is None or isinstance(node, bool):
+            return ''
+        if isinstance(node, (list, tuple)):
+            return ''.join(self.render(child) for child in node)
+        if not isinstance(node, dict):
+            return html.escape(str(node))
+        props = node.get('props') or {}
+        if node.get('namespace') == 'dash_html_components':
+            return self._element(node['type'].lower(), props)
+        if node.get('type') == 'Graph':
+            return self._graph(props)
+        # Otros componentes: solo su contenido
+        return self.render(props.get('children'))
+
+    def _attributes(self, props):
+        attributes = []
+        for prop, attribute in ATTRIBUTE_PROPS.items():
+            if props.get(prop) is not None:
+                attributes.append(f' {attribute}="{html.escape(str(props[prop]))}"')
+        if props.get('style'):
+            attributes.append(f' style="{html.escape(style_to_css(props["style"]))}"')
+        if props.get('open'):
+            attributes.append(' open')
+        return ''.join(attributes)
+
+    def _element(self, tag, props):
+        if tag in VOID_TAGS:
+            return f"<{tag}{self._attributes(props)}>"
+        return f"<{tag}{self._attributes(props)}>{self.render(props.get('children'))}</{tag}>"
+
+    def _graph(self, props):
+        graph_id = f"cdm-graph-{len(self.figures)}"
+        self.figures.append([graph_id, props.get('figure') or {}, props.get('config') or {}])
+        return f'<div{self._attributes({"id": graph_id, "style": props.get("style")})}></div>'
+
+
+def page_path(output_dir, cia, prjid):
+    # CIA y PRJID se escapan para que cualquier valor sea un nombre de fichero válido
+    return os.path.join(output_dir, quote(str(cia), safe=''), f"{quote(str(prjid), safe='')}.html")
+
+
+def project_digest(index, cia, prjid):
+    """
+    Hash de los datos de una combinación (todas sus celdas K/H/T) y de la versión del exportador.
+    """
+    import plotly
+    digest = hashlib.sha256(f"{EXPORT_VERSION}:{plotly.__version__}".encode('utf-8'))
+    for _, _, datatype in SECTIONS:
+        cells = query_cells(index, cia, prjid, datatype)
+        digest.update(json.dumps(cells, sort_keys=True, default=str).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def render_project_page(cia, prjid, index, created=None):
+    """
+    HTML completo de la página de una combinación (CIA, PRJID).
+    Una sección que no se puede construir muestra el error y no impide el resto.
+    """
+    from plotly.io.json import to_json_plotly
+    from dashboard_figures import plotly_template
+    from dashboard_precompute import render_view
+    from dashboard_tree_view import render_tree_view
+    renderer = HtmlRenderer()
+    sections = []
+    for title, view, datatype in SECTIONS:
+        cells = query_cells(index, cia, prjid, datatype)
+        if not cells:
+            continue
+        try:
+            # Sin servidor no hay drill-down: los árboles se exportan con todos sus niveles
+            component = render_tree_view(cells, depth=None) if view == 'tree' else render_view(view, cells)
+            content = json.loads(to_json_plotly(component))
+            body = renderer.render(content)
+        except Exception as e:
+            body = f'<p class="cdm-error">No se pudo generar la vista: {html.escape(f"{type(e).__name__}: {e}")}</p>'
+        sections.append(f'<div class="cdm-section"><h2>{html.escape(title)}</h2>{body}</div>')
+    figures = json.dumps(renderer.figures, separators=(',', ':')).replace('</', '<\\/')
+    # La plantilla de plotly se define una vez por página, no en cada figura
+    template = json.dumps(plotly_template(), separators=(',', ':')).replace('</', '<\\/')
+    return PAGE_TEMPLATE.format(
+        title=html.escape(f"{cia} - {prjid}"),
+        subtitle=html.escape(f"Datos del {created}" if created else ""),
+        bundle=f"../{PLOTLY_BUNDLE}",
+        body='\n'.join(sections),
+        template=template,
+        figures=figures,
+    )
+
+
+def _init_worker(snapshot_path):
+    global _worker_index
+    from dashboard_snapshot import load_snapshot
+    _worker_index = build_filter_index(load_snapshot(snapshot_path)['result'])
+
+
+def export_project(output_dir, cia, prjid, previous_digest, created):
+    """
+    Tarea del pool: regenera la página de (CIA, PRJID) si sus datos han cambiado.
+    Devuelve (cia, prjid, hash, bytes escritos o None si no se ha regenerado).
+    """
+    digest = project_digest(_worker_index, cia, prjid)
+    path = page_path(output_dir, cia, prjid)
+    if digest == previous_digest and os.path.exists(path):
+        return cia, prjid, digest, None
+    page = render_project_page(cia, prjid, _worker_index, created).encode('utf-8')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(page)
+    os.replace(tmp_path, path)
+    return cia, prjid, digest, len(page)
+
+
+def write_plotly_bundle(output_dir):
+    """
+    Copia plotly.js al directorio de exportación (una vez, compartido por todas las páginas).
+    """
+    from plotly.offline import get_plotlyjs
+    path = os.path.join(output_dir, PLOTLY_BUNDLE)
+    bundle = get_plotlyjs().encode('utf-8')
+    if not os.path.exists(path) or os.path.getsize(path) != len(bundle):
+        with open(path, 'wb') as f:
+            f.write(bundle)
+    return path
+
+
+def write_index(output_dir, pairs, created=None):
+    """
+    Página de inicio con un enlace por combinación (CIA, PRJID).
+    """
+    by_cia = {}
+    for cia, prjid in pairs:
+        by_cia.setdefault(cia, []).append(prjid)
+    sections = []
+    for cia, prjids in sorted(by_cia.items()):
+        links = ''.join(
+            f'<li><a href="{html.escape(os.path.relpath(page_path(output_dir, cia, prjid), output_dir).replace(os.sep, "/"))}">'
+            f'{html.escape(prjid)}</a></li>' for prjid in sorted(prjids))
+        sections.append(f'<div class="cdm-section"><h2>{html.escape(cia)}</h2><ul>{links}</ul></div>')
+    page = PAGE_TEMPLATE.format(
+        title="Dashboard de Seguimiento",
+        subtitle=html.escape(f"Datos del {created}" if created else ""),
+        bundle=PLOTLY_BUNDLE,
+        body='\n'.join(sections),
+        template='null',
+        figures='[]',
+    )
+    with open(os.path.join(output_dir, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(page)
+
+
+def export_site(snapshot_path, output_dir, workers=None, force=False):
+    """
+    Exporta el sitio estático del snapshot a output_dir.
+    Con force=True regenera todas las páginas aunque sus datos no hayan cambiado.
+    Devuelve (páginas regeneradas, páginas sin cambios, páginas eliminadas).
+    """
+    from dashboard_snapshot import read_snapshot_header
+    header = read_snapshot_header(snapshot_path)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    previous = {}
+    if os.path.exists(manifest_path) and not force:
+        with open(manifest_path, encoding='utf-8') as f:
+            previous = {(entry['cia'], entry['prjid']): entry['digest'] for entry in json.load(f)['pages']}
+    pairs = [tuple(pair) for pair in header['pairs']]
+    workers = workers or os.cpu_count() or 1
+    write_plotly_bundle(output_dir)
+    entries, rebuilt = [], 0
+    with span("static_export", pairs=len(pairs), workers=workers) as s:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(snapshot_path,)) as pool:
+            futures = [pool.submit(export_project, output_dir, cia, prjid, previous.get((cia, prjid)), header['created'])
+                       for cia, prjid in pairs]
+            for future in futures:
+                cia, prjid, digest, size = future.result()
+                entries.append({'cia': cia, 'prjid': prjid, 'digest': digest})
+                if size is not None:
+                    rebuilt += 1
+        s.set(rebuilt=rebuilt)
+    # Páginas de combinaciones que ya no están en los datos
+    removed = 0
+    for cia, prjid in set(previous) - set(pairs):
+        path = page_path(output_dir, cia, prjid)
+        if os.path.exists(path):
+            os.remove(path)
+            removed += 1
+    write_index(output_dir, pairs, header['created'])
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'snapshot_created': header['created'], 'pages': entries}, f, indent=1)
+    return rebuilt, len(pairs) - rebuilt, removed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta el dashboard como sitio HTML estático")
+    parser.add_argument('--snapshot', required=True, help="Snapshot de datos a exportar")
+    parser.add_argument('-o', '--output-dir', required=True, help="Directorio del sitio estático")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos para generar las páginas (por defecto, uno por CPU)")
+    parser.add_argument('--force', action='store_true', help="Regenerar todas las páginas aunque sus datos no hayan cambiado")
+    args = parser.parse_args(argv)
+    rebuilt, unchanged, removed = export_site(os.path.abspath(args.snapshot), args.output_dir, args.workers, args.force)
+    print(f"Sitio estático en {args.output_dir}: {rebuilt} páginas regeneradas, {unchanged} sin cambios, {removed} eliminadas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
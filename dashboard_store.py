@@ -0,0 +1,299 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Almacén SQLite de las celdas del dashboard.
+
+Guarda la salida de structure_data en una base de datos local: KPIs (K),
+puntos históricos (H) y nodos de los árboles (T) aplanados en preorden,
+además de F_Asg5 filtrado. Los callbacks consultan con SQL solo las celdas
+de la página visible, de modo que los datos no tienen que caber en memoria
+y varios procesos worker comparten el mismo fichero.
+
+Un CellStore se puede pasar a dashboard_index.query_cells / query_page en
+lugar del índice en memoria.
+
+Uso:
+    python dashboard_store.py datos.cdmsnap datos.sqlite      # convierte un snapshot
+    python dashboard_serve.py --store datos.sqlite
+"""
+import os
+import sys
+import json
+import sqlite3
+import argparse
+import datetime
+import threading
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE cells (
+    id INTEGER PRIMARY KEY,
+    cia TEXT, prjid TEXT, "row" TEXT, "column" TEXT, datatype TEXT,
+    tree_list INTEGER
+);
+CREATE INDEX cells_filter ON cells (cia, prjid, "row", "column", datatype);
+CREATE TABLE kpi (
+    cell_id INTEGER PRIMARY KEY,
+    kprev REAL, pdte REAL, realprev REAL, pptoprev REAL
+);
+CREATE TABLE historic_points (
+    cell_id INTEGER, seq INTEGER,
+    hprev REAL, ppto REAL, real REAL, wks_date TEXT, wks_serial INTEGER,
+    PRIMARY KEY (cell_id, seq)
+) WITHOUT ROWID;
+CREATE TABLE tree_nodes (
+    cell_id INTEGER, pos INTEGER, parent INTEGER,
+    label TEXT, itm_id TEXT, value REAL,
+    PRIMARY KEY (cell_id, pos)
+) WITHOUT ROWID;
+CREATE INDEX tree_nodes_itm ON tree_nodes (itm_id);
+CREATE INDEX tree_nodes_label ON tree_nodes (cell_id, label);
+CREATE TABLE fasg5 (
+    id INTEGER PRIMARY KEY,
+    cia TEXT, prjid TEXT, itm_id TEXT, data TEXT
+);
+CREATE INDEX fasg5_itm ON fasg5 (itm_id, cia, prjid);
+"""
+
+KPI_FIELDS = ['KPREV', 'PDTE', 'REALPREV', 'PPTOPREV']
+HISTORIC_FIELDS = ['HPREV', 'PPTO', 'REAL']
+
+# Orden de las celdas: el de la lista result (CIA, PRJID, ROW, COLUMN);
+# las H por (ROW, COLUMN), igual que dashboard_index
+CELL_ORDER = {'H': '"row", "column", id'}
+
+
+def _number(value):
+    # Los valores de pandas pueden ser tipos numpy, que sqlite3 no adapta
+    return None if value is None else float(value)
+
+
+def write_store(path, result, fasg5_filtrados, source=None):
+    """
+    Escribe el almacén de forma atómica (fichero temporal + os.replace).
+    """
+    from excel_utils import node_itmid
+    from dashboard_snapshot import build_header
+    from dashboard_tree_view import flatten_tree
+    tmp_path = f"{path}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.execute("INSERT INTO meta VALUES ('header', ?)", (json.dumps(build_header(result, source)),))
+        kpis, points, nodes = [], [], []
+        for cell_id, cell in enumerate(result, start=1):
+            contents = cell.get('DATACONTENTS')
+            if not contents:
+                continue
+            datatype = cell.get('DATATYPE')
+            conn.execute("INSERT INTO cells VALUES (?, ?, ?, ?, ?, ?, ?)", (
+                cell_id, str(cell.get('CIA', '')), str(cell.get('PRJID', '')), str(cell.get('ROW', '')),
+                str(cell.get('COLUMN', '')), datatype, int(isinstance(contents, list)) if datatype == 'T' else None))
+            if datatype == 'K':
+                kpis.append((cell_id, *(_number(contents.get(name)) for name in KPI_FIELDS)))
+            elif datatype == 'H':
+                for seq, point in enumerate(contents):
+                    wks_date = point.get('WKS_DATE')
+                    wks_serial = point.get('WKS_SERIAL')
+                    points.append((cell_id, seq, *(_number(point.get(name)) for name in HISTORIC_FIELDS),
+                                   wks_date.isoformat() if wks_date is not None else None,
+                                   int(wks_serial) if wks_serial is not None else None))
+            elif datatype == 'T':
+                labels, parents, values = flatten_tree(contents)
+                nodes.extend((cell_id, pos, parent, label, node_itmid(label), _number(value))
+                             for pos, (label, parent, value) in enumerate(zip(labels, parents, values)))
+        conn.executemany("INSERT INTO kpi VALUES (?, ?, ?, ?, ?)", kpis)
+        conn.executemany("INSERT INTO historic_points VALUES (?, ?, ?, ?, ?, ?, ?)", points)
+        conn.executemany("INSERT INTO tree_nodes VALUES (?, ?, ?, ?, ?, ?)", nodes)
+        conn.executemany("INSERT INTO fasg5 (cia, prjid, itm_id, data) VALUES (?, ?, ?, ?)", (
+            (str(cia), str(prjid), str(row.get('ITMID', '')), json.dumps(row, default=str))
+            for (cia, prjid), rows in (fasg5_filtrados or {}).items() for row in rows))
+        conn.commit()
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    os.replace(tmp_path, path)
+    return path
+
+
+class CellStore:
+    """
+    Acceso de solo lectura al almacén SQLite.
+    Cada hilo usa su propia conexión; si el fichero se sustituye en disco
+    (nuevo write_store) las conexiones se reabren en la siguiente consulta.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(path)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._version = None
+        self._header = None
+
+    def _file_version(self):
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_mtime_ns
+
+    def _connection(self):
+        version = self._file_version()
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.version != version:
+            if conn is not None:
+                conn.close()
+            conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.conn, self._local.version = conn, version
+        return conn
+
+    def data_version(self):
+        """
+        Versión de los datos: cambia cuando el fichero se sustituye en disco.
+        """
+        return self._file_version()
+
+    def header(self):
+        """
+        Cabecera de los datos (misma forma que la del snapshot), cacheada mientras el fichero no cambie.
+        """
+        version = self._file_version()
+        with self._lock:
+            if self._version != version:
+                (value,) = self._connection().execute("SELECT value FROM meta WHERE key = 'header'").fetchone()
+                self._header, self._version = json.loads(value), version
+            return self._header
+
+    def _where(self, cia, prjid, datatype):
+        clauses, params = ['datatype = ?'], [datatype]
+        if cia:
+            clauses.append('cia = ?')
+            params.append(str(cia))
+        if prjid:
+            clauses.append('prjid = ?')
+            params.append(str(prjid))
+        return ' AND '.join(clauses), params
+
+    def count_cells(self, cia, prjid, datatype):
+        where, params = self._where(cia, prjid, datatype)
+        return self._connection().execute(f"SELECT COUNT(*) FROM cells WHERE {where}", params).fetchone()[0]
+
+    def query_cells(self, cia, prjid, datatype, limit=-1, offset=0):
+        """
+        Celdas de un DATATYPE que cumplen el filtro, con el mismo formato que
+        las filas de result. limit/offset recortan en SQL la página pedida.
+        """
+        conn = self._connection()
+        where, params = self._where(cia, prjid, datatype)
+        order = CELL_ORDER.get(datatype, 'id')
+        rows = conn.execute(f'SELECT id, cia, prjid, "row", "column", tree_list FROM cells WHERE {where} '
+                            f'ORDER BY {order} LIMIT ? OFFSET ?', params + [limit, offset]).fetchall()
+        if not rows:
+            return []
+        ids = [row[0] for row in rows]
+        contents = self._contents(conn, datatype, ids, {row[0]: row[5] for row in rows})
+        return [{'CIA': cia_, 'PRJID': prjid_, 'ROW': row_, 'COLUMN': column, 'DATATYPE': datatype,
+                 'DATACONTENTS': contents[cell_id]} for cell_id, cia_, prjid_, row_, column, _ in rows]
+
+    def find_cell(self, cia, prjid, row, column, datatype):
+        """
+        Una celda (mismo formato que query_cells), o None si no está.
+        """
+        conn = self._connection()
+        found = conn.execute('SELECT id, tree_list FROM cells WHERE cia = ? AND prjid = ? AND "row" = ? AND "column" = ? '
+                             'AND datatype = ?', (str(cia), str(prjid), str(row), str(column), datatype)).fetchone()
+        if found is None:
+            return None
+        cell_id, tree_list = found
+        contents = self._contents(conn, datatype, [cell_id], {cell_id: tree_list})
+        return {'CIA': str(cia), 'PRJID': str(prjid), 'ROW': str(row), 'COLUMN': str(column), 'DATATYPE': datatype,
+                'DATACONTENTS': contents.get(cell_id)}
+
+    def _contents(self, conn, datatype, ids, tree_list):
+        placeholders = ','.join('?' * len(ids))
+        contents = {}
+        if datatype == 'K':
+            for cell_id, *values in conn.execute(f"SELECT cell_id, kprev, pdte, realprev, pptoprev FROM kpi "
+                                                 f"WHERE cell_id IN ({placeholders})", ids):
+                contents[cell_id] = dict(zip(KPI_FIELDS, values))
+        elif datatype == 'H':
+            for cell_id, hprev, ppto, real, wks_date, wks_serial in conn.execute(
+                    f"SELECT cell_id, hprev, ppto, real, wks_date, wks_serial FROM historic_points "
+                    f"WHERE cell_id IN ({placeholders}) ORDER BY cell_id, seq", ids):
+                contents.setdefault(cell_id, []).append({
+                    'HPREV': hprev, 'PPTO': ppto, 'REAL': real,
+                    'WKS_DATE': datetime.date.fromisoformat(wks_date) if wks_date else None,
+                    'WKS_SERIAL': wks_serial,
+                })
+        else:
+            nodes = {}
+            for cell_id, parent, label, value in conn.execute(
+                    f"SELECT cell_id, parent, label, value FROM tree_nodes "
+                    f"WHERE cell_id IN ({placeholders}) ORDER BY cell_id, pos", ids):
+                cell_nodes = nodes.setdefault(cell_id, [])
+                node = {'id': label, 'value': value, 'children': []}
+                if parent >= 0:
+                    cell_nodes[parent]['children'].append(node)
+                cell_nodes.append(node)
+                if parent < 0:
+                    contents.setdefault(cell_id, []).append(node)
+            for cell_id, roots in contents.items():
+                if not tree_list.get(cell_id):
+                    contents[cell_id] = roots[0]
+        return contents
+
+    def query_page(self, cia, prjid, datatype, page, page_size):
+        """
+        Página de celdas (mismo resultado que dashboard_index.paginate sobre query_cells).
+        """
+        total = self.count_cells(cia, prjid, datatype)
+        total_pages = max(1, -(-total // page_size))
+        page = min(max(0, page or 0), total_pages - 1)
+        next_page = page + 1 if page + 1 < total_pages else None
+        cells = self.query_cells(cia, prjid, datatype, limit=page_size, offset=page * page_size)
+        return cells, page, total_pages, next_page, total
+
+    def find_leaf(self, cia, prjid, row, column, node_id):
+        """
+        Valor de la hoja node_id del árbol de una celda, o None si no es una hoja
+        (en preorden, un nodo con hijos tiene el primero en la posición siguiente).
+        """
+        conn = self._connection()
+        found = conn.execute('SELECT n.cell_id, n.pos, n.value FROM cells c JOIN tree_nodes n ON n.cell_id = c.id '
+                             'WHERE c.cia = ? AND c.prjid = ? AND c."row" = ? AND c."column" = ? AND c.datatype = \'T\' '
+                             'AND n.label = ?', (str(cia), str(prjid), str(row), str(column), str(node_id))).fetchone()
+        if found is None:
+            return None
+        cell_id, pos, value = found
+        child = conn.execute("SELECT 1 FROM tree_nodes WHERE cell_id = ? AND pos = ? AND parent = ?",
+                             (cell_id, pos + 1, pos)).fetchone()
+        return None if child else value
+
+    def fasg5_rows(self, cia, prjid, itm_id):
+        """
+        Filas de F_Asg5 de un item (ITMID, ver excel_utils.node_itmid; CIA y PRJID opcionales).
+        """
+        clauses, params = ['itm_id = ?'], [str(itm_id)]
+        if cia:
+            clauses.append('cia = ?')
+            params.append(str(cia))
+        if prjid:
+            clauses.append('prjid = ?')
+            params.append(str(prjid))
+        rows = self._connection().execute(f"SELECT data FROM fasg5 WHERE {' AND '.join(clauses)} ORDER BY id", params)
+        return [json.loads(data) for (data,) in rows]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convierte un snapshot del dashboard en un almacén SQLite")
+    parser.add_argument('snapshot', help="Snapshot de origen")
+    parser.add_argument('store', help="Base de datos SQLite a escribir")
+    args = parser.parse_args(argv)
+    from dashboard_snapshot import load_snapshot
+    snapshot = load_snapshot(args.snapshot)
+    write_store(args.store, snapshot['result'], snapshot['fasg5'], source=snapshot['header'].get('source'))
+    print(f"Almacén {args.store}: {snapshot['header']['cells']} celdas, {os.path.getsize(args.store) / 1_000_000:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,61 +4,251 @@ Dashboard Tree View (Árbol de Costes)
 Visualización específica para los datos de tipo árbol de costes (DATATYPE="T").
 """
 
-import plotly.graph_objects as go
+import threading
+from collections import OrderedDict
 from dash import html, dcc
-import json
-import pandas as pd
-import numpy as np
 
 # Función create_tree_view eliminada
 
-def create_treemap_figure(tree_structure, title=""):
+# Hijos que se conservan por nodo en cada nivel; el resto se agrupa en "Otros"
+TREEMAP_TOP_N = 20
+OTHERS_LABEL = "Otros"
+# Niveles que se envían al navegador; los demás se piden al hacer clic en un nodo (drill-down)
+TREEMAP_DEPTH = 3
+# Índices de árbol (build_tree_index) que se mantienen en memoria por proceso
+TREE_INDEX_CACHE_SIZE = 256
+
+_tree_index_cache = OrderedDict()
+_tree_index_lock = threading.Lock()
+
+def create_treemap_figure(tree_structure, title="", top_n=TREEMAP_TOP_N, depth=TREEMAP_DEPTH, root=None, key=None):
     """
-    Crea una figura de treemap usando Plotly Express a partir de una estructura de árbol jerárquica.
+    Crea la figura treemap de un árbol (dict raíz o lista de raíces) a partir
+    de sus listas aplanadas, podado a top_n hijos por nodo y limitado a depth
+    niveles desde root (posición en preorden; None: desde las raíces).
+    top_n=None o depth=None desactivan la poda o el límite de niveles.
+    key es la clave de caché del índice del árbol (ver get_tree_index).
     Usa 'id' como etiqueta visible.
     """
-    import plotly.express as px
+    return index_treemap_figure(get_tree_index(tree_structure, key), title, top_n, depth, root)
 
-    # Si tree_structure es una lista de raíces, pásala directamente
-    # Si es un solo dict raíz, conviértelo en lista
-    if isinstance(tree_structure, dict):
-        tree_structure = [tree_structure]
+def index_treemap_figure(index, title="", top_n=TREEMAP_TOP_N, depth=TREEMAP_DEPTH, root=None):
+    """
+    Como create_treemap_figure, a partir del índice del árbol (build_tree_index).
+    """
+    from dashboard_figures import treemap_spec
+    labels, parents, values = subtree_arrays(index, root, depth)
+    pruned = prune_tree(labels, parents, values, top_n=top_n)
+    parent_ids = [pruned['ids'][parent] if parent >= 0 else '' for parent in pruned['parents']]
+    return treemap_spec(pruned['ids'], pruned['labels'], parent_ids, leaf_values(pruned['parents'], pruned['values']), title=title)
 
-    # Plotly Express espera un DataFrame o una lista de dicts con claves 'id', 'parent', 'value'
-    # Pero si tienes jerarquía, puedes usar el parámetro path
-    # Vamos a construir un DataFrame solo si es necesario, pero intentaremos usar path
+def build_tree_index(tree_structure):
+    """
+    Índice de un árbol: las listas de flatten_tree más la profundidad de cada
+    nodo, el final de su subárbol en el preorden (el subárbol del nodo i ocupa
+    las posiciones [i, ends[i])) y la posición de cada id.
+    """
+    labels, parents, values = flatten_tree(tree_structure)
+    depths = [0] * len(labels)
+    for node, parent in enumerate(parents):
+        if parent >= 0:
+            depths[node] = depths[parent] + 1
+    # Recorrido inverso: los descendientes van después de su nodo en el preorden
+    ends = list(range(1, len(labels) + 1))
+    for node in range(len(labels) - 1, -1, -1):
+        parent = parents[node]
+        if parent >= 0 and ends[node] > ends[parent]:
+            ends[parent] = ends[node]
+    return {
+        'labels': labels,
+        'parents': parents,
+        'values': values,
+        'depths': depths,
+        'ends': ends,
+        'positions': {label: position for position, label in enumerate(labels)},
+    }
 
-    # Si tus nodos tienen 'children', necesitas convertir la jerarquía a un DataFrame con path
-    # Pero si tienes una estructura simple, puedes hacer:
-    import pandas as pd
+def tree_cache_key(cell, data_version):
+    """
+    Clave de caché del índice del árbol de una tarjeta: la celda del dcc.Store
+    de la tarjeta ({'cia', 'prjid', 'row', 'column', 'version'}) y la versión
+    de los datos cargados (un almacén SQLite reconstruye los árboles en cada
+    consulta, así que el objeto árbol no sirve como clave).
+    """
+    return (cell['cia'], cell['prjid'], cell['row'], cell['column'], cell.get('version'), data_version)
+
+def get_tree_index(tree_structure, key=None):
+    """
+    build_tree_index cacheado. Con key (tree_cache_key) la caché se consulta
+    por clave; sin ella, por objeto árbol (los árboles del snapshot no cambian
+    mientras están cargados).
+    """
+    cache_key = key if key is not None else id(tree_structure)
+    with _tree_index_lock:
+        cached = _tree_index_cache.get(cache_key)
+        if cached is not None and (key is not None or cached[0] is tree_structure):
+            _tree_index_cache.move_to_end(cache_key)
+            return cached[1]
+    index = build_tree_index(tree_structure)
+    with _tree_index_lock:
+        _tree_index_cache[cache_key] = (None if key is not None else tree_structure, index)
+        while len(_tree_index_cache) > TREE_INDEX_CACHE_SIZE:
+            _tree_index_cache.popitem(last=False)
+    return index
+
+def cached_tree_index(key):
+    """
+    Índice cacheado con la clave key (tree_cache_key), o None si no está.
+    """
+    with _tree_index_lock:
+        cached = _tree_index_cache.get(key)
+        if cached is None:
+            return None
+        _tree_index_cache.move_to_end(key)
+        return cached[1]
+
+def clear_tree_index_cache():
+    """
+    Vacía la caché de get_tree_index (benchmarks: medir el primer renderizado de cada árbol).
+    """
+    with _tree_index_lock:
+        _tree_index_cache.clear()
 
-    def extract_paths(node, path=None):
-        if path is None:
-            path = []
-        current_path = path + [node["id"]]
-        rows = []
-        if "children" in node and node["children"]:
-            for child in node["children"]:
-                rows.extend(extract_paths(child, current_path))
+def subtree_arrays(index, root=None, depth=TREEMAP_DEPTH):
+    """
+    Listas (labels, parents, values) del subárbol del nodo root (None: todo el
+    árbol) hasta depth niveles. Los nodos del último nivel conservan su valor
+    total y se muestran como hojas; sus descendientes se saltan con ends, sin recorrerlos.
+    """
+    if root is None:
+        node, end, base = 0, len(index['labels']), 0
+    else:
+        node, end, base = root, index['ends'][root], index['depths'][root]
+    labels, parents, values = [], [], []
+    positions = {}
+    while node < end:
+        parent = index['parents'][node]
+        positions[node] = len(labels)
+        labels.append(index['labels'][node])
+        parents.append(positions.get(parent, -1))
+        values.append(index['values'][node])
+        if depth and index['depths'][node] - base + 1 >= depth:
+            node = index['ends'][node]
+        else:
+            node += 1
+    return labels, parents, values
+
+def leaf_values(parents, values):
+    """
+    Valores para branchvalues='remainder': el propio en las hojas y 0 en los nodos internos.
+    """
+    is_parent = [False] * len(values)
+    for parent in parents:
+        if parent >= 0:
+            is_parent[parent] = True
+    return [0 if internal else value for internal, value in zip(is_parent, values)]
+
+def prune_tree(labels, parents, values, top_n=TREEMAP_TOP_N):
+    """
+    Poda un árbol aplanado (flatten_tree): en cada nivel conserva los top_n
+    hijos de mayor valor de cada nodo (selección con heap) y agrupa el resto
+    en un nodo "Otros" cuyo valor es la suma de los agrupados, de modo que
+    los totales no cambian. Los subárboles agrupados no se recorren.
+    Devuelve {'ids', 'labels', 'parents' (índices en las listas podadas, -1 en
+    raíces), 'values', 'sources' (índices originales que representa cada nodo)}.
+    """
+    import heapq
+    children = {}
+    for node, parent in enumerate(parents):
+        children.setdefault(parent, []).append(node)
+    pruned = {'ids': [], 'labels': [], 'parents': [], 'values': [], 'sources': []}
+
+    def add(node_id, label, parent, value, sources):
+        pruned['ids'].append(node_id)
+        pruned['labels'].append(label)
+        pruned['parents'].append(parent)
+        pruned['values'].append(value)
+        pruned['sources'].append(sources)
+        return len(pruned['ids']) - 1
+
+    # (nodo original, posición de su padre en las listas podadas)
+    stack = [(-1, -1)]
+    while stack:
+        node, position = stack.pop()
+        siblings = children.get(node, [])
+        if top_n and len(siblings) > top_n:
+            selected = heapq.nlargest(top_n, siblings, key=values.__getitem__)
+            kept = set(selected)
+            merged = [child for child in siblings if child not in kept]
+            parent_id = pruned['ids'][position] if position >= 0 else ''
+            add(f"{parent_id}/{OTHERS_LABEL}" if parent_id else OTHERS_LABEL, f"{OTHERS_LABEL} ({len(merged)})",
+                position, sum(values[child] for child in merged), merged)
         else:
-            # Nodo hoja
-            rows.append({"path": current_path, "value": node.get("value", 0)})
-        return rows
+            selected = siblings
+        for child in selected:
+            stack.append((child, add(labels[child], labels[child], position, values[child], [child])))
+    return pruned
 
-    flat_rows = []
-    for root in tree_structure:
-        flat_rows.extend(extract_paths(root))
+def flatten_tree(tree_structure):
+    """
+    Aplana un árbol en formato treemap a listas paralelas en preorden.
+    Devuelve (labels, parents, values); parents es el índice del padre (-1 en las raíces).
+    """
+    if isinstance(tree_structure, dict):
+        tree_structure = [tree_structure]
+    labels, parents, values = [], [], []
+    stack = [(root, -1) for root in reversed(tree_structure)]
+    while stack:
+        node, parent = stack.pop()
+        position = len(labels)
+        labels.append(node["id"])
+        parents.append(parent)
+        values.append(node.get("value", 0))
+        for child in reversed(node.get("children") or []):
+            stack.append((child, position))
+    return labels, parents, values
 
-    df = pd.DataFrame(flat_rows)
+# Escala divergente de la vista "cambios": verde si baja, rojo si sube
+CHANGES_COLORSCALE = [[0, '#28a745'], [0.5, '#f8f9fa'], [1, '#dc3545']]
 
-    fig = px.treemap(
-        df,
-        path=['path'],
-        values='value',
-        title=title
+def create_treemap_changes_figure(changes, title="", top_n=TREEMAP_TOP_N):
+    """
+    Treemap coloreado por la variación de cada nodo respecto a la versión base
+    (ver tree_diff.cell_changes), con la misma poda que create_treemap_figure.
+    Los nodos nuevos se marcan con borde azul; "Otros" suma las variaciones agrupadas.
+    """
+    import numpy as np
+    from dashboard_figures import treemap_spec
+    pruned = prune_tree(changes['labels'], changes['parents'].tolist(), changes['values'].tolist(), top_n=top_n)
+    old_values = np.nan_to_num(changes['old_value'])
+    deltas, added, hover = [], [], []
+    for sources, value in zip(pruned['sources'], pruned['values']):
+        delta = float(changes['delta'][sources].sum())
+        deltas.append(delta)
+        added.append(bool(changes['added'][sources].all()))
+        if added[-1]:
+            hover.append(f"Nuevo: {value:,.2f}")
+        else:
+            hover.append(f"Anterior: {old_values[sources].sum():,.2f}<br>Actual: {value:,.2f}<br>Cambio: {delta:+,.2f}")
+    limit = max((abs(delta) for delta in deltas), default=0.0)
+    parent_ids = [pruned['ids'][parent] if parent >= 0 else '' for parent in pruned['parents']]
+    return treemap_spec(
+        pruned['ids'], pruned['labels'], parent_ids, leaf_values(pruned['parents'], pruned['values']), title=title,
+        text=hover,
+        hovertemplate='%{label}<br>%{text}<extra></extra>',
+        marker={
+            'colors': deltas,
+            'colorscale': CHANGES_COLORSCALE,
+            'cmid': 0,
+            'cmin': -limit,
+            'cmax': limit,
+            'showscale': True,
+            'line': {
+                'color': ['#4a6fa5' if is_new else '#ffffff' for is_new in added],
+                'width': [3 if is_new else 1 for is_new in added],
+            },
+        },
     )
-    fig.update_layout(margin=dict(t=40, l=0, r=0, b=0))
-    return fig
 
 def debug_tree_json(tree_structure):
     """
@@ -100,6 +290,7 @@ def export_tree_to_excel(tree_structure, filename="tree_structure.xlsx"):
     process_node(tree_structure)
     
     # Crear DataFrame
+    import pandas as pd
     df = pd.DataFrame(flat_data)
     
     # Exportar a Excel
@@ -113,9 +304,15 @@ def debug_tree_structure(tree_structure, level=0, prefix=""):
     pass
 
 
-def render_tree_view(data):
+def render_tree_view(data, changes=None, version=None, depth=TREEMAP_DEPTH, data_version=None):
     """
-    Renderiza la vista de árbol utilizando los datos de tipo T
+    Renderiza la vista de árbol utilizando los datos de tipo T.
+    Cada treemap muestra depth niveles; su dcc.Store identifica la celda
+    (y la versión del historial) para que el callback de drill-down sirva el
+    subárbol del nodo pulsado. Con data_version los índices de los árboles se
+    cachean por celda (tree_cache_key) y el drill-down los reutiliza. Con changes (resultado de tree_diff.diff_cells)
+    cada árbol se colorea por su variación respecto a la versión base, completo
+    y sin drill-down, y se listan los subárboles eliminados.
     """
     from dash import html, dcc  # Asegúrate de importar si no está
     def clean_label(label):
@@ -129,19 +326,35 @@ def render_tree_view(data):
     
     # Procesamos los datos para convertirlos en estructura de árbol
     tree_cards = []
-    for row in tree_data:
+    for card_index, row in enumerate(tree_data):
         if not row.get("DATACONTENTS"):
             continue
         
         tree_structure = row.get("DATACONTENTS", [])
         title = f"{clean_label(row.get('ROW', ''))} - {clean_label(row.get('COLUMN', ''))}"
         
-        fig = create_treemap_figure(tree_structure, title="")
+        removed = []
+        cell = None
+        cell_changes = None
+        if changes is not None:
+            from tree_diff import cell_key, cell_changes as get_cell_changes
+            cell_changes = get_cell_changes(changes, cell_key(row))
+        if cell_changes is not None:
+            fig = create_treemap_changes_figure(cell_changes, title="")
+            if cell_changes['removed_subtrees']:
+                removed = [html.Div("Eliminados respecto a la versión base:", style={'fontWeight': '600', 'marginTop': '8px'}),
+                           html.Ul([html.Li(f"{label} ({value:,.2f})") for label, value in cell_changes['removed_subtrees']])]
+        else:
+            cell = {'cia': str(row.get('CIA', '')), 'prjid': str(row.get('PRJID', '')), 'row': str(row.get('ROW', '')),
+                    'column': str(row.get('COLUMN', '')), 'version': version, 'root': None}
+            key = tree_cache_key(cell, data_version) if data_version is not None else None
+            fig = create_treemap_figure(tree_structure, title="", depth=depth, key=key)
         card = html.Div([
             html.H5(title, style={'margin': '0', 'color': '#fff', 'fontWeight': '600', 'padding': '12px 15px', 'borderRadius': '5px 5px 0 0', 'background': 'linear-gradient(135deg, #4a6fa5 0%, #2c3e50 100%)'}),
             html.Div([
-                dcc.Graph(figure=fig, id='treemap-graph', config={'displayModeBar': False})
-            ], style={'padding': '15px'})
+                dcc.Graph(figure=fig, id={'type': 'treemap-graph', 'index': card_index}, config={'displayModeBar': False}),
+                dcc.Store(id={'type': 'treemap-cell', 'index': card_index}, data=cell)
+            ] + removed, style={'padding': '15px'})
         ], style={
             'margin': '12px',
             'border': '1px solid #dee2e6',
@@ -2,19 +2,27 @@
 # -*- coding: utf-8 -*-
 """
 Extractor de datos desde Excel para el dashboard
+
+Uso desde línea de comandos (snapshot + vistas precalculadas):
+    python excel_main.py libro.xlsm --output-dir artefactos --workers 8
+    python excel_main.py libro.xlsm --historic-sheet FrmBB_2 --kpi-sheet FrmBB_3 --tree-sheet F_Asg3 --itm-sheet F_Asg5 -o artefactos
 """
 import os
 import sys
+import argparse
 import pandas as pd
 import datetime
 from excel_utils import extract_tree_data, procesar_datos_arbol
 from excel_utils import extraer_itmids_hoja, filtrar_fasg5_por_itmids
+import pipeline_trace
+from pipeline_trace import span
 
 # Valores hardcodeados del Excel y sus hojas
 EXCEL_PATH = "/Users/didac/Downloads/StoryMac/DashBTracker/PruebasCdM/Tchart_V06.xlsm"
 HISTORIC_SHEET = "FrmBB_2"
 KPI_SHEET = "FrmBB_3"
 TREE_SHEET = "F_Asg3"  # Corregido: F_Asg3 en lugar de FrmBB_4
+ITM_SHEET = "F_Asg5"
 
 def wks_to_date(wks):
     """
@@ -55,6 +63,29 @@ def extract_historic_data(excel_path, sheet_name):
     except Exception as e:
         return []
 
+def extract_new_historic_data(excel_path, sheet_name, last_serials, default_serial=float('-inf')):
+    """
+    Como extract_historic_data, pero solo devuelve las filas nuevas: aquellas
+    cuyo WKS es posterior a la última semana conocida de su celda.
+    last_serials: {(CIA, PRJID, ROW, COLUMN): último WKS_SERIAL} (claves como texto);
+    las celdas que no están usan default_serial (por defecto, todas sus filas
+    son nuevas). El filtrado es vectorizado y
+    wks_to_date se evalúa una vez por valor distinto de WKS, no por fila.
+    Las filas con WKS no válido se descartan: no se pueden ordenar en la serie.
+    """
+    df = pd.read_excel(excel_path, sheet_name=sheet_name, dtype={'WKS': str, 'PRJID': str})
+    if df.empty:
+        return []
+    wks_values = {wks: wks_to_date(wks) for wks in df['WKS'].unique()}
+    serials = df['WKS'].map(lambda wks: wks_values[wks][1]).astype(float)
+    keys = (df['CIA'].astype(str) + '\x1f' + df['PRJID'].astype(str) + '\x1f'
+            + df['ROW'].astype(str).str.strip() + '\x1f' + df['COLUMN'].astype(str).str.strip())
+    known = keys.map({'\x1f'.join(key): serial for key, serial in last_serials.items()}).astype(float).fillna(default_serial)
+    new_rows = df[serials.notna() & (serials > known)].copy()
+    new_rows['WKS_DATE'] = new_rows['WKS'].map(lambda wks: wks_values[wks][0])
+    new_rows['WKS_SERIAL'] = new_rows['WKS'].map(lambda wks: wks_values[wks][1])
+    return new_rows.to_dict(orient="records")
+
 def extract_kpi_data(excel_path, sheet_name):
     """
     Extrae datos KPI desde una hoja de Excel.
@@ -158,7 +189,9 @@ def structure_data(historic_data, kpi_data, tree_data):
 
         for row_key, items in tree_by_row.items():
             cia, prjid, row = row_key
-            column_structures = procesar_datos_arbol(items)
+            with span("tree_rollup", cia=cia, prjid=prjid, row=row, rows=len(items)) as s:
+                column_structures = procesar_datos_arbol(items)
+                s.set(trees=sum(1 for tree in column_structures.values() if tree is not None))
             for column, tree_structure in column_structures.items():
                 if tree_structure is not None:
                     if cia not in structured_data:
@@ -267,7 +300,7 @@ def extract_itm_data(excel_path, sheet_name="F_Asg5"):
         df = pd.read_excel(excel_path, sheet_name=sheet_name, dtype={
             'CIA': str,
             'PRJID': str,
-            'itm_id': str  # Aseguramos que itm_id sea string para comparaciones consistentes
+            'ITMID': str  # Aseguramos que ITMID sea string para compararlo con el ITMID de las hojas (node_itmid)
         })
         
         # Convertir a lista de diccionarios
@@ -276,88 +309,114 @@ def extract_itm_data(excel_path, sheet_name="F_Asg5"):
         print(f"Error al extraer datos de {sheet_name}: {e}")
         return []
 
-def main():
+def main(excel_path=None, historic_sheet=HISTORIC_SHEET, kpi_sheet=KPI_SHEET, tree_sheet=TREE_SHEET, itm_sheet=ITM_SHEET):
     """
     Función principal que extrae y procesa los datos del Excel
+    (por defecto EXCEL_PATH y las hojas estándar)
     """
+    excel_path = excel_path or EXCEL_PATH
+    # Trace de Chrome opcional de todo el refresco
+    chrome_trace_path = os.environ.get("CDM_CHROME_TRACE")
+    if chrome_trace_path:
+        pipeline_trace.start_chrome_trace()
+    try:
+        with span("excel_main", path=excel_path):
+            return _run_pipeline(excel_path, historic_sheet, kpi_sheet, tree_sheet, itm_sheet)
+    finally:
+        if chrome_trace_path:
+            pipeline_trace.export_chrome_trace(chrome_trace_path)
+
+def _run_pipeline(excel_path, historic_sheet, kpi_sheet, tree_sheet, itm_sheet):
     # Extraer datos
-    historic_data = extract_historic_data(EXCEL_PATH, HISTORIC_SHEET)
-    kpi_data = extract_kpi_data(EXCEL_PATH, KPI_SHEET)
-    tree_data = extract_tree_data(EXCEL_PATH, TREE_SHEET)
+    with span("sheet_parse", labels={"sheet": historic_sheet}) as s:
+        historic_data = extract_historic_data(excel_path, historic_sheet)
+        s.set(rows=len(historic_data))
+    with span("sheet_parse", labels={"sheet": kpi_sheet}) as s:
+        kpi_data = extract_kpi_data(excel_path, kpi_sheet)
+        s.set(rows=len(kpi_data))
+    with span("sheet_parse", labels={"sheet": tree_sheet}) as s:
+        tree_data = extract_tree_data(excel_path, tree_sheet)
+        s.set(rows=len(tree_data))
+    
+    # Extraer datos de F_Asg5 (ahora llamada itm_data)
+    with span("sheet_parse", labels={"sheet": itm_sheet}) as s:
+        itm_data = extract_itm_data(excel_path, itm_sheet)
+        s.set(rows=len(itm_data))
     
+    return build_result(historic_data, kpi_data, tree_data, itm_data)
+
+def build_result(historic_data, kpi_data, tree_data, itm_data):
+    """
+    Construye los datos del dashboard a partir de los registros de las hojas:
+    estructura, lista plana ordenada y F_Asg5 filtrado por CIA+PRJID.
+    """
     # Estructurar datos
-    structured_data = structure_data(historic_data, kpi_data, tree_data)
+    with span("structure_data", rows=len(historic_data) + len(kpi_data) + len(tree_data)) as s:
+        structured_data = structure_data(historic_data, kpi_data, tree_data)
+        s.set(cias=len(structured_data))
     
     # Convertir a lista plana
-    result = []
-    for cia, cia_data in structured_data.items():
-        for prjid, prjid_data in cia_data.items():
-            for row, row_data in prjid_data.items():
-                for column, col_data in row_data.items():
-                    # Verificar KPI
-                    if "K" in col_data and col_data["K"] is not None:
-                        result.append({
-                            "CIA": cia,
-                            "PRJID": prjid,
-                            "ROW": row,
-                            "COLUMN": column,
-                            "DATATYPE": "K",
-                            "DATACONTENTS": col_data["K"]
-                        })
-                    # Verificar Histórico
-                    if "H" in col_data and col_data["H"] is not None:
-                        result.append({
-                            "CIA": cia,
-                            "PRJID": prjid,
-                            "ROW": row,
-                            "COLUMN": column,
-                            "DATATYPE": "H",
-                            "DATACONTENTS": col_data["H"]
-                        })
-                    # Verificar Árbol
-                    if "T" in col_data and col_data["T"] is not None:
-                        # El árbol ya está en formato treemap
-                        result.append({
-                            "CIA": cia,
-                            "PRJID": prjid,
-                            "ROW": row,
-                            "COLUMN": column,
-                            "DATATYPE": "T",
-                            "DATACONTENTS": col_data["T"]
-                        })
+    with span("flatten") as s:
+        result = []
+        for cia, cia_data in structured_data.items():
+            for prjid, prjid_data in cia_data.items():
+                for row, row_data in prjid_data.items():
+                    for column, col_data in row_data.items():
+                        # Verificar KPI
+                        if "K" in col_data and col_data["K"] is not None:
+                            result.append({
+                                "CIA": cia,
+                                "PRJID": prjid,
+                                "ROW": row,
+                                "COLUMN": column,
+                                "DATATYPE": "K",
+                                "DATACONTENTS": col_data["K"]
+                            })
+                        # Verificar Histórico
+                        if "H" in col_data and col_data["H"] is not None:
+                            result.append({
+                                "CIA": cia,
+                                "PRJID": prjid,
+                                "ROW": row,
+                                "COLUMN": column,
+                                "DATATYPE": "H",
+                                "DATACONTENTS": col_data["H"]
+                            })
+                        # Verificar Árbol
+                        if "T" in col_data and col_data["T"] is not None:
+                            # El árbol ya está en formato treemap
+                            result.append({
+                                "CIA": cia,
+                                "PRJID": prjid,
+                                "ROW": row,
+                                "COLUMN": column,
+                                "DATATYPE": "T",
+                                "DATACONTENTS": col_data["T"]
+                            })
+        s.set(rows=len(result))
     # Ordenar el resultado final por las mismas claves y DATATYPE
-    result.sort(key=lambda r: (str(r["CIA"]), str(r["PRJID"]), str(r["ROW"]), str(r["COLUMN"]), r["DATATYPE"]))
+    with span("sort", rows=len(result)):
+        result.sort(key=lambda r: (str(r["CIA"]), str(r["PRJID"]), str(r["ROW"]), str(r["COLUMN"]), r["DATATYPE"]))
     comparar_resultados_finales(result)
     
-    # Procesar datos para F_Asg5 (ahora llamada itm_data)
-    fasg5_filtrados_por_cia_prjid = {}
-    
-    # Extraer datos de F_Asg5
-    itm_data = extract_itm_data(EXCEL_PATH)
-    
-    # Crear un diccionario para almacenar las estructuras de árbol por CIA+PRJID
-    arbol_cia_prjid = {}
-    
-    # Agrupar los datos de árbol por CIA+PRJID
+    # Procesar datos para F_Asg5
+    # ITMID de las hojas de todos los árboles de cada combinación CIA+PRJID
+    hojas_cia_prjid = {}
+    claves = {}
     for item in result:
-        if item["DATATYPE"] == "T":
+        if item["DATATYPE"] == "T" and item["DATACONTENTS"]:
             key = (item["CIA"], item["PRJID"])
-            if key not in arbol_cia_prjid:
-                arbol_cia_prjid[key] = item["DATACONTENTS"]
+            claves.setdefault((str(item["CIA"]), str(item["PRJID"])), key)
+            hojas_cia_prjid.setdefault(key, set()).update(extraer_itmids_hoja(item["DATACONTENTS"]))
     
-    # Para cada combinación CIA+PRJID, filtrar los datos de F_Asg5
-    for key, tree in arbol_cia_prjid.items():
-        cia, prjid = key
-        # Extraer los IDs de los nodos hoja del árbol
-        itmids_hoja = extraer_itmids_hoja(tree)
-        # Filtrar los datos de F_Asg5 por los IDs de los nodos hoja
-        filtrados = [
-            item for item in itm_data 
-            if str(item.get("CIA", "")) == str(cia) and 
-               str(item.get("PRJID", "")) == str(prjid) and 
-               str(item.get("itm_id", "")) in itmids_hoja
-        ]
-        fasg5_filtrados_por_cia_prjid[key] = filtrados
+    # Una sola pasada por F_Asg5: cada fila va al grupo de su CIA+PRJID si su ITMID es una hoja
+    with span("fasg5_join", rows=len(itm_data), trees=len(hojas_cia_prjid)) as s:
+        fasg5_filtrados_por_cia_prjid = {key: [] for key in hojas_cia_prjid}
+        for item in itm_data:
+            key = claves.get((str(item.get("CIA", "")), str(item.get("PRJID", ""))))
+            if key is not None and str(item.get("ITMID", "")) in hojas_cia_prjid[key]:
+                fasg5_filtrados_por_cia_prjid[key].append(item)
+        s.set(matched=sum(len(filtrados) for filtrados in fasg5_filtrados_por_cia_prjid.values()))
     
     # Devolver ambos valores: los datos del dashboard y los datos filtrados de F_Asg5
     return result, fasg5_filtrados_por_cia_prjid
@@ -383,5 +442,42 @@ def main():
     # Si no tienes los datos filtrados, devuelve un diccionario vacío como segundo valor:
     # return datos_dashboard, {}
 
+def cli(argv=None):
+    """
+    Línea de comandos: ejecuta el pipeline completo y escribe en el directorio
+    de salida el snapshot y las vistas precalculadas (dashboard_precompute).
+    El dashboard servido con dashboard_serve.py --artifacts no calcula nada en línea.
+    """
+    parser = argparse.ArgumentParser(description="Extrae los datos del Excel y precalcula las vistas del dashboard")
+    parser.add_argument('excel_path', nargs='?', default=EXCEL_PATH, help="Libro Excel de origen (por defecto EXCEL_PATH)")
+    parser.add_argument('--historic-sheet', default=HISTORIC_SHEET, help=f"Hoja de históricos (por defecto {HISTORIC_SHEET})")
+    parser.add_argument('--kpi-sheet', default=KPI_SHEET, help=f"Hoja de KPIs (por defecto {KPI_SHEET})")
+    parser.add_argument('--tree-sheet', default=TREE_SHEET, help=f"Hoja del árbol de costes (por defecto {TREE_SHEET})")
+    parser.add_argument('--itm-sheet', default=ITM_SHEET, help=f"Hoja de items (por defecto {ITM_SHEET})")
+    parser.add_argument('-o', '--output-dir', required=True, help="Directorio de salida del snapshot y las vistas")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos para precalcular las vistas (por defecto, uno por CPU)")
+    parser.add_argument('--history', default=None, help="Guardar además los datos como nueva versión de este historial (snapshot_history)")
+    args = parser.parse_args(argv)
+
+    from dashboard_precompute import export_artifacts
+    result, fasg5_filtrados = main(args.excel_path, args.historic_sheet, args.kpi_sheet, args.tree_sheet, args.itm_sheet)
+    if not result:
+        print(f"Error: no se extrajeron datos de {args.excel_path}")
+        return 1
+    snapshot_path, manifest = export_artifacts(args.output_dir, result, fasg5_filtrados,
+                                               source=args.excel_path, workers=args.workers)
+    pages = sum(entry['pages'] for entry in manifest['views'])
+    size = sum(entry['bytes'] for entry in manifest['views'])
+    print(f"Snapshot {snapshot_path}: {len(result)} celdas")
+    print(f"Vistas precalculadas: {pages} páginas ({size / 1_000_000:.1f} MB) en {len(manifest['views'])} vistas")
+    if args.history:
+        from snapshot_history import record_version
+        entry = record_version(args.history, result, fasg5_filtrados, source=args.excel_path)
+        if entry is None:
+            print(f"Historial {args.history}: sin cambios respecto a la última versión")
+        else:
+            print(f"Historial {args.history}: versión {entry['version']} ({entry['kind']}, {entry['bytes'] / 1000:.0f} kB)")
+    return 0
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(cli())
\ No newline at end of file
@@ -1,7 +1,3 @@
-import pandas as pd
-import numpy as np
-import traceback
-import copy
 import os
 
 # Definir constantes para rutas de Excel (ajustar según sea necesario)
@@ -13,6 +9,8 @@ def extract_tree_data(excel_path, sheet_name):
     Extrae datos de la estructura jerárquica desde una hoja de Excel.
     Columnas esperadas: CIA, PRJID, ROW, COLUMN, LEVEL, NODE, NODEP, ITMIN, VALUE
     """
+    # pandas solo es necesario para leer el Excel; los helpers de árbol no lo usan
+    import pandas as pd
     try:
         # Leer el Excel directamente con los nombres en mayúsculas
         df = pd.read_excel(excel_path, sheet_name=sheet_name, dtype={
@@ -48,6 +46,31 @@ def to_treemap(node):
         "children": [to_treemap(child) for child in node.get("children", [])] if node.get("children") else []
     }
 
+def node_itmin(node_id):
+    """
+    ITMIN de un id de nodo "LEVEL-NODE-ITMIN" (inversa de to_treemap).
+    LEVEL y NODE son números, así que el ITMIN es todo lo que sigue al segundo guion.
+    """
+    parts = str(node_id).split("-", 2)
+    return parts[2] if len(parts) == 3 else None
+
+def itmin_to_itmid(itmin):
+    """
+    ITMID de F_Asg5 a partir de un ITMIN de F_Asg3: el ITMIN lleva detrás el
+    tipo entre paréntesis ("145513 (Recep OC)" -> "145513").
+    """
+    if itmin is None:
+        return None
+    itmin = str(itmin)
+    position = itmin.find(" (")
+    return itmin[:position] if position >= 0 and itmin.endswith(")") else itmin
+
+def node_itmid(node_id):
+    """
+    ITMID de F_Asg5 de un id de nodo "LEVEL-NODE-ITMIN": clave de unión entre árbol e items.
+    """
+    return itmin_to_itmid(node_itmin(node_id))
+
 def procesar_datos_arbol(items):
     """
     Procesa los datos de árbol para una combinación CIA+PRJID+ROW.
@@ -140,15 +163,16 @@ def procesar_datos_arbol(items):
 
 def extraer_itmids_hoja(tree_structure):
     """
-    Extrae todos los ITMID de los nodos hoja (sin hijos y valor distinto de 0) de una estructura de árbol.
+    Extrae todos los ITMID de los nodos hoja (sin hijos y valor distinto de 0) de una estructura de árbol
+    (dict raíz o lista de raíces). El ITMID de un nodo sale del ITMIN de su id (ver node_itmid).
     """
     itmids = []
-    def recorrer(nodo):
+    pendientes = list(tree_structure) if isinstance(tree_structure, list) else [tree_structure]
+    while pendientes:
+        nodo = pendientes.pop()
         if not nodo.get("children") and nodo.get("value", 0) != 0:
-            itmids.append(str(nodo.get("itm_id")))
-        for hijo in nodo.get("children", []):
-            recorrer(hijo)
-    recorrer(tree_structure)
+            itmids.append(str(node_itmid(nodo.get("id"))))
+        pendientes.extend(nodo.get("children") or [])
     return itmids
 
 def filtrar_fasg5_por_itmids(fasg5_data, itmids):
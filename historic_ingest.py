@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Ingesta incremental semanal de los históricos (FrmBB_2).
+
+Los históricos solo crecen: cada semana se añade un WKS por celda. En lugar
+de volver a estructurar todas las series (extract_historic_data +
+structure_data), se parte del snapshot anterior, se detectan las filas con
+un WKS posterior al último conocido de su celda y solo esas se convierten
+en puntos H y se añaden a la serie de su celda. El resto de celdas no se toca.
+
+KPIs (FrmBB_3) y árboles (F_Asg3) no son de solo anexado: si cambian hace
+falta un refresco completo (excel_main).
+
+Uso:
+    python historic_ingest.py --snapshot datos.cdmsnap                 # Excel y hoja de excel_main
+    python historic_ingest.py --snapshot datos.cdmsnap libro.xlsm --sheet FrmBB_2 --output nuevo.cdmsnap
+"""
+import sys
+import bisect
+import argparse
+from pipeline_trace import span
+
+HISTORIC_FIELDS = ["HPREV", "PPTO", "REAL"]
+
+
+def cell_key(cell):
+    return (str(cell["CIA"]), str(cell["PRJID"]), str(cell["ROW"]), str(cell["COLUMN"]))
+
+
+def result_sort_key(cell):
+    # Mismo orden que la lista result de excel_main.build_result
+    return (str(cell["CIA"]), str(cell["PRJID"]), str(cell["ROW"]), str(cell["COLUMN"]), cell["DATATYPE"])
+
+
+def last_serials(result):
+    """
+    Último WKS_SERIAL de cada celda H: {(CIA, PRJID, ROW, COLUMN): serial}.
+    """
+    serials = {}
+    for cell in result:
+        if cell["DATATYPE"] != "H" or not cell["DATACONTENTS"]:
+            continue
+        known = [point["WKS_SERIAL"] for point in cell["DATACONTENTS"] if point.get("WKS_SERIAL") is not None]
+        if known:
+            serials[cell_key(cell)] = max(known)
+    return serials
+
+
+def historic_point(record):
+    """
+    Punto H de un registro de FrmBB_2, o None si todos sus valores son 0
+    (mismo criterio que excel_main.structure_data).
+    """
+    if all(record.get(key, 0) == 0 for key in HISTORIC_FIELDS):
+        return None
+    return {
+        "HPREV": record.get("HPREV"),
+        "PPTO": record.get("PPTO"),
+        "REAL": record.get("REAL"),
+        "WKS_DATE": record.get("WKS_DATE"),
+        "WKS_SERIAL": record.get("WKS_SERIAL"),
+    }
+
+
+def append_historic_records(result, records):
+    """
+    Añade los registros nuevos a las series H de result (in situ).
+    Las celdas sin serie H se crean en su posición ordenada.
+    Devuelve el conjunto de claves (CIA, PRJID, ROW, COLUMN) modificadas.
+    """
+    cells = {cell_key(cell): cell for cell in result if cell["DATATYPE"] == "H"}
+    affected = set()
+    for record in records:
+        point = historic_point(record)
+        if point is None:
+            continue
+        cia = record.get("CIA")
+        prjid = str(record.get("PRJID"))
+        row = str(record.get("ROW", "")).strip()
+        column = str(record.get("COLUMN", "")).strip()
+        key = (str(cia), prjid, row, column)
+        cell = cells.get(key)
+        if cell is None:
+            cell = {"CIA": cia, "PRJID": prjid, "ROW": row, "COLUMN": column, "DATATYPE": "H", "DATACONTENTS": []}
+            bisect.insort(result, cell, key=result_sort_key)
+            cells[key] = cell
+        cell["DATACONTENTS"].append(point)
+        affected.add(key)
+    return affected
+
+
+def ingest_weekly(snapshot_path, excel_path=None, sheet_name=None, output_path=None):
+    """
+    Añade al snapshot los históricos nuevos del Excel y lo guarda
+    (en output_path o sobre el mismo snapshot).
+    Devuelve (filas nuevas, celdas afectadas).
+    """
+    import excel_main
+    from dashboard_snapshot import load_snapshot, write_snapshot
+    excel_path = excel_path or excel_main.EXCEL_PATH
+    sheet_name = sheet_name or excel_main.HISTORIC_SHEET
+    snapshot = load_snapshot(snapshot_path)
+    result = snapshot["result"]
+    with span("historic_ingest", path=excel_path) as s:
+        # Las celdas que no están en el snapshot (p. ej. un proyecto nuevo) toman todas
+        # sus filas: las que son todo ceros se descartan igual que en build_result
+        with span("sheet_parse", labels={"sheet": sheet_name}) as parse:
+            records = excel_main.extract_new_historic_data(excel_path, sheet_name, last_serials(result))
+            parse.set(rows=len(records))
+        affected = append_historic_records(result, records)
+        s.set(rows=len(records), cells=len(affected))
+    if affected:
+        write_snapshot(output_path or snapshot_path, result, snapshot["fasg5"], source=excel_path)
+    return len(records), len(affected)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta incremental de los históricos semanales en un snapshot")
+    parser.add_argument('excel_path', nargs='?', default=None, help="Libro Excel con los históricos (por defecto EXCEL_PATH)")
+    parser.add_argument('--snapshot', required=True, help="Snapshot a actualizar")
+    parser.add_argument('--sheet', default=None, help="Hoja de históricos (por defecto la de excel_main)")
+    parser.add_argument('--output', default=None, help="Snapshot de salida (por defecto, el mismo)")
+    args = parser.parse_args(argv)
+    rows, cells = ingest_weekly(args.snapshot, args.excel_path, args.sheet, args.output)
+    if not cells:
+        print("No hay semanas nuevas: el snapshot no cambia")
+    else:
+        print(f"Ingesta incremental: {rows} filas nuevas en {cells} celdas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
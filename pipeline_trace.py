@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Trazas del pipeline de datos (excel_main).
+
+Cada etapa se envuelve en un span:
+    with pipeline_trace.span("structure_data") as s:
+        ...
+        s.set(rows=len(result))
+
+Al cerrarse, el span escribe una línea JSON (duración, filas, delta de
+memoria RSS) en un log rotativo local, alimenta el histograma
+cdm_pipeline_stage_seconds de dash_metrics y, si la exportación está
+activa, queda guardado como evento para un trace de Chrome
+(chrome://tracing o https://ui.perfetto.dev).
+
+Variables de entorno:
+    CDM_TRACE_LOG     ruta del log JSON-lines (vacía = sin log)
+    CDM_CHROME_TRACE  ruta del trace de Chrome que escribe excel_main.main()
+"""
+import os
+import json
+import time
+import logging
+import threading
+import datetime
+from contextlib import contextmanager
+from logging.handlers import RotatingFileHandler
+from dash_metrics import observe
+
+DEFAULT_LOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs', 'pipeline_trace.jsonl')
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 3
+
+_local = threading.local()
+_logger = None
+_logger_lock = threading.Lock()
+# Eventos del trace de Chrome; None mientras la exportación no esté activa
+_chrome_events = None
+_chrome_lock = threading.Lock()
+_epoch = time.perf_counter()
+
+
+def _rss():
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except Exception:
+        return None
+
+
+def _get_logger():
+    global _logger
+    if _logger is not None:
+        return _logger
+    with _logger_lock:
+        if _logger is None:
+            logger = logging.getLogger('cdm.pipeline_trace')
+            logger.propagate = False
+            path = os.environ.get('CDM_TRACE_LOG', DEFAULT_LOG_PATH)
+            if path and not logger.handlers:
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+                    handler = RotatingFileHandler(path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
+                    handler.setFormatter(logging.Formatter('%(message)s'))
+                    logger.addHandler(handler)
+                    logger.setLevel(logging.INFO)
+                except OSError as e:
+                    print(f"No se pudo abrir el log de trazas {path}: {e}")
+            _logger = logger
+    return _logger
+
+
+class Span:
+    """
+    Etapa en curso. set() añade atributos (p. ej. recuentos de filas) al registro.
+    """
+    def __init__(self, name, labels, attrs, parent):
+        self.name = name
+        self.labels = labels
+        self.attrs = dict(attrs)
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent else 0
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+@contextmanager
+def span(name, labels=None, **attrs):
+    """
+    Cronometra una etapa del pipeline.
+
+    `labels` se usan también como etiquetas de la métrica Prometheus (deben
+    tener pocos valores distintos); `attrs` solo van al log y al trace.
+    """
+    labels = labels or {}
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    current = Span(name, labels, attrs, stack[-1] if stack else None)
+    stack.append(current)
+    rss_before = _rss()
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        rss_after = _rss()
+        duration = end - start
+        observe('cdm_pipeline_stage_seconds', duration,
+                'Duración de las etapas del pipeline de datos', stage=name, **labels)
+        record = {
+            'ts': datetime.datetime.now().isoformat(timespec='milliseconds'),
+            'span': name,
+            'parent': current.parent.name if current.parent else None,
+            'depth': current.depth,
+            'duration_ms': round(duration * 1000, 3),
+            'mem_delta_bytes': rss_after - rss_before if rss_before is not None and rss_after is not None else None,
+            **labels,
+            **current.attrs,
+        }
+        logger = _get_logger()
+        if logger.handlers:
+            logger.info(json.dumps(record, default=str, ensure_ascii=False))
+        if _chrome_events is not None:
+            with _chrome_lock:
+                _chrome_events.append({
+                    'name': name,
+                    'cat': 'pipeline',
+                    'ph': 'X',
+                    'ts': (start - _epoch) * 1e6,
+                    'dur': duration * 1e6,
+                    'pid': os.getpid(),
+                    'tid': threading.get_ident(),
+                    'args': {**labels, **current.attrs, 'mem_delta_bytes': record['mem_delta_bytes']},
+                })
+
+
+def start_chrome_trace():
+    """
+    Empieza a acumular los spans como eventos de un trace de Chrome.
+    """
+    global _chrome_events
+    with _chrome_lock:
+        _chrome_events = []
+
+
+def export_chrome_trace(path):
+    """
+    Escribe los eventos acumulados en formato Trace Event (JSON) y detiene la captura.
+    """
+    global _chrome_events
+    with _chrome_lock:
+        events, _chrome_events = _chrome_events or [], None
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+    print(f"Trace de Chrome con {len(events)} spans escrito en {path}")
+    return path
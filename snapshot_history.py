@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Historial versionado de los datos del dashboard.
+
+Cada refresco se guarda como una versión. La primera (y una de cada
+KEYFRAME_INTERVAL) es una copia completa; las demás son deltas respecto a
+la anterior con solo lo que cambia:
+  - KPIs con valores distintos,
+  - puntos H nuevos al final de cada serie (o la serie entera si no es un simple anexado),
+  - valores de los nodos del árbol que cambian (o el árbol entero si cambia su forma),
+  - celdas nuevas o eliminadas y grupos de F_Asg5 modificados.
+
+Cualquier versión se reconstruye aplicando los deltas desde la copia
+completa anterior. El dashboard la usa en el selector "ver a fecha".
+
+Estructura del directorio:
+    index.json            versiones: número, fecha, tipo, fichero y tamaño
+    v00001.full           copia completa (pickle comprimido)
+    v00002.delta          delta respecto a la versión anterior
+
+Uso:
+    python snapshot_history.py record datos.cdmsnap --history historial
+    python snapshot_history.py list --history historial
+    python snapshot_history.py export 12 --history historial --output datos_v12.cdmsnap
+"""
+import os
+import sys
+import copy
+import json
+import zlib
+import pickle
+import argparse
+import threading
+from collections import OrderedDict
+from dash_metrics import record_cache
+
+INDEX_NAME = 'index.json'
+# Cada cuántas versiones se guarda una copia completa (limita la reconstrucción)
+KEYFRAME_INTERVAL = 12
+# Versiones reconstruidas que se mantienen en memoria por proceso
+VERSION_CACHE_SIZE = 4
+
+_version_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cell_key(cell):
+    return (str(cell["CIA"]), str(cell["PRJID"]), str(cell["ROW"]), str(cell["COLUMN"]), cell["DATATYPE"])
+
+
+def _same(a, b):
+    """
+    Igualdad de contenidos con NaN == NaN: pandas escribe NaN en las celdas
+    vacías del Excel y, tras deserializar, un NaN nunca es igual a otro.
+    """
+    if a == b:
+        return True
+    if isinstance(a, float) and isinstance(b, float):
+        return a != a and b != b
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_same(value, b[key]) for key, value in a.items())
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    return False
+
+
+def _preorder(tree):
+    """
+    Nodos de un árbol treemap en preorden (mismo orden que dashboard_tree_view.flatten_tree).
+    """
+    roots = tree if isinstance(tree, list) else [tree]
+    nodes, stack = [], list(reversed(roots))
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(reversed(node.get("children") or []))
+    return nodes
+
+
+def _tree_change(old, new):
+    """
+    Cambio de un árbol: ('tree_values', {posición: valor}) si solo cambian
+    valores, ('set', árbol) si cambia la forma, None si es igual.
+    """
+    old_nodes, new_nodes = _preorder(old), _preorder(new)
+    if isinstance(old, list) != isinstance(new, list) or len(old_nodes) != len(new_nodes):
+        return ('set', new)
+    values = {}
+    for pos, (a, b) in enumerate(zip(old_nodes, new_nodes)):
+        if a["id"] != b["id"] or len(a.get("children") or []) != len(b.get("children") or []):
+            return ('set', new)
+        if not _same(a.get("value"), b.get("value")):
+            values[pos] = b.get("value")
+    return ('tree_values', values) if values else None
+
+
+def _cell_change(datatype, old, new):
+    if _same(old, new):
+        return None
+    if datatype == "H" and isinstance(old, list) and isinstance(new, list) and _same(new[:len(old)], old):
+        return ('append', new[len(old):])
+    if datatype == "T" and old and new:
+        return _tree_change(old, new)
+    return ('set', new)
+
+
+def compute_delta(previous, current):
+    """
+    Delta entre dos versiones {'result': [...], 'fasg5': {...}}.
+    """
+    old_cells = {_cell_key(cell): cell for cell in previous['result']}
+    changes, new_cells = {}, {}
+    for cell in current['result']:
+        key = _cell_key(cell)
+        old = old_cells.pop(key, None)
+        if old is None:
+            new_cells[key] = {field: cell[field] for field in ("CIA", "PRJID", "ROW", "COLUMN", "DATATYPE")}
+            changes[key] = ('set', cell["DATACONTENTS"])
+            continue
+        change = _cell_change(key[4], old["DATACONTENTS"], cell["DATACONTENTS"])
+        if change is not None:
+            changes[key] = change
+    for key in old_cells:
+        changes[key] = ('del',)
+    fasg5 = {pair: rows for pair, rows in current['fasg5'].items() if not _same(previous['fasg5'].get(pair), rows)}
+    fasg5.update({pair: None for pair in previous['fasg5'] if pair not in current['fasg5']})
+    return {'changes': changes, 'new_cells': new_cells, 'fasg5': fasg5}
+
+
+def apply_delta(state, delta):
+    """
+    Aplica un delta y devuelve la versión nueva. No modifica `state`:
+    las celdas cambiadas se copian, las demás se comparten.
+    """
+    cells = {_cell_key(cell): cell for cell in state['result']}
+    for key, change in delta['changes'].items():
+        kind = change[0]
+        if kind == 'del':
+            cells.pop(key, None)
+            continue
+        cell = dict(cells[key]) if key in cells else dict(delta['new_cells'][key])
+        if kind == 'set':
+            cell["DATACONTENTS"] = change[1]
+        elif kind == 'append':
+            cell["DATACONTENTS"] = cell["DATACONTENTS"] + change[1]
+        elif kind == 'tree_values':
+            tree = copy.deepcopy(cell["DATACONTENTS"])
+            nodes = _preorder(tree)
+            for pos, value in change[1].items():
+                nodes[pos]["value"] = value
+            cell["DATACONTENTS"] = tree
+        cells[key] = cell
+    # Mismo orden que la lista result de excel_main.build_result
+    result = sorted(cells.values(), key=_cell_key)
+    fasg5 = dict(state['fasg5'])
+    for pair, rows in delta['fasg5'].items():
+        if rows is None:
+            fasg5.pop(pair, None)
+        else:
+            fasg5[pair] = rows
+    return {'result': result, 'fasg5': fasg5}
+
+
+def _write_blob(path, obj):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(zlib.compress(pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL), 6))
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def _read_blob(path):
+    with open(path, 'rb') as f:
+        return pickle.loads(zlib.decompress(f.read()))
+
+
+def list_versions(history_dir):
+    """
+    Versiones del historial, de la más antigua a la más reciente ([] si no hay historial).
+    """
+    try:
+        with open(os.path.join(history_dir, INDEX_NAME), encoding='utf-8') as f:
+            return json.load(f)['versions']
+    except FileNotFoundError:
+        return []
+
+
+def load_version(history_dir, version):
+    """
+    Reconstruye una versión: {'result': [...], 'fasg5': {...}, 'header': {...}}.
+    Se cachean las últimas versiones reconstruidas en el proceso.
+    """
+    versions = {entry['version']: entry for entry in list_versions(history_dir)}
+    if version not in versions:
+        raise KeyError(f"La versión {version} no existe en {history_dir}")
+    cache_key = (os.path.abspath(history_dir), version, versions[version]['file'])
+    with _cache_lock:
+        cached = _version_cache.get(cache_key)
+        record_cache('history_version', cached is not None)
+        if cached is not None:
+            _version_cache.move_to_end(cache_key)
+            return cached
+    # Copia completa más cercana y deltas hasta la versión pedida
+    start = max(number for number, entry in versions.items() if number <= version and entry['kind'] == 'full')
+    state = _read_blob(os.path.join(history_dir, versions[start]['file']))
+    for number in range(start + 1, version + 1):
+        state = apply_delta(state, _read_blob(os.path.join(history_dir, versions[number]['file'])))
+    state = {**state, 'header': versions[version]['header']}
+    with _cache_lock:
+        _version_cache[cache_key] = state
+        while len(_version_cache) > VERSION_CACHE_SIZE:
+            _version_cache.popitem(last=False)
+    return state
+
+
+def record_version(history_dir, result, fasg5_filtrados, source=None):
+    """
+    Guarda los datos como nueva versión del historial (delta respecto a la
+    última o copia completa cada KEYFRAME_INTERVAL versiones).
+    Devuelve la entrada del índice, o None si los datos no han cambiado.
+    """
+    from dashboard_snapshot import build_header
+    os.makedirs(history_dir, exist_ok=True)
+    versions = list_versions(history_dir)
+    current = {'result': result, 'fasg5': fasg5_filtrados}
+    number = versions[-1]['version'] + 1 if versions else 1
+    since_full = 0
+    for entry in reversed(versions):
+        if entry['kind'] == 'full':
+            break
+        since_full += 1
+    kind, blob = 'full', current
+    if versions:
+        delta = compute_delta(load_version(history_dir, versions[-1]['version']), current)
+        if not delta['changes'] and not delta['fasg5']:
+            return None
+        if since_full + 1 < KEYFRAME_INTERVAL:
+            kind, blob = 'delta', delta
+    file_name = f"v{number:05d}.{kind}"
+    size = _write_blob(os.path.join(history_dir, file_name), blob)
+    entry = {
+        'version': number,
+        'kind': kind,
+        'file': file_name,
+        'bytes': size,
+        'changes': len(blob['changes']) if kind == 'delta' else len(result),
+        'header': build_header(result, source),
+    }
+    index_path = os.path.join(history_dir, INDEX_NAME)
+    with open(f"{index_path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump({'versions': versions + [entry]}, f, indent=1)
+    os.replace(f"{index_path}.tmp", index_path)
+    return entry
+
+
+def version_label(entry):
+    """
+    Texto del selector "ver a fecha" para una versión.
+    """
+    return f"v{entry['version']} - {entry['header']['created'].replace('T', ' ')}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historial versionado de los datos del dashboard")
+    parser.add_argument('--history', required=True, help="Directorio del historial")
+    commands = parser.add_subparsers(dest='command', required=True)
+    record = commands.add_parser('record', help="Guarda un snapshot como nueva versión")
+    record.add_argument('snapshot', help="Snapshot a guardar")
+    commands.add_parser('list', help="Lista las versiones")
+    export = commands.add_parser('export', help="Reconstruye una versión como snapshot")
+    export.add_argument('version', type=int, help="Número de versión")
+    export.add_argument('--output', required=True, help="Snapshot de salida")
+    args = parser.parse_args(argv)
+
+    from dashboard_snapshot import load_snapshot, write_snapshot
+    if args.command == 'record':
+        snapshot = load_snapshot(args.snapshot)
+        entry = record_version(args.history, snapshot['result'], snapshot['fasg5'], snapshot['header'].get('source'))
+        if entry is None:
+            print("Los datos no han cambiado: no se crea versión")
+        else:
+            print(f"Versión {entry['version']} ({entry['kind']}, {entry['changes']} cambios, {entry['bytes'] / 1000:.0f} kB)")
+    elif args.command == 'list':
+        for entry in list_versions(args.history):
+            print(f"{version_label(entry):<32} {entry['kind']:<6} {entry['changes']:>8} cambios {entry['bytes'] / 1000:>10.0f} kB")
+    else:
+        state = load_version(args.history, args.version)
+        write_snapshot(args.output, state['result'], state['fasg5'], source=f"{args.history}@v{args.version}")
+        print(f"Versión {args.version} exportada a {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
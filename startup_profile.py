@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Perfil de arranque: tiempos de importación y de cada etapa del inicio.
+
+Uso desde un punto de entrada:
+    startup_profile.enable()          # antes de las importaciones pesadas
+    with startup_profile.stage("carga de datos"):
+        ...
+    startup_profile.report()
+"""
+import sys
+import time
+import builtins
+from contextlib import contextmanager
+
+_enabled = False
+_original_import = builtins.__import__
+_import_depth = 0
+# (módulo, segundos, profundidad) en orden de importación
+_imports = []
+# (etapa, segundos)
+_stages = []
+
+
+def _timed_import(name, globals=None, locals=None, fromlist=(), level=0):
+    global _import_depth
+    if level or name in sys.modules:
+        return _original_import(name, globals, locals, fromlist, level)
+    _import_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        _import_depth -= 1
+        _imports.append((name, time.perf_counter() - start, _import_depth))
+
+
+def enable():
+    """
+    Activa el perfil: a partir de aquí se cronometran las importaciones nuevas.
+    """
+    global _enabled
+    if not _enabled:
+        _enabled = True
+        builtins.__import__ = _timed_import
+
+
+def disable():
+    global _enabled
+    _enabled = False
+    builtins.__import__ = _original_import
+
+
+def is_enabled():
+    return _enabled
+
+
+@contextmanager
+def stage(name):
+    """
+    Cronometra una etapa de arranque (no hace nada si el perfil no está activo).
+    """
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stages.append((name, time.perf_counter() - start))
+
+
+def report(top=15, out=None):
+    """
+    Imprime las importaciones de primer nivel más costosas y los tiempos por etapa.
+    """
+    out = out or sys.stdout
+    top_level = sorted((item for item in _imports if item[2] == 0), key=lambda item: item[1], reverse=True)
+    print("Importaciones (tiempo inclusivo):", file=out)
+    for name, elapsed, _ in top_level[:top]:
+        print(f"  {elapsed * 1000:9.1f} ms  {name}", file=out)
+    print("Etapas de arranque:", file=out)
+    for name, elapsed in _stages:
+        print(f"  {elapsed * 1000:9.1f} ms  {name}", file=out)
+    print(f"  {sum(elapsed for _, elapsed in _stages) * 1000:9.1f} ms  TOTAL", file=out)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Datos sintéticos con la forma de las hojas del Excel (FrmBB_2, FrmBB_3,
+F_Asg3, F_Asg5) para pruebas de carga y benchmarks sin el libro real.
+
+Los registros se generan con una semilla fija: los mismos parámetros dan
+siempre los mismos datos. El resultado pasa por excel_main.build_result,
+igual que los datos leídos del Excel.
+
+Uso:
+    python synthetic_data.py datos_sinteticos.cdmsnap --cias 2 --prjids 10
+"""
+import sys
+import random
+import argparse
+
+ROW_NAMES = ['GESTION Y COORDINACION', 'DISEÑO HARDWARE', 'DISEÑO SOFTWARE', 'ROBCAD', 'TRANSPORTES Y EMBALAJES',
+             'GASTOS DE DESPLAZAMIENTO', 'MONTAJE', 'PUESTA EN MARCHA', 'DOCUMENTACION', 'FORMACION']
+COLUMN_NAMES = ['GESTIÓN PROYECTOS', 'GESTIÓN MECÁNICA', 'MATERIAL MECÁNICO', 'MATERIAL ELÉCTRICO', 'TRANSP. & DESPLAZ.',
+                'SUBCONTRATAS', 'INGENIERÍA', 'SOFTWARE']
+ITEM_KINDS = ['Fabricación', 'Compra', 'Servicio', 'Montaje']
+
+DEFAULT_SIZES = {
+    'cias': 2,
+    'prjids': 6,
+    'rows': 8,
+    'columns': 6,
+    'weeks': 52,
+    'tree_depth': 3,
+    'tree_fanout': 4,
+}
+
+
+def _label(position, name):
+    return f"{position + 1:02d}:{name}"
+
+
+def generate_sheets(seed=0, cias=2, prjids=6, rows=8, columns=6, weeks=52, tree_depth=3, tree_fanout=4, start_year=2024):
+    """
+    Genera los registros de las cuatro hojas como listas de diccionarios
+    (el mismo formato que devuelven las funciones extract_* de excel_main).
+    """
+    from excel_main import wks_to_date
+    rng = random.Random(seed)
+    historic, kpi, tree, items = [], [], [], []
+    row_labels = [_label(i, ROW_NAMES[i % len(ROW_NAMES)]) for i in range(rows)]
+    column_labels = [_label(i, COLUMN_NAMES[i % len(COLUMN_NAMES)]) for i in range(columns)]
+    wks_values = [f"{start_year + (week // 52)}.{week % 52 + 1:02d}" for week in range(weeks)]
+    item_serial = 600000
+    for c in range(cias):
+        cia = f"C{c + 1}"
+        for p in range(prjids):
+            prjid = str(31000 + c * 1000 + p)
+            for row in row_labels:
+                for column in column_labels:
+                    budget = round(rng.uniform(1_000, 200_000), 4)
+                    spent = 0.0
+                    for wks in wks_values:
+                        spent += rng.uniform(0, budget / weeks * 2)
+                        date, serial = wks_to_date(wks)
+                        historic.append({
+                            'CIA': cia, 'PRJID': prjid, 'ROW': row, 'COLUMN': column, 'WKS': wks,
+                            'REAL': round(spent, 4), 'PPTO': budget, 'HPREV': round(budget * rng.uniform(0.8, 1.2), 4),
+                            'WKS_DATE': date, 'WKS_SERIAL': serial,
+                        })
+                    kpi.append({
+                        'CIA': cia, 'PRJID': prjid, 'ROW': row, 'COLUMN': column,
+                        'KPREV': budget, 'PDTE': round(max(budget - spent, 0.0), 4),
+                        'REALPREV': round(rng.uniform(0, 1.2), 6), 'PPTOPREV': round(rng.uniform(0, 1.2), 6),
+                    })
+                # Árbol de la fila: raíz única, tree_fanout hijos por nodo, hojas repartidas entre columnas
+                level_nodes = [(1, 0)]
+                next_node = {}
+                item_serial += 1
+                tree.append({'CIA': cia, 'PRJID': prjid, 'ROW': row, 'COLUMN': column_labels[0], 'LEVEL': 1, 'NODE': 1,
+                             'NODEP': 0, 'ITMIN': f"{item_serial} ({rng.choice(ITEM_KINDS)})", 'VALUE': 0.0})
+                for level in range(2, tree_depth + 1):
+                    children = []
+                    for parent, _ in level_nodes:
+                        for _ in range(tree_fanout):
+                            node = next_node.get(level, 1)
+                            next_node[level] = node + 1
+                            item_serial += 1
+                            is_leaf = level == tree_depth
+                            itmin = f"{item_serial} ({rng.choice(ITEM_KINDS)})"
+                            tree.append({
+                                'CIA': cia, 'PRJID': prjid, 'ROW': row,
+                                'COLUMN': rng.choice(column_labels) if is_leaf else column_labels[0],
+                                'LEVEL': level, 'NODE': node, 'NODEP': parent, 'ITMIN': itmin,
+                                'VALUE': round(rng.uniform(100, 20_000), 2) if is_leaf else 0.0,
+                            })
+                            if is_leaf:
+                                items.append({'CIA': cia, 'PRJID': prjid, 'ITMID': str(item_serial),
+                                              'ITMFRM': f"PLN:{item_serial}.{rng.randint(0, 999):04d}"})
+                            children.append((node, level))
+                    level_nodes = children
+    return {'FrmBB_2': historic, 'FrmBB_3': kpi, 'F_Asg3': tree, 'F_Asg5': items}
+
+
+def generate_dataset(seed=0, **sizes):
+    """
+    Datos sintéticos ya procesados: (result, fasg5_filtrados), como excel_main.main().
+    """
+    from excel_main import build_result
+    sheets = generate_sheets(seed=seed, **{**DEFAULT_SIZES, **sizes})
+    return build_result(sheets['FrmBB_2'], sheets['FrmBB_3'], sheets['F_Asg3'], sheets['F_Asg5'])
+
+
+def write_synthetic_snapshot(path, seed=0, **sizes):
+    """
+    Genera los datos sintéticos y los guarda como snapshot (dashboard_snapshot).
+    """
+    from dashboard_snapshot import write_snapshot
+    result, fasg5_filtrados = generate_dataset(seed=seed, **sizes)
+    return write_snapshot(path, result, fasg5_filtrados, source=f"synthetic:seed={seed}")
+
+
+def add_size_arguments(parser):
+    """
+    Añade a un argparse los parámetros de tamaño de los datos sintéticos.
+    """
+    for name, default in DEFAULT_SIZES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", dest=name, type=int, default=default,
+                            help=f"Datos sintéticos: {name} (por defecto {default})")
+    parser.add_argument('--seed', type=int, default=0, help="Semilla de los datos sintéticos")
+
+
+def sizes_from_args(args):
+    return {name: getattr(args, name) for name in DEFAULT_SIZES}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera un snapshot con datos sintéticos")
+    parser.add_argument('path', help="Ruta del snapshot a escribir")
+    add_size_arguments(parser)
+    args = parser.parse_args(argv)
+    write_synthetic_snapshot(args.path, seed=args.seed, **sizes_from_args(args))
+    from dashboard_snapshot import read_snapshot_header
+    header = read_snapshot_header(args.path)
+    print(f"Snapshot sintético {args.path}: {header['cells']} celdas, {len(header['pairs'])} combinaciones CIA/PRJID")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
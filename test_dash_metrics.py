@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Métricas de dash_metrics: suma entre workers en el modo multiproceso
+(CDM_METRICS_DIR) y escapado de las etiquetas del formato de Prometheus.
+
+Uso:
+    python -m pytest -q test_dash_metrics.py
+"""
+import os
+import shutil
+import pytest
+import dash_metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(dash_metrics, '_metrics', {})
+    monkeypatch.setattr(dash_metrics, '_gauges', {})
+    monkeypatch.setattr(dash_metrics, '_directory', None)
+    monkeypatch.setattr(dash_metrics, '_process_file', None)
+    monkeypatch.setattr(dash_metrics, '_dirty', False)
+    return dash_metrics
+
+
+def test_label_escaping(registry):
+    registry.inc('cdm_test_total', help_text='Ayuda\ncon salto', cache='a\\b "c"\nd')
+    text = registry.render()
+    assert '# HELP cdm_test_total Ayuda\\ncon salto' in text
+    assert 'cdm_test_total{cache="a\\\\b \\"c\\"\\nd"} 1' in text
+
+
+def test_multiprocess_sums_workers(registry, tmp_path, monkeypatch):
+    monkeypatch.delenv(registry.METRICS_DIR_ENV, raising=False)
+    directory = registry.prepare_multiprocess_dir(str(tmp_path / "metricas"))
+    registry.enable_multiprocess(directory)
+    registry.inc('cdm_test_total', 2, help_text='Contador', cache='x')
+    registry.observe('cdm_test_seconds', 0.02, help_text='Duración', callback='cb')
+    registry.flush()
+    # Otro worker con los mismos valores
+    own = registry._process_file[1]
+    shutil.copy(own, os.path.join(directory, "1-0.json"))
+    text = registry.render()
+    assert 'cdm_test_total{cache="x"} 4' in text
+    assert 'cdm_test_seconds_count{callback="cb"} 2' in text
+    assert 'cdm_test_seconds_bucket{callback="cb",le="0.025"} 2' in text
+    # El contador no retrocede cuando el scrape lo atiende el otro worker
+    registry.inc('cdm_test_total', help_text='Contador', cache='x')
+    assert 'cdm_test_total{cache="x"} 5' in registry.render()
+    assert registry.prepare_multiprocess_dir(directory) == directory
+    assert not os.listdir(directory)
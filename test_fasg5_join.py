@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Unión árbol (F_Asg3) <-> items (F_Asg5) sobre el libro real.
+
+synthetic_data ya genera el ITMIN con el tipo entre paréntesis y el ITMID
+sin él; aquí se comprueba además sobre los códigos del libro real
+("00E00-0-00F (Fabricación)") que el ITMIN se reduce al ITMID de F_Asg5 en
+todas las rutas: build_result, build_item_index y el almacén SQLite.
+
+Uso:
+    python -m pytest -q test_fasg5_join.py
+"""
+import os
+import pytest
+from excel_utils import itmin_to_itmid, node_itmid, extraer_itmids_hoja
+
+EXCEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "DataKHT_V06.xlsm")
+
+
+def test_itmin_to_itmid():
+    assert itmin_to_itmid("145513 (Recep OC)") == "145513"
+    assert itmin_to_itmid("00E00-0-00F (Fabricación)") == "00E00-0-00F"
+    assert itmin_to_itmid("145513") == "145513"
+    assert itmin_to_itmid(None) is None
+    assert node_itmid("3-12-00E00-0-00F (Recep OC)") == "00E00-0-00F"
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    if not os.path.exists(EXCEL_PATH):
+        pytest.skip("DataKHT_V06.xlsm no disponible")
+    os.environ.setdefault("CDM_TRACE_LOG", "")
+    from excel_main import main
+    return main(EXCEL_PATH)
+
+
+def _leaf_ids(tree):
+    stack = list(tree) if isinstance(tree, list) else [tree]
+    while stack:
+        node = stack.pop()
+        children = node.get("children") or []
+        if children:
+            stack.extend(children)
+        elif node.get("value"):
+            yield node.get("id")
+
+
+def test_build_result_join(pipeline):
+    result, fasg5 = pipeline
+    leaves = set()
+    for cell in result:
+        if cell["DATATYPE"] == "T" and cell["DATACONTENTS"]:
+            leaves.update(extraer_itmids_hoja(cell["DATACONTENTS"]))
+    matched = sum(len(rows) for rows in fasg5.values())
+    assert matched > 1000
+    assert all(str(row.get("ITMID", "")) in leaves for rows in fasg5.values() for row in rows)
+
+
+def test_item_lookup(pipeline, tmp_path):
+    from dashboard_index import build_item_index, find_items
+    from dashboard_store import write_store, CellStore
+    result, fasg5 = pipeline
+    items = build_item_index(fasg5)
+    path = str(tmp_path / "cells.sqlite")
+    write_store(path, result, fasg5)
+    store = CellStore(path)
+    found = 0
+    for cell in result:
+        if cell["DATATYPE"] != "T" or not cell["DATACONTENTS"]:
+            continue
+        for node_id in _leaf_ids(cell["DATACONTENTS"]):
+            rows = find_items(items, cell["CIA"], cell["PRJID"], node_itmid(node_id))
+            assert rows == find_items(store, cell["CIA"], cell["PRJID"], node_itmid(node_id))
+            found += bool(rows)
+    assert found > 0
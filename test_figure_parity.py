@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""
+Paridad entre las figuras como dicts (dashboard_figures) y las construidas
+con plotly.graph_objects antes de user-026: el to_plotly_json() de la
+versión go.Figure debe ser idéntico al dict más la plantilla de plotly, que
+la página define una sola vez (dashboard_figures.template_script).
+
+Uso:
+    python -m pytest -q test_figure_parity.py
+"""
+import pytest
+import plotly.graph_objects as go
+from dashboard_figures import kpi_bar_spec, donut_spec, historic_points, historic_spec, plotly_template
+
+
+def legacy_kpi_bar(hprev, pdte):
+    bar_fig = go.Figure()
+    bar_fig.add_trace(go.Bar(x=[hprev], y=['HPREV'], orientation='h', marker_color='#28a745', name='HPREV',
+                             hoverinfo='skip', showlegend=False, width=0.3))
+    bar_fig.add_trace(go.Bar(x=[pdte], y=['PDTE'], orientation='h', marker_color='#dc3545', name='PDTE',
+                             hoverinfo='skip', showlegend=False, width=0.3))
+    bar_fig.update_layout(
+        height=80,
+        margin=dict(l=0, r=0, t=0, b=0),
+        showlegend=False,
+        barmode='group',
+        plot_bgcolor='white',
+        paper_bgcolor='white',
+        xaxis=dict(showgrid=False, showticklabels=False, visible=False),
+        yaxis=dict(showgrid=False, tickfont=dict(size=14, color='#2c3e50'), tickangle=0, automargin=True),
+    )
+    return bar_fig
+
+
+def legacy_donut(value, color_main):
+    # sort=False: sin él plotly ordena los sectores por tamaño y el anillo sale invertido para ratios < 0.5
+    if 0.99 <= value <= 1.01:
+        value = 1.0
+    val_rounded = round(abs(value), 1)
+    val_int = int(round(val_rounded * 100))
+    if value <= 0:
+        fig = go.Figure(go.Pie(values=[1], marker_colors=['#dc3545'], textinfo='none', hole=0.5, sort=False))
+    elif 0 < value < 1:
+        fig = go.Figure(go.Pie(values=[val_rounded, 1-val_rounded], labels=['', ''],
+                               marker_colors=[color_main, '#f8f9fa'], textinfo='none', hole=0.5,
+                               sort=False))
+    else:
+        fig = go.Figure(go.Pie(values=[1], labels=[''], marker_colors=[color_main], textinfo='none', hole=0.5, sort=False))
+    fig.update_layout(
+        showlegend=False,
+        annotations=[dict(text=f"{val_int}%", x=0.5, y=0.5, font_size=16, showarrow=False, font_color='#222')],
+        margin=dict(l=0, r=0, t=0, b=0),
+        height=90,
+        plot_bgcolor='white',
+        paper_bgcolor='white'
+    )
+    return fig
+
+
+def legacy_historic(historic_data):
+    fig = go.Figure()
+    points = []
+    for entry in historic_data:
+        if entry.get('WKS_SERIAL', None) is None:
+            continue
+        values = [entry.get(name, 0) for name in ('HPREV', 'PPTO', 'REAL')]
+        points.append((float(entry['WKS_SERIAL']), str(entry.get('WKS_DATE', '')))
+                      + tuple(float(v) if v is not None else 0 for v in values))
+    points.sort(key=lambda x: x[0])
+    serials, date_labels, hprev_values, ppto_values, real_values = zip(*points)
+    serials, date_labels = list(serials), list(date_labels)
+    for name, values, color in (('HPREV', hprev_values, '#4a6fa5'), ('PPTO', ppto_values, '#28a745'),
+                                 ('REAL', real_values, '#dc3545')):
+        fig.add_trace(go.Scatter(x=serials, y=values, mode='lines+markers', line=dict(color=color, width=3),
+                                 marker=dict(size=8, color=color), name=name, text=date_labels,
+                                 hovertemplate='%{text}<br>' + name + ': %{y}'))
+    fig.update_layout(
+        margin=dict(l=20, r=20, t=20, b=80),
+        height=420,
+        width=1260,
+        showlegend=False,
+        xaxis=dict(showgrid=True, gridcolor='rgba(211, 211, 211, 0.3)', tickangle=45, tickmode='array',
+                   tickvals=serials, ticktext=date_labels, showticklabels=True, title=None, automargin=True,
+                   tickfont=dict(size=9, family="Consolas, Menlo, monospace")),
+        yaxis=dict(showgrid=True, gridcolor='rgba(211, 211, 211, 0.3)', title=None, automargin=True,
+                   tickfont=dict(size=14)),
+        plot_bgcolor='rgba(255, 255, 255, 0.9)',
+        paper_bgcolor='rgba(255, 255, 255, 0.9)',
+        hovermode='closest',
+    )
+    return fig
+
+
+def _with_template(spec):
+    # Lo que dibuja el navegador: la plantilla de la página se añade al layout de la figura
+    assert 'template' not in spec['layout']
+    return {**spec, 'layout': {**spec['layout'], 'template': plotly_template()}}
+
+
+def _plain(figure):
+    # to_plotly_json deja tuplas en algunos arrays; se comparan como listas
+    if isinstance(figure, dict):
+        return {key: _plain(value) for key, value in figure.items()}
+    if isinstance(figure, (list, tuple)):
+        return [_plain(value) for value in figure]
+    return figure
+
+
+@pytest.mark.parametrize("hprev, pdte", [(1250.5, 310.0), (0, 0), (-420.0, 75.25), (3, -3)])
+def test_kpi_bar_parity(hprev, pdte):
+    assert _plain(_with_template(kpi_bar_spec(hprev, pdte))) == _plain(legacy_kpi_bar(hprev, pdte).to_plotly_json())
+
+
+@pytest.mark.parametrize("value", [-0.35, 0, 0.0, 0.04, 0.47, 0.95, 0.992, 1.0, 1.008, 1.3])
+@pytest.mark.parametrize("color_main", ['#28a745', '#4a6fa5'])
+def test_donut_parity(value, color_main):
+    assert _plain(_with_template(donut_spec(value, color_main))) == _plain(legacy_donut(value, color_main).to_plotly_json())
+
+
+HISTORIC_CELLS = [
+    [{'WKS_SERIAL': 45300, 'WKS_DATE': '2024-01-08', 'HPREV': 10.5, 'PPTO': 12, 'REAL': 9}],
+    [{'WKS_SERIAL': 45314, 'WKS_DATE': '2024-01-22', 'HPREV': -3.0, 'PPTO': 0, 'REAL': None},
+     {'WKS_SERIAL': 45300, 'WKS_DATE': '2024-01-08', 'HPREV': 1.0, 'PPTO': 1.0, 'REAL': 1.0},
+     {'WKS_SERIAL': None, 'WKS_DATE': '', 'HPREV': 99, 'PPTO': 99, 'REAL': 99},
+     {'WKS_SERIAL': 45307, 'WKS_DATE': '2024-01-15', 'PPTO': 4.25}],
+]
+
+
+@pytest.mark.parametrize("historic_data", HISTORIC_CELLS)
+def test_historic_parity(historic_data):
+    spec = historic_spec(*historic_points(historic_data))
+    assert _plain(_with_template(spec)) == _plain(legacy_historic(historic_data).to_plotly_json())
+
+
+def test_historic_without_points():
+    assert historic_points([{'WKS_SERIAL': None}]) is None
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Ingesta incremental de históricos (historic_ingest) frente a un refresco
+completo (excel_main.build_result) sobre los mismos libros.
+
+Uso:
+    python -m pytest -q test_historic_ingest.py
+"""
+import os
+import pandas as pd
+import pytest
+from synthetic_data import generate_sheets
+
+HISTORIC_COLUMNS = ['CIA', 'PRJID', 'ROW', 'COLUMN', 'WKS', 'HPREV', 'PPTO', 'REAL']
+SIZES = {'cias': 1, 'prjids': 2, 'rows': 2, 'columns': 2, 'weeks': 6, 'tree_depth': 2, 'tree_fanout': 2}
+
+
+def _write_historic(path, records):
+    pd.DataFrame(records, columns=HISTORIC_COLUMNS).to_excel(path, sheet_name='FrmBB_2', index=False)
+
+
+def _full_result(path, sheets):
+    from excel_main import extract_historic_data, build_result
+    result, _ = build_result(extract_historic_data(path, 'FrmBB_2'), sheets['FrmBB_3'], sheets['F_Asg3'], sheets['F_Asg5'])
+    return result
+
+
+@pytest.fixture
+def workbooks(tmp_path):
+    os.environ.setdefault("CDM_TRACE_LOG", "")
+    sheets = generate_sheets(seed=0, **SIZES)
+    new_project = max(record['PRJID'] for record in sheets['FrmBB_2'])
+    before = str(tmp_path / "antes.xlsx")
+    after = str(tmp_path / "despues.xlsx")
+    # Semana a semana: el libro anterior no tiene la última semana ni el proyecto nuevo
+    last_wks = max(record['WKS'] for record in sheets['FrmBB_2'])
+    _write_historic(before, [record for record in sheets['FrmBB_2']
+                             if record['PRJID'] != new_project and record['WKS'] != last_wks])
+    _write_historic(after, sheets['FrmBB_2'])
+    return sheets, before, after, new_project
+
+
+def test_ingest_matches_full_rebuild_with_new_project(workbooks, tmp_path):
+    from dashboard_snapshot import write_snapshot, load_snapshot
+    from historic_ingest import ingest_weekly
+    sheets, before, after, new_project = workbooks
+    snapshot_path = str(tmp_path / "datos.cdmsnap")
+    write_snapshot(snapshot_path, _full_result(before, sheets), {})
+    rows, cells = ingest_weekly(snapshot_path, after, 'FrmBB_2')
+    assert cells > 0
+    ingested = load_snapshot(snapshot_path)['result']
+    expected = _full_result(after, sheets)
+    assert ingested == expected
+    new_cells = [cell for cell in ingested if cell['DATATYPE'] == 'H' and cell['PRJID'] == new_project]
+    assert new_cells and all(len(cell['DATACONTENTS']) == SIZES['weeks'] for cell in new_cells)
+
+
+def test_ingest_without_new_weeks(workbooks, tmp_path):
+    from dashboard_snapshot import write_snapshot
+    from historic_ingest import ingest_weekly
+    sheets, _, after, _ = workbooks
+    snapshot_path = str(tmp_path / "datos.cdmsnap")
+    write_snapshot(snapshot_path, _full_result(after, sheets), {})
+    assert ingest_weekly(snapshot_path, after, 'FrmBB_2') == (0, 0)
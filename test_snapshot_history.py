@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Historial versionado (snapshot_history) con NaN en los datos: pandas los
+escribe en las celdas vacías del Excel y tras deserializar no son iguales.
+
+Uso:
+    python -m pytest -q test_snapshot_history.py
+"""
+import os
+import pickle
+import snapshot_history
+from synthetic_data import generate_dataset
+
+
+def _dataset_with_nan():
+    os.environ.setdefault("CDM_TRACE_LOG", "")
+    result, fasg5 = generate_dataset(cias=1, prjids=1, rows=2, columns=2, weeks=4, tree_depth=2, tree_fanout=2)
+    nan = float('nan')
+    for cell in result:
+        if cell["DATATYPE"] == "K" and cell["DATACONTENTS"]:
+            cell["DATACONTENTS"]["PDTE"] = nan
+        elif cell["DATATYPE"] == "H" and cell["DATACONTENTS"]:
+            cell["DATACONTENTS"][0]["HPREV"] = nan
+    for rows in fasg5.values():
+        rows[0]["ITMFRM"] = nan
+    return result, fasg5
+
+
+def test_unchanged_data_with_nan(tmp_path):
+    history = str(tmp_path / "historial")
+    result, fasg5 = _dataset_with_nan()
+    assert snapshot_history.record_version(history, result, fasg5)['kind'] == 'full'
+    snapshot_history._version_cache.clear()
+    result, fasg5 = pickle.loads(pickle.dumps((result, fasg5)))
+    assert snapshot_history.record_version(history, result, fasg5) is None
+
+
+def test_delta_with_nan_keeps_appends():
+    result, fasg5 = _dataset_with_nan()
+    previous = {'result': result, 'fasg5': fasg5}
+    current = pickle.loads(pickle.dumps(previous))
+    cell = next(cell for cell in current['result'] if cell["DATATYPE"] == "H" and cell["DATACONTENTS"])
+    cell["DATACONTENTS"].append(dict(cell["DATACONTENTS"][-1], WKS_SERIAL=99999))
+    delta = snapshot_history.compute_delta(previous, current)
+    assert not delta['fasg5']
+    assert [change[0] for change in delta['changes'].values()] == ['append']
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Diferencias entre los árboles de costes (F_Asg3) de dos snapshots.
+
+Todos los árboles de todas las celdas T se aplanan en arrays globales
+(preorden, índice del padre, valor). Cada nodo se identifica por su celda y
+por (LEVEL, NODE, ITMIN), que es el id "LEVEL-NODE-ITMIN" de to_treemap; las
+claves se codifican como enteros y los nodos de ambos lados se alinean con
+una intersección de arrays (numpy), sin recorrer los diccionarios anidados.
+
+Para cada nodo del árbol nuevo se obtiene el valor anterior y la variación;
+los nodos solo presentes en uno de los lados son altas o bajas, y su raíz
+(el nodo cuyo padre sí existe en el otro lado) identifica el subárbol añadido
+o eliminado. El resultado alimenta el coloreado "cambios" de la vista de árbol.
+
+Uso:
+    python tree_diff.py anterior.cdmsnap actual.cdmsnap --top 20
+"""
+import sys
+import argparse
+import numpy as np
+from dashboard_tree_view import flatten_tree
+
+
+def cell_key(cell):
+    return (str(cell["CIA"]), str(cell["PRJID"]), str(cell["ROW"]), str(cell["COLUMN"]))
+
+
+def flatten_cells(cells):
+    """
+    Aplana los árboles de una lista de celdas T.
+    Devuelve {'keys': claves de celda, 'offsets': inicio de cada celda (+ final),
+    'labels': ids de nodo, 'parents': índice global del padre (-1 en raíces), 'values'}.
+    """
+    keys, offsets, labels, parents, values = [], [0], [], [], []
+    for cell in cells:
+        if cell.get("DATATYPE", "T") != "T" or not cell.get("DATACONTENTS"):
+            continue
+        cell_labels, cell_parents, cell_values = flatten_tree(cell["DATACONTENTS"])
+        base = len(labels)
+        labels.extend(cell_labels)
+        parents.extend(parent + base if parent >= 0 else -1 for parent in cell_parents)
+        values.extend(cell_values)
+        keys.append(cell_key(cell))
+        offsets.append(len(labels))
+    return {
+        'keys': keys,
+        'offsets': np.array(offsets, dtype=np.int64),
+        'labels': labels,
+        'parents': np.array(parents, dtype=np.int64),
+        'values': np.array(values, dtype=float),
+    }
+
+
+def _subtree_roots(mask, parents):
+    # Nodos marcados cuyo padre no está marcado (o que son raíz)
+    parent_marked = np.zeros(len(mask), dtype=bool)
+    has_parent = parents >= 0
+    parent_marked[has_parent] = mask[parents[has_parent]]
+    return mask & ~parent_marked
+
+
+def diff_cells(old_cells, new_cells):
+    """
+    Compara los árboles de dos listas de celdas T.
+    Devuelve un dict con los arrays planos de ambos lados ('old', 'new') y,
+    alineados con los nodos nuevos: 'old_value' (NaN en las altas), 'delta',
+    'added', 'added_root'; alineados con los nodos anteriores: 'removed',
+    'removed_root'; y un resumen en 'summary'.
+    """
+    old, new = flatten_cells(old_cells), flatten_cells(new_cells)
+    # Codificación entera de (celda, nodo) común a ambos lados
+    cell_codes, label_codes = {}, {}
+    for flat in (old, new):
+        for key in flat['keys']:
+            cell_codes.setdefault(key, len(cell_codes))
+        for label in flat['labels']:
+            label_codes.setdefault(label, len(label_codes))
+
+    def node_codes(flat):
+        cells = np.repeat(np.array([cell_codes[key] for key in flat['keys']], dtype=np.int64), np.diff(flat['offsets']))
+        labels = np.fromiter((label_codes[label] for label in flat['labels']), dtype=np.int64, count=len(flat['labels']))
+        return cells * max(len(label_codes), 1) + labels
+
+    _, old_idx, new_idx = np.intersect1d(node_codes(old), node_codes(new), return_indices=True)
+    old_value = np.full(len(new['values']), np.nan)
+    old_value[new_idx] = old['values'][old_idx]
+    added = np.ones(len(new['values']), dtype=bool)
+    added[new_idx] = False
+    removed = np.ones(len(old['values']), dtype=bool)
+    removed[old_idx] = False
+    delta = new['values'] - np.nan_to_num(old_value)
+    added_root = _subtree_roots(added, new['parents'])
+    removed_root = _subtree_roots(removed, old['parents'])
+    summary = {
+        'nodes_old': len(old['values']),
+        'nodes_new': len(new['values']),
+        'matched': len(new_idx),
+        'changed': int(np.count_nonzero(~added & (delta != 0))),
+        'added': int(added.sum()),
+        'removed': int(removed.sum()),
+        'added_subtrees': int(added_root.sum()),
+        'removed_subtrees': int(removed_root.sum()),
+        'cells_added': len(set(new['keys']) - set(old['keys'])),
+        'cells_removed': len(set(old['keys']) - set(new['keys'])),
+        'total_old': float(old['values'][old['parents'] < 0].sum()),
+        'total_new': float(new['values'][new['parents'] < 0].sum()),
+    }
+    return {
+        'old': old, 'new': new,
+        'old_value': old_value, 'delta': delta, 'added': added, 'added_root': added_root,
+        'removed': removed, 'removed_root': removed_root,
+        'summary': summary,
+    }
+
+
+def diff_snapshots(old_result, new_result):
+    """
+    Diferencias de todos los árboles entre dos listas result.
+    """
+    return diff_cells([cell for cell in old_result if cell["DATATYPE"] == "T"],
+                      [cell for cell in new_result if cell["DATATYPE"] == "T"])
+
+
+def cell_changes(diff, key):
+    """
+    Cambios del árbol de una celda (CIA, PRJID, ROW, COLUMN) del lado nuevo:
+    labels, parents (índices locales), values, old_value, delta, added, y los
+    subárbolos eliminados [(label, valor anterior)]. None si la celda no está.
+    """
+    new = diff['new']
+    try:
+        position = new['keys'].index(key)
+    except ValueError:
+        return None
+    start, end = new['offsets'][position], new['offsets'][position + 1]
+    parents = new['parents'][start:end]
+    removed_subtrees = []
+    old = diff['old']
+    if key in old['keys']:
+        old_position = old['keys'].index(key)
+        old_start, old_end = old['offsets'][old_position], old['offsets'][old_position + 1]
+        roots = np.flatnonzero(diff['removed_root'][old_start:old_end]) + old_start
+        removed_subtrees = [(old['labels'][i], float(old['values'][i])) for i in roots]
+    return {
+        'labels': new['labels'][start:end],
+        'parents': np.where(parents >= 0, parents - start, -1),
+        'values': new['values'][start:end],
+        'old_value': diff['old_value'][start:end],
+        'delta': diff['delta'][start:end],
+        'added': diff['added'][start:end],
+        'removed_subtrees': removed_subtrees,
+    }
+
+
+def top_changes(diff, top=20):
+    """
+    Nodos con mayor variación absoluta: [(celda, label, valor anterior, valor nuevo, variación)].
+    """
+    new = diff['new']
+    order = np.argsort(-np.abs(diff['delta']), kind='stable')[:top]
+    cells = np.searchsorted(new['offsets'], order, side='right') - 1
+    return [(new['keys'][c], new['labels'][i], float(diff['old_value'][i]), float(new['values'][i]), float(diff['delta'][i]))
+            for c, i in zip(cells, order) if diff['delta'][i] != 0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diferencias entre los árboles de costes de dos snapshots")
+    parser.add_argument('old', help="Snapshot anterior")
+    parser.add_argument('new', help="Snapshot actual")
+    parser.add_argument('--top', type=int, default=20, help="Número de nodos con mayor variación a listar")
+    args = parser.parse_args(argv)
+    from dashboard_snapshot import load_snapshot
+    diff = diff_snapshots(load_snapshot(args.old)['result'], load_snapshot(args.new)['result'])
+    summary = diff['summary']
+    print(f"Nodos: {summary['nodes_old']} -> {summary['nodes_new']} ({summary['matched']} comunes, {summary['changed']} con cambios)")
+    print(f"Altas: {summary['added']} nodos en {summary['added_subtrees']} subárboles; "
+          f"bajas: {summary['removed']} nodos en {summary['removed_subtrees']} subárboles")
+    print(f"Celdas: {summary['cells_added']} nuevas, {summary['cells_removed']} eliminadas")
+    print(f"Total: {summary['total_old']:,.2f} -> {summary['total_new']:,.2f} ({summary['total_new'] - summary['total_old']:+,.2f})")
+    for key, label, old_value, new_value, delta in top_changes(diff, args.top):
+        old_text = 'nuevo' if np.isnan(old_value) else f"{old_value:,.2f}"
+        print(f"  {delta:>+14,.2f}  {'/'.join(key)}  {label}  ({old_text} -> {new_value:,.2f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())